@@ -1,14 +1,23 @@
+import itertools
+import json
 import os
+import time
+import uuid
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from huggingface_hub import InferenceClient
 
 # 1. Setup Client (Serverless Free Tier)
 # This assumes the user provides HF_API_KEY in environment variables.
 # We default to a powerful open model available on the API.
 # Qwen/Qwen2.5-72B-Instruct is often available and very powerful.
-MODEL_ID = "Qwen/Qwen2.5-72B-Instruct" 
-# Fallback if 72B is busy/unavailable: "meta-llama/Meta-Llama-3-8B-Instruct"
+# LLM_MODEL_POOL (comma separated) is tried in order: the next model is used when one errors.
+# Hedging and circuit breakers live in the backend's AI proxy (app/services/llm/model_pool.py).
+MODEL_IDS = [m.strip() for m in os.environ.get(
+    "LLM_MODEL_POOL", "Qwen/Qwen2.5-72B-Instruct,meta-llama/Meta-Llama-3-8B-Instruct"
+).split(",") if m.strip()]
 
 client = InferenceClient(token=os.environ.get("HF_API_KEY"))
 
@@ -19,35 +28,104 @@ class InferenceRequest(BaseModel):
     messages: list
     max_tokens: int = 512
     temperature: float = 0.1
+    stop: Optional[list] = None  # Per-phase profiles from the backend's ReasoningEngine
+    stream: bool = False  # Relay tokens as OpenAI-style SSE chunks
 
 @app.post("/v1/chat/completions")
 def chat(req: InferenceRequest):
     if not os.environ.get("HF_API_KEY"):
          raise HTTPException(status_code=500, detail="HF_API_KEY not set on server.")
 
-    try:
-        response = client.chat_completion(
-            model=MODEL_ID,
-            messages=req.messages,
-            max_tokens=req.max_tokens,
-            temperature=req.temperature,
-            top_p=0.9
-        )
-        # Verify format (InferenceClient returns an object, we need to extract dict)
-        return {
-            "choices": [
-                {
-                    "message": {
-                        "role": "assistant",
-                        "content": response.choices[0].message.content
-                    }
-                }
-            ]
-        }
-    except Exception as e:
-        # Fallback handling or detailed logging
-        print(f"Inference Error: {e}")
-        raise HTTPException(status_code=503, detail=f"AI Service Busy or Error: {str(e)}")
+    if req.stream:
+        return stream_chat(req)
+
+    errors = []
+    for model_id in MODEL_IDS:
+        try:
+            response = client.chat_completion(
+                model=model_id,
+                messages=req.messages,
+                max_tokens=req.max_tokens,
+                temperature=req.temperature,
+                stop=req.stop,
+                top_p=0.9
+            )
+            break
+        except Exception as e:
+            # Fallback handling or detailed logging
+            print(f"Inference Error ({model_id}): {e}")
+            errors.append(f"{model_id}: {e}")
+    else:
+        raise HTTPException(status_code=503, detail=f"AI Service Busy or Error: {'; '.join(errors)}")
+
+    # Verify format (InferenceClient returns an object, we need to extract dict)
+    # usage and finish_reason let the backend account tokens and detect truncation at max_tokens
+    usage = getattr(response, "usage", None)
+    return {
+        "model": model_id,
+        "usage": {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+        },
+        "choices": [
+            {
+                "message": {
+                    "role": "assistant",
+                    "content": response.choices[0].message.content
+                },
+                "finish_reason": response.choices[0].finish_reason
+            }
+        ]
+    }
+
+def stream_chat(req: InferenceRequest):
+    """
+    Same failover, but a model is only abandoned before its first chunk: the first
+    chunk is pulled here, so a failing pool still answers 503 instead of an empty stream.
+    """
+    errors = []
+    for model_id in MODEL_IDS:
+        try:
+            chunks = client.chat_completion(
+                model=model_id,
+                messages=req.messages,
+                max_tokens=req.max_tokens,
+                temperature=req.temperature,
+                stop=req.stop,
+                top_p=0.9,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            first = next(chunks, None)
+            break
+        except Exception as e:
+            print(f"Inference Error ({model_id}): {e}")
+            errors.append(f"{model_id}: {e}")
+    else:
+        raise HTTPException(status_code=503, detail=f"AI Service Busy or Error: {'; '.join(errors)}")
+
+    chunk_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+
+    def events():
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                usage = getattr(chunk, "usage", None)
+                yield "data: " + json.dumps({
+                    "id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model_id,
+                    "choices": [
+                        {"index": 0, "delta": {"content": c.delta.content} if c.delta and c.delta.content else {},
+                         "finish_reason": c.finish_reason}
+                        for c in chunk.choices or []
+                    ],
+                    **({"usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}} if usage else {}),
+                }) + "\n\n"
+        except Exception as e:
+            print(f"Inference Error ({model_id}, mid-stream): {e}")
+            yield "data: " + json.dumps({"error": {"message": f"AI Service Error: {e}", "type": "upstream_error"}}) + "\n\n"
+            return
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/health")
 def health():
@@ -38,6 +38,13 @@ def get_db() -> Generator:
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> User:
+    return get_user_from_token(db, token)
+
+def get_user_from_token(db: Session, token: str) -> User:
+    """
+    Token -> User. Shared by the HTTP dependency above and by WebSocket endpoints,
+    which cannot use OAuth2PasswordBearer and authenticate once per connection.
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -59,3 +66,12 @@ def get_current_active_user(
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+def get_current_active_superuser(
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=403, detail="The user doesn't have enough privileges"
+        )
+    return current_user
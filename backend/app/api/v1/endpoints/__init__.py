@@ -1 +1 @@
-from . import auth, chat, simulation, ai_proxy
+from . import auth, chat, simulation, ai_proxy, admin
@@ -0,0 +1,121 @@
+import asyncio
+import gzip
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from app.api import deps
+from app.core.loop_watchdog import watchdog
+from app.core.metrics import metrics
+from app.models.corpus import RuleCorpusVersion
+from app.models.profile import RequestProfile
+from app.schemas.rule import Rule
+from app.services.rag import corpus
+from app.services.reasoning.engine import engine
+
+router = APIRouter()
+
+@router.get("/metrics")
+def read_metrics(
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """
+    In-process metrics (counters, gauges, histograms) of the worker serving this request.
+    """
+    return metrics.snapshot()
+
+@router.get("/loop-blocks")
+def read_loop_blocks(
+    limit: int = 20,
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """
+    Call sites that blocked this worker's event loop past LOOP_WATCHDOG_THRESHOLD_MS,
+    worst total first, with the stack captured during the longest stall.
+    """
+    if watchdog is None:
+        return {"enabled": False, "offenders": []}
+    return {
+        "enabled": True,
+        "threshold_ms": watchdog.threshold * 1000,
+        "worst_ms": watchdog.worst_ms,
+        "offenders": watchdog.report(limit),
+    }
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def read_profile(
+    profile_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """
+    Collapsed stacks of a profiled chat request (linked from the reply's meta_audit["profile"]).
+    Render with flamegraph.pl / inferno-flamegraph, or load into speedscope.
+    """
+    profile = db.query(RequestProfile).filter(RequestProfile.id == profile_id).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(gzip.decompress(profile.collapsed).decode())
+
+@router.get("/corpus")
+def read_corpus(
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """
+    Rule corpus versions, newest first, and the version this worker is serving.
+    """
+    versions = db.query(RuleCorpusVersion).order_by(RuleCorpusVersion.created_at.desc()).all()
+    return {
+        "serving": engine.corpus.label,
+        "in_flight": engine.corpus.in_flight,
+        "versions": [
+            {
+                "version": v.version, "status": v.status, "rule_count": v.rule_count,
+                "validation": v.validation, "error": v.error,
+                "created_at": v.created_at, "activated_at": v.activated_at,
+            }
+            for v in versions
+        ],
+    }
+
+def _build_corpus(rules: list[Rule], activate: bool):
+    try:
+        version = corpus.build_version(rules, engine.corpus.retriever.embedding_fn)
+        if activate:
+            corpus.activate(version)
+    except Exception as e:
+        print(f"WARNING: Rule corpus build failed: {e}")
+
+@router.post("/corpus/versions", status_code=202)
+def create_corpus_version(
+    rules: list[Rule],
+    background_tasks: BackgroundTasks,
+    activate: bool = False,
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """
+    Builds a new rule corpus version in the background, next to the one being served.
+    Poll GET /corpus for its status; with `activate=true` it goes live once validated.
+    """
+    try:
+        corpus.check_rules(rules)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    background_tasks.add_task(_build_corpus, rules, activate)
+    return {"version": corpus.corpus_version(rules), "status": "building"}
+
+@router.post("/corpus/versions/{version}/activate")
+async def activate_corpus_version(
+    version: str,
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """
+    Swaps a ready version in (or rolls back to a retired one). This worker switches
+    immediately, the others within CORPUS_POLL_S; running requests finish on the old version.
+    """
+    try:
+        previous = await asyncio.to_thread(corpus.activate, version)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await corpus.sync(engine)
+    return {"status": "success", "active": version, "previous": previous, "serving": engine.corpus.label}
@@ -1,33 +1,37 @@
 import os
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from huggingface_hub import InferenceClient
-from typing import List, Dict, Any
+import json
+import time
+import uuid
+from typing import List, Dict, Any, Optional
 from starlette.requests import Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from app.api import deps
-from fastapi import Depends
-
-limiter = Limiter(key_func=get_remote_address)
+from app.core.metrics import metrics
+from app.core.rate_limit import limiter, quota
+from app.services.llm.model_pool import get_pool, Completion, CompletionStream, UpstreamError
+from app.services.llm.usage import ACCOUNTED_HEADER, record_completion
+from fastapi import Depends, Response
 
 router = APIRouter()
 
-# Setup Client
-# Falls back to simple proxy mode if no key (will error on request)
-# Default model: Qwen 2.5 72B (Powerful & Free on HF API usually)
-MODEL_ID = "Qwen/Qwen2.5-72B-Instruct"
+# Models, hedging and circuit breakers are configured through LLM_MODEL_POOL (see model_pool.py)
 
 class InferenceRequest(BaseModel):
     messages: List[Dict[str, str]]
     max_tokens: int = 512
     temperature: float = 0.1
+    stop: Optional[List[str]] = None
+    phase: str = "unknown"  # Reasoning phase; hedging and usage accounting are per phase
+    stream: bool = False  # Relay tokens as OpenAI-style SSE chunks
 
 @router.post("/chat/completions")
 @limiter.limit("10/minute")
 async def proxy_chat_completion(
     req: InferenceRequest, 
     request: Request,
+    response: Response,
     current_user = Depends(deps.get_current_active_user)
 ):
     """
@@ -38,30 +42,83 @@ async def proxy_chat_completion(
     if not api_key:
          raise HTTPException(status_code=500, detail="HF_API_KEY not set on server.")
 
-    client = InferenceClient(token=api_key)
+    await quota.aenforce(current_user.id)
 
     try:
-        # Run in threadpool (sync client)
-        response = client.chat_completion(
-            model=MODEL_ID,
-            messages=req.messages,
-            max_tokens=req.max_tokens,
-            temperature=req.temperature,
-            top_p=0.9
-        )
+        start = time.perf_counter()
+        if req.stream:
+            stream = get_pool(api_key).stream(req.messages, req.max_tokens, req.temperature, req.phase, req.stop)
+            deltas = stream.__aiter__()
+            # Wait for the first token here so upstream failures still surface as 503
+            first = await anext(deltas, None)
+            return StreamingResponse(
+                _sse(stream, deltas, first, req.phase, current_user.id, start),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", ACCOUNTED_HEADER: "1"},
+            )
+
+        # Sync client calls run in threads; a hedge may be in flight on a second model
+        completion = await get_pool(api_key).complete(req.messages, req.max_tokens, req.temperature, req.phase, req.stop)
+        await _account(completion, req.phase, current_user.id, start)
+        response.headers[ACCOUNTED_HEADER] = "1"
         
         # Return OpenAI-compatible format
         return {
+            "model": completion.model,
+            "usage": {
+                "prompt_tokens": completion.prompt_tokens,
+                "completion_tokens": completion.completion_tokens,
+            },
             "choices": [
                 {
                     "message": {
                         "role": "assistant",
-                        "content": response.choices[0].message.content
-                    }
+                        "content": completion.content
+                    },
+                    "finish_reason": completion.finish_reason
                 }
             ]
         }
-    except Exception as e:
+    except UpstreamError as e:
         print(f"HF Inference Error: {e}")
         # Improve error handling for rate limits
         raise HTTPException(status_code=503, detail=f"AI Provider Error: {str(e)}")
+
+
+async def _account(completion: Completion, phase: str, user_id: int, start: float):
+    await record_completion(
+        phase, user_id, completion.prompt_tokens, completion.completion_tokens,
+        completion.finish_reason, time.perf_counter() - start,
+    )
+
+
+async def _sse(stream: CompletionStream, deltas, first, phase: str, user_id: int, start: float):
+    """OpenAI `chat.completion.chunk` events, a final chunk with finish_reason and usage, then [DONE]."""
+    chunk_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+
+    def event(delta: dict, finish_reason=None, **extra) -> str:
+        return "data: " + json.dumps({
+            "id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": stream.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra,
+        }) + "\n\n"
+
+    if stream.first_token_s is not None:
+        metrics.observe("llm_phase_first_token_ms", stream.first_token_s * 1000, {"phase": phase})
+    try:
+        if first is not None:
+            yield event({"role": "assistant", "content": first})
+        async for delta in deltas:
+            yield event({"content": delta})
+    except UpstreamError as e:
+        print(f"HF Inference Error (mid-stream): {e}")
+        metrics.inc("llm_phase_stream_errors_total", {"phase": phase})
+        yield "data: " + json.dumps({"error": {"message": f"AI Provider Error: {e}", "type": "upstream_error"}}) + "\n\n"
+        return
+    finally:
+        await deltas.aclose()
+    completion = stream.completion
+    await _account(completion, phase, user_id, start)
+    yield event({}, completion.finish_reason, usage={
+        "prompt_tokens": completion.prompt_tokens, "completion_tokens": completion.completion_tokens,
+    })
+    yield "data: [DONE]\n\n"
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from app.core import security
 from app.core.config import settings
 from app.api import deps
+from app.core.rate_limit import quota
 from app.models.user import User
 from app.schemas.user import Token, UserCreate, User as UserSchema
 
@@ -83,3 +84,14 @@ def read_users_me(
     Get current user.
     """
     return current_user
+
+@router.get("/me/usage")
+def read_users_me_usage(
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get today's upstream LLM usage (calls and tokens) for the current user.
+    """
+    usage = quota.usage(current_user.id)
+    usage["daily_token_quota"] = settings.LLM_DAILY_TOKEN_QUOTA
+    return usage
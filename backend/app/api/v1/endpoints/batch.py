@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from app.api import deps
+from app.core.config import settings
+from app.core.rate_limit import limiter
+from app.models.batch import BatchJob, BatchItem
+from app.schemas.batch import BatchJobCreate, BatchJob as BatchJobSchema, BatchItem as BatchItemSchema
+from app.services.batch import runner
+
+router = APIRouter()
+
+EVENTS_POLL_S = 1.0
+
+
+def _job_or_404(db: Session, job_id: str, user_id: int) -> BatchJob:
+    job = db.query(BatchJob).filter(BatchJob.id == job_id, BatchJob.user_id == user_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+
+def _finished_items(db: Session, job_id: str, since: Optional[datetime] = None, exclude: frozenset = frozenset()) -> list[BatchItem]:
+    # Items finish out of order, so the cursor is the finish time (or the positions already sent), not the position
+    query = db.query(BatchItem).filter(BatchItem.job_id == job_id, BatchItem.status.in_(runner.FINISHED))
+    if since is not None:
+        query = query.filter(BatchItem.finished_at > since)
+    if exclude:
+        query = query.filter(BatchItem.position.notin_(exclude))
+    return query.order_by(BatchItem.finished_at, BatchItem.position).all()
+
+
+def _summary(db: Session, job: BatchJob, items: list[BatchItem]) -> BatchJobSchema:
+    completed = db.query(func.count(BatchItem.id)).filter(
+        BatchItem.job_id == job.id, BatchItem.status.in_(runner.FINISHED)
+    ).scalar()
+    return BatchJobSchema(
+        id=job.id, status=job.status, total=job.total, completed=completed,
+        created_at=job.created_at, finished_at=job.finished_at,
+        items=[BatchItemSchema.model_validate(i) for i in items],
+    )
+
+
+@router.post("/jobs", status_code=202)
+@limiter.limit("5/minute")
+def create_job(
+    job_in: BatchJobCreate,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_user)
+):
+    """
+    Queue a list of queries; they run through the reasoning pipeline in the background.
+    Poll GET /jobs/{id} or stream GET /jobs/{id}/events for per-item results.
+    """
+    if len(job_in.queries) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_ITEMS} queries per job")
+    scope = {k: v for k, v in {"domain": job_in.domain, "category": job_in.category}.items() if v}
+    job = BatchJob(user_id=current_user.id, total=len(job_in.queries), scope=scope or None)
+    job.items = [BatchItem(position=i, query=q) for i, q in enumerate(job_in.queries)]
+    db.add(job)
+    db.commit()
+    runner.wake()
+    return {"job_id": job.id, "status": job.status, "total": job.total}
+
+
+@router.get("/jobs/{job_id}", response_model=BatchJobSchema)
+def get_job(
+    job_id: str,
+    since: Optional[datetime] = None,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_user)
+):
+    """
+    Job progress and its finished items, in finishing order. Pass the last
+    `finished_at` seen as `since` to poll incrementally.
+    """
+    job = _job_or_404(db, job_id, current_user.id)
+    return _summary(db, job, _finished_items(db, job_id, since))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job(
+    job_id: str,
+    current_user = Depends(deps.get_current_active_user)
+):
+    """
+    Server-sent events: one "item" event per item as it finishes, then a "job"
+    event with the final summary.
+    """
+    def poll(sent: frozenset):
+        db = deps.SessionLocal()
+        try:
+            job = _job_or_404(db, job_id, current_user.id)
+            items = [BatchItemSchema.model_validate(i) for i in _finished_items(db, job_id, exclude=sent)]
+            return job.status, items, _summary(db, job, [])
+        finally:
+            db.close()
+
+    await asyncio.to_thread(poll, frozenset([-1]))  # 404 before the stream starts
+
+    async def events():
+        sent = set()
+        while True:
+            status, items, summary = await asyncio.to_thread(poll, frozenset(sent))
+            for item in items:
+                sent.add(item.position)
+                yield f"event: item\ndata: {item.model_dump_json()}\n\n"
+            if status not in runner.ACTIVE:
+                yield f"event: job\ndata: {summary.model_dump_json()}\n\n"
+                return
+            await asyncio.sleep(EVENTS_POLL_S)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(
+    job_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_user)
+):
+    """
+    Cancel a job: items not yet started are skipped, finished results are kept.
+    """
+    _job_or_404(db, job_id, current_user.id)
+    db.execute(update(BatchJob).where(BatchJob.id == job_id, BatchJob.status.in_(runner.ACTIVE)).values(status="cancelled"))
+    db.commit()
+    return {"status": "success", "message": "Batch job cancelled"}
@@ -1,21 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from starlette.requests import Request
 from sqlalchemy.orm import Session
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from app.api import deps 
+from app.core.admission import admission, AdmissionRejected
+from app.core.config import settings
+from app.core.profiler import RequestProfiler
+from app.core.rate_limit import limiter
 from app.services.reasoning.engine import engine
 from app.models.chat import ChatSession, ChatMessage
+from app.models.profile import RequestProfile
+from app.services.history.archive import restore_session
+import asyncio
+import gzip
+import json
+import random
 import uuid
 
-limiter = Limiter(key_func=get_remote_address)
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    # Restrict rule retrieval to a domain/category (kept for the session's later turns)
+    domain: Optional[str] = None
+    category: Optional[str] = None
+    # Server-sent events: explanation tokens as "delta" events, then the full reply as a "result" event
+    stream: bool = False
 
 @router.post("/message")
 @limiter.limit("20/minute")
@@ -29,6 +42,8 @@ async def send_message(
     Primary entry point for the Chatbot Interface.
     Persists history to Database.
     """
+    profiler = None
+    user_msg, new_session = None, False
     try:
         # 1. Validate Token (Redundant with Depends but keeps logic intact)
         auth_header = request.headers.get("Authorization")
@@ -36,16 +51,37 @@ async def send_message(
              raise HTTPException(status_code=401, detail="Missing or invalid token")
         token = auth_header.split(" ")[1]
 
+        # Shed load before anything is persisted when the LLM queue is already too deep
+        if admission is not None:
+            admission.check("intent")
+
+        # Sampling profiler: superuser opt-in per request, or a configured share of all requests
+        if (request.headers.get("X-Profile") == "1" and current_user.is_superuser) or random.random() < settings.PROFILE_SAMPLE_RATE:
+            profiler = RequestProfiler()
+            profiler.start()
+
         # 2. Get or Create Session
+        previous_turn = None
         if req.session_id:
             session = db.query(ChatSession).filter(ChatSession.id == req.session_id, ChatSession.user_id == current_user.id).first()
             if not session:
                 # If ID passed but not found, fallback to new (or error? better to new for robustness)
                 session = ChatSession(id=str(uuid.uuid4()), user_id=current_user.id, title=req.message[:30] + "...")
                 db.add(session)
+                new_session = True
+            else:
+                restore_session(db, session.id)
+                # Last assistant turn's plan lets the engine short-circuit parameter-change follow-ups
+                last_reply = db.query(ChatMessage).filter(
+                    ChatMessage.session_id == session.id,
+                    ChatMessage.role == "assistant"
+                ).order_by(ChatMessage.id.desc()).first()
+                if last_reply and last_reply.meta_audit:
+                    previous_turn = last_reply.meta_audit
         else:
             session = ChatSession(id=str(uuid.uuid4()), user_id=current_user.id, title=req.message[:30] + "...")
             db.add(session)
+            new_session = True
         
         db.commit() # Commit to get ID if needed, or refresh
 
@@ -56,44 +92,131 @@ async def send_message(
             content=req.message
         )
         db.add(user_msg)
+        session.touch()
         db.commit()
 
         # 4. Process with Engine
-        response = await engine.process_user_intent(req.message, token)
-        
-        # 5. Save Assistant Response
-        assistant_content = ""
-        meta_audit = {}
-        
-        if response.get("status") == "success":
-            assistant_content = response.get("plan", {}).get("thought", "Analysis complete.")
-            meta_audit = response.get("plan", {})
-            # Also attach steps if needed? meta_audit is flexible JSON. 
-            # Ideally store the whole response plan + steps for full replay.
-            meta_audit["reasoning_steps"] = response.get("reasoning_steps", [])
-        else:
-            assistant_content = response.get("message", "Error processing request.")
-        
-        assistant_msg = ChatMessage(
-            session_id=session.id,
-            role="assistant",
-            content=assistant_content,
-            meta_audit=meta_audit
-        )
-        db.add(assistant_msg)
-        
-        # Update Session Timestamp
-        session.updated_at = db.query(ChatMessage).filter(ChatMessage.id == assistant_msg.id).scalar() # trick to get current time? 
-        # Actually sqlalchemy handles onupdate. Just touching it.
-        
-        db.commit()
-        
-        # Return response linked to session
-        response["session_id"] = session.id
-        return response
+        scope = {"domain": req.domain, "category": req.category}
+        if not any(scope.values()) and previous_turn:
+            scope = previous_turn.get("retrieval_scope") or {}
+        if req.stream:
+            stream_profiler, profiler = profiler, None  # Keeps sampling until the stream ends
+            return StreamingResponse(
+                _stream_reply(db, session, user_msg, new_session, req.message, token, previous_turn, scope, stream_profiler, current_user.id),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        response = await engine.process_user_intent(req.message, token, previous_turn=previous_turn, scope=scope)
+        return _save_reply(db, session, response, profiler, current_user.id)
 
+    except AdmissionRejected:
+        if user_msg is not None:
+            _discard_turn(db, session, user_msg, new_session)
+        raise
     except HTTPException as he:
         raise he
     except Exception as e:
         print(f"CRITICAL CHAT ERROR: {e}")
         return {"status": "error", "message": f"Server Logic Error: {str(e)}"}
+    finally:
+        if profiler:
+            profiler.stop()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_reply(db: Session, session: ChatSession, user_msg: ChatMessage, new_session: bool, message: str,
+                        token: str, previous_turn: Optional[dict], scope: dict, profiler: Optional[RequestProfiler], user_id: int):
+    """Relays explanation tokens while the engine runs, then persists the reply like the JSON path."""
+    deltas: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(engine.process_user_intent(
+        message, token, previous_turn=previous_turn, scope=scope, on_delta=deltas.put_nowait
+    ))
+    task.add_done_callback(lambda _: deltas.put_nowait(None))
+    if profiler:
+        profiler.track(task)
+        profiler.track(asyncio.current_task())
+    try:
+        while (delta := await deltas.get()) is not None:
+            yield _sse("delta", delta)
+        response = _save_reply(db, session, task.result(), profiler, user_id)
+    except AdmissionRejected as e:
+        _discard_turn(db, session, user_msg, new_session)
+        response = {"status": "error", "message": e.detail}
+    except Exception as e:
+        print(f"CRITICAL CHAT ERROR: {e}")
+        response = {"status": "error", "message": f"Server Logic Error: {str(e)}"}
+    finally:
+        task.cancel()  # Client went away mid-stream
+        if profiler:
+            profiler.stop()
+    yield _sse("result", response)
+
+
+def _discard_turn(db: Session, session: ChatSession, user_msg: ChatMessage, new_session: bool):
+    """Drops the user turn of a rejected request (and the session it opened), so history holds no unanswered message."""
+    if new_session:
+        db.delete(session)
+    else:
+        db.delete(user_msg)
+        session.touch()
+    db.commit()
+
+
+def _save_reply(db: Session, session: ChatSession, response: dict, profiler: Optional[RequestProfiler], user_id: int) -> dict:
+    """Persists the assistant turn (with the profile link, if profiled); returns the response for the client."""
+    # 5. Save Assistant Response
+    if profiler:
+        profile = _store_profile(db, profiler.stop(), user_id, session.id)
+    assistant_content = ""
+    meta_audit = {}
+    
+    if response.get("status") == "success":
+        assistant_content = response.get("plan", {}).get("thought", "Analysis complete.")
+        meta_audit = response.get("plan", {})
+        # Also attach steps if needed? meta_audit is flexible JSON. 
+        # Ideally store the whole response plan + steps for full replay.
+        meta_audit["reasoning_steps"] = response.get("reasoning_steps", [])
+    else:
+        assistant_content = response.get("message", "Error processing request.")
+    
+    if profiler:
+        meta_audit["profile"] = profile
+    assistant_msg = ChatMessage(
+        session_id=session.id,
+        role="assistant",
+        content=assistant_content,
+        meta_audit=meta_audit
+    )
+    db.add(assistant_msg)
+    
+    # Update Session Timestamp (drives ordering and the history ETags)
+    session.touch()
+    
+    db.commit()
+    
+    # Return response linked to session
+    response["session_id"] = session.id
+    return response
+
+
+def _store_profile(db: Session, profiler: RequestProfiler, user_id: int, session_id: str) -> dict:
+    """Persists the collapsed stacks; returns the link stored in the reply's meta_audit."""
+    record = RequestProfile(
+        user_id=user_id,
+        session_id=session_id,
+        duration_ms=profiler.duration_ms,
+        samples=profiler.samples,
+        collapsed=gzip.compress(profiler.collapsed().encode()),
+    )
+    db.add(record)
+    db.commit()
+    return {
+        "id": record.id,
+        "url": f"{settings.API_V1_STR}/admin/profiles/{record.id}",
+        "duration_ms": round(profiler.duration_ms, 1),
+        "samples": profiler.samples,
+        "hot_spots": profiler.hot_spots(),
+    }
@@ -1,14 +1,42 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+import hashlib
+import json
+import zlib
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exists, func, select
 from sqlalchemy.orm import Session
 from app.api import deps
-from app.models.chat import ChatSession, ChatMessage
+from app.core.rate_limit import limiter
+from app.models.chat import ChatSession, ChatMessage, ChatSessionArchive
 from app.schemas.chat import ChatSession as ChatSessionSchema, ChatMessage as ChatMessageSchema
+from app.services.history.archive import archived_messages, delete_sessions, message_record, restore_session
 
 router = APIRouter()
 
+EXPORT_YIELD_PER = 500  # Rows fetched per server-side cursor roundtrip
+EXPORT_CHUNK_BYTES = 64 * 1024
+BULK_DELETE_MAX = 500
+
+
+def _etag(*parts) -> str:
+    return 'W/"' + hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20] + '"'
+
+
+def _not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """304 when the client already holds `etag`; otherwise tags the response."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 @router.get("/sessions", response_model=List[ChatSessionSchema])
 def list_sessions(
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user = Depends(deps.get_current_active_user),
     limit: int = 50,
@@ -16,7 +44,15 @@ def list_sessions(
 ):
     """
     List chat sessions for the current user.
+    Supports If-None-Match: the ETag covers the user's session count and latest update.
     """
+    count, latest = db.query(
+        func.count(ChatSession.id), func.max(func.coalesce(ChatSession.updated_at, ChatSession.created_at))
+    ).filter(ChatSession.user_id == current_user.id).one()
+    not_modified = _not_modified(request, response, _etag(current_user.id, count, latest, skip, limit))
+    if not_modified:
+        return not_modified
+
     sessions = db.query(ChatSession).filter(
         ChatSession.user_id == current_user.id
     ).order_by(ChatSession.updated_at.desc()).offset(skip).limit(limit).all()
@@ -25,22 +61,112 @@ def list_sessions(
 @router.get("/sessions/{session_id}", response_model=ChatSessionSchema)
 def get_session(
     session_id: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user = Depends(deps.get_current_active_user)
 ):
     """
     Get a specific chat session with full history.
+    Supports If-None-Match on the session's updated_at; a 304 never loads the messages.
     """
-    session = db.query(ChatSession).filter(
+    stamp = db.query(ChatSession.created_at, ChatSession.updated_at).filter(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
     ).first()
-    
-    if not session:
+
+    if not stamp:
         raise HTTPException(status_code=404, detail="Session not found")
-        
+
+    not_modified = _not_modified(request, response, _etag(session_id, stamp.updated_at or stamp.created_at))
+    if not_modified:
+        return not_modified
+
+    restore_session(db, session_id)
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
     return session
 
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _export_lines(user_id: int):
+    """One NDJSON line per session followed by its messages, read through a server-side cursor."""
+    db = deps.SessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                ChatSession.id, ChatSession.title, ChatSession.created_at, ChatSession.updated_at,
+                exists().where(ChatSessionArchive.session_id == ChatSession.id).label("archived"),
+                ChatMessage.id.label("message_id"), ChatMessage.role, ChatMessage.content,
+                ChatMessage.meta_audit, ChatMessage.created_at.label("message_created_at"),
+            )
+            .outerjoin(ChatMessage, ChatMessage.session_id == ChatSession.id)
+            .where(ChatSession.user_id == user_id)
+            .order_by(ChatSession.created_at, ChatSession.id, ChatMessage.id)
+            .execution_options(stream_results=True, yield_per=EXPORT_YIELD_PER)
+        )
+        current = None
+        for row in rows:
+            if row.id != current:
+                current = row.id
+                yield json.dumps({
+                    "type": "session", "id": row.id, "title": row.title,
+                    "created_at": _isoformat(row.created_at), "updated_at": _isoformat(row.updated_at),
+                }) + "\n"
+                if row.archived:
+                    # Archived messages predate any posted since; read without restoring
+                    payload = db.execute(
+                        select(ChatSessionArchive.payload).where(ChatSessionArchive.session_id == row.id)
+                    ).scalar()
+                    for record in archived_messages(payload) if payload else []:
+                        yield json.dumps(record) + "\n"
+            if row.message_id is not None:
+                yield json.dumps(message_record(
+                    row.message_id, row.id, row.role, row.content, row.meta_audit, row.message_created_at,
+                ), default=str) + "\n"
+    finally:
+        db.close()
+
+
+def _export_chunks(user_id: int, gzip: bool):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits 31: gzip container
+    buffer, size = [], 0
+    for line in _export_lines(user_id):
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= EXPORT_CHUNK_BYTES:
+            chunk = b"".join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+@router.get("/export")
+@limiter.limit("5/minute")
+def export_history(
+    request: Request,
+    gzip: bool = False,
+    current_user = Depends(deps.get_current_active_user)
+):
+    """
+    Stream all of the user's sessions and messages as NDJSON.
+    Rows are read through a server-side cursor and written in fixed-size chunks,
+    so memory stays flat whatever the history size. `?gzip=true` compresses the stream.
+    """
+    headers = {"Content-Disposition": 'attachment; filename="history.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(_export_chunks(current_user.id, gzip), media_type="application/x-ndjson", headers=headers)
+
 @router.delete("/sessions/{session_id}")
 def delete_session(
     session_id: str,
@@ -50,14 +176,18 @@ def delete_session(
     """
     Delete a chat session.
     """
-    session = db.query(ChatSession).filter(
-        ChatSession.id == session_id,
-        ChatSession.user_id == current_user.id
-    ).first()
-    
-    if not session:
+    if not delete_sessions(db, current_user.id, [session_id]):
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    db.delete(session)
-    db.commit()
     return {"status": "success", "message": "Session deleted"}
+
+@router.post("/sessions/delete")
+def bulk_delete_sessions(
+    session_ids: List[str] = Body(..., embed=True, max_length=BULK_DELETE_MAX),
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_user)
+):
+    """
+    Delete several chat sessions at once; ids that do not exist or belong to another user are skipped.
+    """
+    deleted = delete_sessions(db, current_user.id, session_ids)
+    return {"status": "success", "deleted": deleted}
@@ -1,5 +1,18 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel
+from app.api import deps
+import asyncio
+import time
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.chat import ChatSession, ChatMessage
+from app.services.history.archive import restore_session
+from app.schemas.simulation import MNARequest, MNAResult, SweepRequest, SweepResult, TwoPortRequest, TwoPortResult
+from app.services.simulation.mna import MNASystem, parse_netlist
+from app.services.simulation.sweep import sweep, log_grid, finite_list
+from app.services.simulation import twoport
+from app.services.simulation.live import model_for_plan
 
 router = APIRouter()
 
@@ -18,3 +31,183 @@ async def update_simulation(params: SimulationParams):
         "status": "updated",
         "new_state": params.params
     }
+
+@router.post("/solve", response_model=MNAResult)
+def solve_circuit(
+    req: MNARequest,
+    current_user = Depends(deps.get_current_active_user),
+):
+    """
+    DC operating point or single-frequency AC solution of a netlist (sparse MNA).
+    Accepts SPICE-like text in `netlist` or structured `elements`.
+    """
+    try:
+        elements, frequency = list(req.elements), req.frequency
+        if req.netlist:
+            parsed, parsed_frequency = parse_netlist(req.netlist, strict=True)
+            elements += parsed
+            frequency = frequency or parsed_frequency
+        if not elements:
+            raise ValueError("Empty netlist")
+        return MNASystem(elements, frequency, req.ground).solve()
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid circuit: {e}")
+
+@router.post("/sweep", response_model=SweepResult)
+def sweep_response(
+    req: SweepRequest,
+    current_user = Depends(deps.get_current_active_user),
+):
+    """
+    Bode sweep (magnitude / phase) of an expression in s = jω over a log-spaced grid.
+    """
+    try:
+        result = sweep(req.expression, req.params, req.f_start, req.f_stop, req.points, req.max_points, req.decimation)
+    except Exception as e:
+        # SymPy raises a variety of exception types on malformed expressions
+        raise HTTPException(status_code=400, detail=f"Invalid sweep: {e}")
+    return SweepResult.model_construct(**result)
+
+@router.post("/twoport", response_model=TwoPortResult)
+def analyze_twoport(
+    req: TwoPortRequest,
+    current_user = Depends(deps.get_current_active_user),
+):
+    """
+    Cascades series/shunt/T/Pi/bridge-T sections as ABCD matrices over a log grid
+    and returns the chosen parameter set (optionally gain into a load).
+    """
+    try:
+        start = time.perf_counter()
+        f = log_grid(req.f_start, req.f_stop, req.points)
+        chain = twoport.evaluate_chain([(s.kind, s.impedances) for s in req.sections], req.params, f)
+        if req.repeat > 1:
+            chain = twoport.repeat(chain, req.repeat)
+        converted = twoport.convert(chain, "abcd", req.parameters, req.z0)
+
+        names = twoport.PARAMETER_NAMES[req.parameters]
+        flat = converted.reshape(-1, 4)
+        result = {
+            "frequency": f.tolist(),
+            "parameters": req.parameters,
+            "real": {n: finite_list(flat[:, i].real) for i, n in enumerate(names)},
+            "imag": {n: finite_list(flat[:, i].imag) for i, n in enumerate(names)},
+        }
+        if req.load:
+            z_load = twoport.evaluate_impedance(req.load, req.params, f)
+            with np.errstate(all="ignore"):
+                z_in = twoport.input_impedance(chain, z_load)
+                gain_db = 20 * np.log10(np.abs(twoport.voltage_gain(chain, z_load)))
+            result["input_impedance_real"] = finite_list(z_in.real)
+            result["input_impedance_imag"] = finite_list(z_in.imag)
+            result["gain_db"] = finite_list(gain_db)
+        result["compute_ms"] = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid two-port: {e}")
+    return TwoPortResult.model_construct(**result)
+
+
+def _load_session_model(session_id: str, token: str):
+    """Authenticates the token and compiles the session's latest plan (short-lived DB session)."""
+    db = deps.SessionLocal()
+    try:
+        user = deps.get_user_from_token(db, token)
+        if not user.is_active:
+            raise ValueError("Inactive user")
+        session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == user.id).first()
+        if not session:
+            raise ValueError("Session not found")
+        restore_session(db, session_id)
+        last_reply = db.query(ChatMessage).filter(
+            ChatMessage.session_id == session_id,
+            ChatMessage.role == "assistant"
+        ).order_by(ChatMessage.id.desc()).first()
+        plan = (last_reply.meta_audit if last_reply else None) or {}
+    finally:
+        db.close()
+    return model_for_plan(session_id, plan)
+
+@router.websocket("/ws/{session_id}")
+async def live_simulation(websocket: WebSocket, session_id: str, token: str = ""):
+    """
+    Slider channel for one chat session: authenticate once (?token=...), then send
+    {"seq": n, "params": {...}} as often as the UI likes. Bursts are coalesced: only
+    the newest update is evaluated, at most SIMULATION_WS_MAX_HZ times per second,
+    and each reply {"seq", "state", "coalesced", "compute_ms"} echoes the seq it answers.
+    {"reload": true} recompiles after a new chat turn changed the session's equation.
+    """
+    await websocket.accept()
+    try:
+        model = await asyncio.to_thread(_load_session_model, session_id, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    except Exception as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e)[:120])
+        return
+
+    latest: dict = {}
+    received = asyncio.Event()
+    state = {"last_seq": -1, "dropped": 0, "closed": False}
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive_json()
+                if not isinstance(message, dict):
+                    continue
+                seq = message.get("seq")
+                if isinstance(seq, int):
+                    if seq <= state["last_seq"]:
+                        metrics.inc("simulation_ws_updates_total", {"outcome": "stale"})
+                        continue
+                    state["last_seq"] = seq
+                if latest:
+                    state["dropped"] += 1  # Superseded before it was evaluated
+                    metrics.inc("simulation_ws_updates_total", {"outcome": "coalesced"})
+                reload = latest.get("reload") or message.get("reload")
+                latest.clear()
+                latest.update(message)
+                if reload:
+                    latest["reload"] = True
+                received.set()
+        except (WebSocketDisconnect, RuntimeError, ValueError):
+            pass
+        finally:
+            state["closed"] = True
+            received.set()
+
+    receiver = asyncio.create_task(receive())
+    interval = 1.0 / settings.SIMULATION_WS_MAX_HZ
+    last_sent = 0.0
+    try:
+        while True:
+            await received.wait()
+            if state["closed"]:
+                break
+            # Pace to the frame budget; updates arriving meanwhile replace `latest`
+            delay = last_sent + interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            received.clear()
+            message, coalesced = dict(latest), state["dropped"]
+            latest.clear()
+            state["dropped"] = 0
+
+            reply = {"seq": message.get("seq"), "coalesced": coalesced}
+            try:
+                if message.get("reload"):
+                    model = await asyncio.to_thread(_load_session_model, session_id, token)
+                start = time.perf_counter()
+                reply["state"] = model.evaluate(message.get("params") or {}).model_dump()
+                reply["compute_ms"] = (time.perf_counter() - start) * 1000
+                metrics.inc("simulation_ws_updates_total", {"outcome": "evaluated"})
+            except Exception as e:
+                reply["error"] = str(e)
+                metrics.inc("simulation_ws_updates_total", {"outcome": "error"})
+            await websocket.send_json(reply)
+            last_sent = time.monotonic()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Lower runs first: a request already past Phase 0 has spent LLM calls that a
+# rejection would waste, so its next call goes ahead of brand-new work.
+PHASE_PRIORITY = {
+    "explanation": 0,
+    "verify": 1,
+    "formulation": 1,
+    "context": 2,
+    "context_formulation": 2,
+    "intent": 3,
+}
+NEW_WORK_PRIORITY = PHASE_PRIORITY["intent"]
+
+
+class AdmissionRejected(HTTPException):
+    def __init__(self, retry_after: float, predicted_wait: float):
+        super().__init__(
+            status_code=429,
+            detail=f"Reasoning service is saturated (predicted queue wait {predicted_wait:.1f}s). Retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class UpstreamRateLimited(AdmissionRejected):
+    """The AI proxy's per-user limit answered 429; callers back off like on admission rejection."""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        HTTPException.__init__(
+            self,
+            status_code=429,
+            detail="Upstream LLM rate limit reached. Retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after else None,
+        )
+
+
+class AdmissionController:
+    """
+    Bounded concurrency for upstream LLM calls with a priority queue in front.
+
+    Per worker process (asyncio), like the metrics registry. Queue wait is
+    predicted from an EWMA of call durations: waiters ahead of a request drain
+    at `limit` calls per average call time. New work (Phase 0) whose predicted
+    wait exceeds ADMISSION_NEW_BUDGET_S is rejected with 429 + Retry-After;
+    in-flight phases get the longer ADMISSION_INFLIGHT_BUDGET_S.
+    """
+
+    def __init__(self, limit: int, initial_call_s: float = 2.0, alpha: float = 0.2):
+        self.limit = limit
+        self.in_flight = 0
+        self.avg_call_s = initial_call_s
+        self.alpha = alpha
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def _ahead(self, priority: int) -> int:
+        return sum(1 for p, _, f in self._waiters if p <= priority and not f.done())
+
+    def predicted_wait(self, priority: int) -> float:
+        if self.in_flight < self.limit and not self._ahead(priority):
+            return 0.0
+        return (self._ahead(priority) + 1) / self.limit * self.avg_call_s
+
+    def budget(self, priority: int) -> float:
+        if priority >= NEW_WORK_PRIORITY:
+            return settings.ADMISSION_NEW_BUDGET_S
+        return settings.ADMISSION_INFLIGHT_BUDGET_S
+
+    def check(self, phase: str = "intent"):
+        """Fail fast before any work is persisted or started."""
+        priority = PHASE_PRIORITY.get(phase, NEW_WORK_PRIORITY)
+        wait = self.predicted_wait(priority)
+        if wait > self.budget(priority):
+            metrics.inc("admission_total", {"phase": phase, "outcome": "rejected"})
+            raise AdmissionRejected(wait - self.budget(priority), wait)
+
+    def _publish(self):
+        metrics.set_gauge("admission_queue_depth", len(self._waiters))
+        metrics.set_gauge("admission_in_flight", self.in_flight)
+
+    def _release(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.in_flight += 1  # Handed over: the woken waiter owns the slot
+                future.set_result(None)
+        self._publish()
+
+    async def _acquire(self, phase: str) -> float:
+        priority = PHASE_PRIORITY.get(phase, NEW_WORK_PRIORITY)
+        if self.in_flight < self.limit and not self._ahead(priority):
+            self.in_flight += 1
+            self._publish()
+            metrics.inc("admission_total", {"phase": phase, "outcome": "admitted"})
+            return 0.0
+
+        self.check(phase)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._publish()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.budget(priority))
+        except asyncio.TimeoutError:
+            if future.done():
+                return time.monotonic() - start  # Slot arrived as the timer fired
+            future.cancel()
+            metrics.inc("admission_total", {"phase": phase, "outcome": "timeout"})
+            raise AdmissionRejected(self.avg_call_s, time.monotonic() - start)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # Caller went away after being handed a slot
+            future.cancel()
+            raise
+        finally:
+            self._waiters = [w for w in self._waiters if not w[2].done()]
+            heapq.heapify(self._waiters)
+            self._publish()
+        metrics.inc("admission_total", {"phase": phase, "outcome": "queued"})
+        return time.monotonic() - start
+
+    @asynccontextmanager
+    async def slot(self, phase: str = "unknown"):
+        waited = await self._acquire(phase)
+        metrics.observe("admission_wait_ms", waited * 1000, {"phase": phase})
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.avg_call_s += self.alpha * (elapsed - self.avg_call_s)
+            self._release()
+
+
+admission: Optional[AdmissionController] = (
+    AdmissionController(settings.LLM_MAX_CONCURRENCY) if settings.LLM_MAX_CONCURRENCY else None
+)
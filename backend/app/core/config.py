@@ -1,6 +1,12 @@
+import os
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
 
+# Relative local paths are anchored here, not at the CWD: start_lite.sh runs seed_rules.py
+# from the repo root and the API from backend/, and both must see the same files
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Cirser"
     API_V1_STR: str = "/api/v1"
@@ -18,15 +24,117 @@ class Settings(BaseSettings):
     
     # Redis (Optional in Lite)
     REDIS_URL: Optional[str] = None
+
+    # Rate Limiting & Quota (shared through Redis when REDIS_URL is set)
+    RATE_LIMIT_STRATEGY: str = "moving-window"
+    QUOTA_RETENTION_DAYS: int = 35
+    LLM_DAILY_TOKEN_QUOTA: Optional[int] = None # None disables enforcement
     
+    # History retention: messages of sessions idle longer than this move to compressed
+    # archive rows (restored on access). 0 disables the background worker.
+    HISTORY_ARCHIVE_AFTER_DAYS: int = 0
+    HISTORY_ARCHIVE_BATCH: int = 50 # Sessions per transaction
+    HISTORY_ARCHIVE_PAUSE_S: float = 2.0 # Between batches
+    HISTORY_ARCHIVE_SWEEP_S: float = 3600.0 # Between sweeps once nothing is left to archive
+
     # ChromaDB (Vector DB)
     CHROMA_HOST: Optional[str] = None # None means specific local dir
     CHROMA_PORT: Optional[int] = None
     CHROMA_PERSIST_DIR: str = "./chroma_db"
+    # "domain" or "category": one collection per value, loaded only when a search needs it.
+    # Changing it requires re-running seed_rules.py.
+    RAG_PARTITION_BY: Optional[str] = None
+
+    # Multi-worker mode: Unix socket of the shared embedding worker (None = in-process model)
+    EMBEDDING_SOCKET: Optional[str] = None
+    # Concurrent query embeddings are coalesced into one batch per window (or when full)
+    EMBED_BATCH_MAX: int = 16
+    EMBED_BATCH_WAIT_MS: float = 3.0
+    # Load the embedding model / SymPy caches at startup instead of on the first request
+    WARMUP_ON_START: bool = False
     
+    # Phase 0: local intent classifier, LLM only below this confidence
+    LOCAL_INTENT_CLASSIFIER: bool = True
+    INTENT_CONFIDENCE_THRESHOLD: float = 0.9
+
+    # Phases 1+2 in one structured LLM call (falls back to two calls on invalid output)
+    FUSED_CONTEXT_FORMULATION: bool = False
+
+    # Precompiled rule equations, written by seed_rules.py and loaded at startup (relative to backend/)
+    RULE_LIBRARY_PATH: str = "./rule_library.json"
+
+    # Rule corpus versions (seed_rules.py, /admin/corpus): a new version is built into its own
+    # collection and must find at least CORPUS_VALIDATE_MIN_RECALL of CORPUS_VALIDATE_SAMPLE
+    # rules by their own text before it can be activated. Workers pick up the active version
+    # within CORPUS_POLL_S and wait up to CORPUS_DRAIN_TIMEOUT_S for requests on the old one.
+    CORPUS_VALIDATE_SAMPLE: int = 50
+    CORPUS_VALIDATE_MIN_RECALL: float = 0.9
+    CORPUS_POLL_S: float = 10.0
+    CORPUS_DRAIN_TIMEOUT_S: float = 60.0
+    CORPUS_KEEP_VERSIONS: int = 3 # Retired versions kept for rollback
+
+    # Admission control for upstream LLM calls (per worker; 0 disables). New requests whose
+    # predicted queue wait exceeds the first budget get 429 + Retry-After; requests already
+    # past Phase 0 queue ahead of them and wait up to the second.
+    LLM_MAX_CONCURRENCY: int = 8
+    ADMISSION_NEW_BUDGET_S: float = 10.0
+    ADMISSION_INFLIGHT_BUDGET_S: float = 45.0
+
+    # Batch jobs (/batch/jobs): queries per job, items run concurrently per job, jobs run
+    # concurrently per worker. A job whose lease is not renewed (crashed worker) is resumed
+    # by any worker after BATCH_LEASE_S, skipping finished items. An item hitting the upstream
+    # rate limit backs off (up to BATCH_BACKOFF_MAX_S) and gives up after BATCH_RATE_LIMIT_RETRIES.
+    BATCH_MAX_ITEMS: int = 100
+    BATCH_ITEM_CONCURRENCY: int = 4
+    BATCH_MAX_JOBS: int = 2
+    BATCH_LEASE_S: float = 60.0
+    BATCH_POLL_S: float = 5.0
+    BATCH_BACKOFF_MAX_S: float = 30.0
+    BATCH_RATE_LIMIT_RETRIES: int = 8
+
+    # Event-loop watchdog: measures loop lag and attributes stalls above the threshold to
+    # the blocking call site (metrics + /admin/loop-blocks)
+    LOOP_WATCHDOG: bool = False
+    LOOP_WATCHDOG_THRESHOLD_MS: float = 100.0
+    LOOP_WATCHDOG_INTERVAL_MS: float = 20.0
+
+    # Sampling profiler for /chat/message: superusers opt in per request with "X-Profile: 1";
+    # this fraction of all requests is profiled regardless (0 disables)
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 5.0
+
+    # Live simulation WebSocket: upper bound on pushed states per second per connection
+    SIMULATION_WS_MAX_HZ: float = 60.0
+
+    # Upstream model pool used by the AI proxy, in preference order: "model", "model@provider"
+    # or "model@http://host:port" (OpenAI-compatible). Slow calls are hedged to the next model
+    # after the phase's observed p95 latency; repeated 5xx open a per-model circuit breaker.
+    LLM_MODEL_POOL: str = "Qwen/Qwen2.5-72B-Instruct,meta-llama/Meta-Llama-3-8B-Instruct"
+    LLM_TIMEOUT_S: float = 60.0
+    LLM_HEDGE: bool = True
+    LLM_HEDGE_DEFAULT_S: float = 8.0     # Hedge delay until a phase has LLM_HEDGE_MIN_SAMPLES calls
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY_S: float = 0.5
+    LLM_BREAKER_THRESHOLD: int = 3
+    LLM_BREAKER_COOLDOWN_S: float = 30.0
+
     # AI Service (Colab URL)
     AI_SERVICE_URL: str = "http://localhost:8000" # Placeholder
 
+    @field_validator("DATABASE_URL")
+    @classmethod
+    def _anchor_sqlite_path(cls, url: str) -> str:
+        prefix = "sqlite:///"
+        path = url[len(prefix):] if url.startswith(prefix) else ""
+        if path and path != ":memory:" and not os.path.isabs(path):
+            return prefix + os.path.normpath(os.path.join(BACKEND_DIR, path))
+        return url
+
+    @field_validator("CHROMA_PERSIST_DIR")
+    @classmethod
+    def _anchor_chroma_dir(cls, path: str) -> str:
+        return path if os.path.isabs(path) else os.path.normpath(os.path.join(BACKEND_DIR, path))
+
     class Config:
         env_file = ".env"
         extra = "ignore"
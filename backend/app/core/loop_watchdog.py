@@ -0,0 +1,137 @@
+"""
+Event-loop blocking detector.
+
+A heartbeat task sleeps LOOP_WATCHDOG_INTERVAL_MS at a time and measures how late it
+wakes up: that lag is how long something held the loop. A watchdog thread notices a
+late heartbeat once it passes LOOP_WATCHDOG_THRESHOLD_MS and snapshots the loop
+thread's stack while the blocking call is still running. When the heartbeat resumes,
+the full lag is attributed to the innermost app frame of that stack (the call site).
+
+Offenders are aggregated per call site and exported as metrics and through
+GET /admin/loop-blocks. In tests:
+
+    async with LoopWatchdog(threshold_ms=50) as dog:
+        await client.post("/api/v1/chat/message", ...)
+    dog.assert_no_blocking(50)
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+LAG_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_SITES = 200
+STACK_DEPTH = 25
+
+
+def _call_site(frame) -> tuple[str, str, list[str]]:
+    """(innermost app frame, innermost frame, formatted stack) of a blocked loop thread."""
+    summary = traceback.extract_stack(frame, limit=STACK_DEPTH)
+    own = os.path.abspath(__file__)
+
+    def label(f) -> str:
+        path = os.path.relpath(f.filename, os.path.dirname(APP_DIR)) if f.filename.startswith(APP_DIR) else os.path.basename(f.filename)
+        return f"{path}:{f.lineno} in {f.name}"
+
+    leaf = label(summary[-1])
+    site = next((label(f) for f in reversed(summary) if f.filename.startswith(APP_DIR) and f.filename != own), leaf)
+    return site, leaf, [label(f) for f in summary]
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: Optional[float] = None, interval_ms: Optional[float] = None):
+        self.threshold = (threshold_ms or settings.LOOP_WATCHDOG_THRESHOLD_MS) / 1000
+        self.interval = (interval_ms or settings.LOOP_WATCHDOG_INTERVAL_MS) / 1000
+        self.offenders: dict[str, dict] = {}
+        self.worst_ms = 0.0
+        self._seq = 0
+        self._beat_at = time.monotonic()
+        self._captured: Optional[tuple] = None  # (seq, site, leaf, stack), written by the watchdog thread
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def __aenter__(self) -> "LoopWatchdog":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.sleep(self.interval)  # Let a block that just ended be recorded
+        await self.stop()
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._seq += 1
+            self._beat_at = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            metrics.observe("event_loop_lag_ms", lag_ms, buckets=LAG_BUCKETS)
+            if lag_ms >= self.threshold * 1000:
+                self._record(lag_ms)
+
+    def _watch(self):
+        frames = sys._current_frames
+        while not self._stop.wait(min(self.threshold / 4, 0.05)):
+            seq = self._seq
+            stalled = time.monotonic() - self._beat_at - self.interval
+            if stalled < self.threshold or (self._captured and self._captured[0] == seq):
+                continue
+            frame = frames().get(self._loop_thread)
+            if frame is not None:
+                self._captured = (seq, *_call_site(frame))
+            del frame
+
+    def _record(self, lag_ms: float):
+        captured = self._captured
+        if captured and captured[0] == self._seq:
+            _, site, leaf, stack = captured
+        else:
+            # Ended before the watchdog thread looked
+            site, leaf, stack = "unattributed", None, []
+        self.worst_ms = max(self.worst_ms, lag_ms)
+        metrics.inc("event_loop_blocks_total", {"site": site})
+        metrics.inc("event_loop_blocked_ms_total", {"site": site}, lag_ms)
+        entry = self.offenders.get(site)
+        if entry is None:
+            if len(self.offenders) >= MAX_SITES:
+                return
+            entry = self.offenders[site] = {"site": site, "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        entry["count"] += 1
+        entry["total_ms"] += lag_ms
+        if lag_ms >= entry["max_ms"]:
+            entry.update(max_ms=lag_ms, leaf=leaf, stack=stack)
+
+    def report(self, limit: int = 20) -> list[dict]:
+        """Worst call sites first, by total blocked time."""
+        return sorted(self.offenders.values(), key=lambda e: e["total_ms"], reverse=True)[:limit]
+
+    def assert_no_blocking(self, max_ms: float):
+        if self.worst_ms > max_ms:
+            lines = [f"  {e['site']}: max {e['max_ms']:.0f} ms x{e['count']} (leaf: {e.get('leaf')})" for e in self.report(5)]
+            raise AssertionError(f"Event loop blocked for {self.worst_ms:.0f} ms (limit {max_ms:.0f} ms):\n" + "\n".join(lines))
+
+
+watchdog: Optional[LoopWatchdog] = LoopWatchdog() if settings.LOOP_WATCHDOG else None
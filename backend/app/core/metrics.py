@@ -0,0 +1,78 @@
+import bisect
+import threading
+from typing import Optional
+
+DEFAULT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _key(labels: Optional[dict]) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.n += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.n,
+            "sum": self.total,
+            "buckets": {str(b): c for b, c in zip(list(self.buckets) + ["+Inf"], self.counts)},
+        }
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process counters, gauges and histograms with label sets.
+    Values are per worker; exposed through the admin metrics endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._gauges: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, _Histogram]] = {}
+
+    def inc(self, name: str, labels: Optional[dict] = None, value: float = 1.0):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _key(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[dict] = None):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None, buckets: tuple = DEFAULT_BUCKETS):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _key(labels)
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def counter_value(self, name: str, labels: Optional[dict] = None) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_key(labels), 0.0)
+
+    def snapshot(self) -> dict:
+        def fmt(series: dict, render) -> list:
+            return [{"labels": dict(k), "value": render(v)} for k, v in series.items()]
+
+        with self._lock:
+            return {
+                "counters": {n: fmt(s, lambda v: v) for n, s in self._counters.items()},
+                "gauges": {n: fmt(s, lambda v: v) for n, s in self._gauges.items()},
+                "histograms": {n: fmt(s, lambda h: h.snapshot()) for n, s in self._histograms.items()},
+            }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,105 @@
+"""
+Sampling profiler for a single request.
+
+A daemon thread snapshots every thread's Python stack (`sys._current_frames`) each
+PROFILE_INTERVAL_MS and counts them as collapsed stacks ("root;frame;...;leaf count"),
+the input format of flamegraph.pl, inferno and speedscope. The profiled code is not
+instrumented, so the overhead is one stack walk per thread per interval.
+
+Each stack is rooted at where it ran:
+  - "loop:request"     the event loop while this request's task was running
+  - "loop:other"       the event loop running some other request's task
+  - "thread:<name>"    executor threads: SymPy and Chroma (asyncio_*), embeddings
+                       (embed_*), upstream LLM calls (llm_*)
+Executor threads are shared by the worker, so under concurrency their samples may
+include other requests' work. Idle threads (waiting for work or for the selector)
+are not sampled.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from app.core.config import settings
+
+MAX_DEPTH = 128
+# Leaf frames of threads that are parked, not working
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfiler:
+    def __init__(self, interval_ms: Optional[float] = None):
+        self.interval = (interval_ms or settings.PROFILE_INTERVAL_MS) / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration_ms = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._tasks = {asyncio.current_task()}
+        self._loop_thread = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def track(self, task: asyncio.Task):
+        """Counts `task` as part of the request (work handed to another task, e.g. a streamed reply)."""
+        self._tasks.add(task)
+
+    def stop(self) -> "RequestProfiler":
+        if self._thread is None or self._stop.is_set():
+            return self
+        self._stop.set()
+        self._thread.join()
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        return self
+
+    def _run(self):
+        names = {}
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                    continue
+                if ident == self._loop_thread:
+                    root = "loop:request" if asyncio.current_task(self._loop) in self._tasks else "loop:other"
+                else:
+                    if ident not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    root = f"thread:{names.get(ident, ident)}"
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(root)
+                self.stacks[";".join(reversed(stack))] += 1
+            del frame
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def hot_spots(self, limit: int = 5) -> list[dict]:
+        """Leaf frames by share of the request's non-idle samples (self time)."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{"frame": frame, "share": round(count / total, 3)} for frame, count in leaves.most_common(limit)]
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from jose import jwt, JWTError
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.redis_store import get_redis, redis_storage_uri
+
+
+def user_or_ip_key(request: Request) -> str:
+    """
+    Rate limit key: the authenticated user id from the bearer token, or the client IP.
+    The token is only decoded here (no DB hit); the endpoint dependencies still validate it.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        try:
+            payload = jwt.decode(
+                auth_header.split(" ", 1)[1], settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+# Single limiter shared by every router. With Redis, `limits` keeps the counters
+# in Redis using its atomic Lua scripts, so all workers/replicas share one budget.
+limiter = Limiter(
+    key_func=user_or_ip_key,
+    storage_uri=redis_storage_uri(),
+    strategy=settings.RATE_LIMIT_STRATEGY,
+    key_prefix="cirser:rl",
+    in_memory_fallback_enabled=True,
+)
+
+
+# KEYS[1] = per-user daily bucket, ARGV = prompt tokens, completion tokens, ttl seconds
+_QUOTA_SCRIPT = """
+local calls = redis.call('HINCRBY', KEYS[1], 'calls', 1)
+local prompt = redis.call('HINCRBY', KEYS[1], 'prompt_tokens', ARGV[1])
+local completion = redis.call('HINCRBY', KEYS[1], 'completion_tokens', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {calls, prompt, completion}
+"""
+
+
+class QuotaTracker:
+    """
+    Per-user accounting of upstream LLM calls and tokens, bucketed by UTC day.
+    Uses an atomic Redis script when Redis is available, a locked dict otherwise.
+    The Redis client is synchronous: from the event loop use the a* methods, which
+    run the calls in a thread.
+    """
+
+    def __init__(self):
+        self._local: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._script = None
+
+    def _bucket(self, user_id) -> str:
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        return f"cirser:quota:{user_id}:{day}"
+
+    def record(self, user_id, prompt_tokens: int = 0, completion_tokens: int = 0) -> dict:
+        key = self._bucket(user_id)
+        prompt_tokens = int(prompt_tokens or 0)
+        completion_tokens = int(completion_tokens or 0)
+
+        client = get_redis()
+        if client is not None:
+            try:
+                if self._script is None:
+                    self._script = client.register_script(_QUOTA_SCRIPT)
+                ttl = settings.QUOTA_RETENTION_DAYS * 86400
+                calls, prompt, completion = self._script(keys=[key], args=[prompt_tokens, completion_tokens, ttl])
+                return {"calls": int(calls), "prompt_tokens": int(prompt), "completion_tokens": int(completion)}
+            except Exception as e:
+                print(f"WARNING: Quota accounting fell back to local storage: {e}")
+
+        with self._lock:
+            bucket = self._local.setdefault(key, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            bucket["calls"] += 1
+            bucket["prompt_tokens"] += prompt_tokens
+            bucket["completion_tokens"] += completion_tokens
+            return dict(bucket)
+
+    def usage(self, user_id) -> dict:
+        key = self._bucket(user_id)
+        client = get_redis()
+        if client is not None:
+            try:
+                raw = client.hgetall(key)
+                return {
+                    "calls": int(raw.get(b"calls", 0)),
+                    "prompt_tokens": int(raw.get(b"prompt_tokens", 0)),
+                    "completion_tokens": int(raw.get(b"completion_tokens", 0)),
+                }
+            except Exception as e:
+                print(f"WARNING: Quota lookup fell back to local storage: {e}")
+
+        with self._lock:
+            return dict(self._local.get(key, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}))
+
+    def enforce(self, user_id):
+        """Raises 429 once the user's daily token budget (if configured) is spent."""
+        if not settings.LLM_DAILY_TOKEN_QUOTA:
+            return
+        used = self.usage(user_id)
+        if used["prompt_tokens"] + used["completion_tokens"] >= settings.LLM_DAILY_TOKEN_QUOTA:
+            raise HTTPException(status_code=429, detail="Daily LLM token quota exhausted.")
+
+    async def arecord(self, user_id, prompt_tokens: int = 0, completion_tokens: int = 0) -> dict:
+        return await asyncio.to_thread(self.record, user_id, prompt_tokens, completion_tokens)
+
+    async def aenforce(self, user_id):
+        await asyncio.to_thread(self.enforce, user_id)
+
+
+quota = QuotaTracker()
@@ -0,0 +1,34 @@
+from typing import Optional
+from app.core.config import settings
+
+_client = None
+_checked = False
+
+
+def get_redis():
+    """
+    Returns a shared Redis client, or None when REDIS_URL is unset or unreachable.
+    The result is cached so a missing Redis is only probed once per process.
+    """
+    global _client, _checked
+    if _checked:
+        return _client
+    _checked = True
+
+    if not settings.REDIS_URL:
+        return None
+
+    try:
+        import redis
+        client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        client.ping()
+        _client = client
+    except Exception as e:
+        print(f"WARNING: Redis unavailable at {settings.REDIS_URL}, using local storage. ({e})")
+        _client = None
+    return _client
+
+
+def redis_storage_uri() -> Optional[str]:
+    """Storage URI for `limits`/slowapi: Redis when reachable, in-process memory otherwise."""
+    return settings.REDIS_URL if get_redis() is not None else "memory://"
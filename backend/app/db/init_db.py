@@ -2,7 +2,10 @@ from app.api.deps import engine
 from app.db.base_class import Base
 from app.db.base_class import Base
 from app.models.user import User
-from app.models.chat import ChatSession, ChatMessage
+from app.models.chat import ChatSession, ChatMessage, ChatSessionArchive, ChatSessionRestore
+from app.models.profile import RequestProfile
+from app.models.batch import BatchJob, BatchItem
+from app.models.corpus import RuleCorpusVersion
 
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -1,13 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.v1.endpoints import auth, chat, simulation, ai_proxy
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from app.api.v1.endpoints import auth, chat, simulation, ai_proxy, admin
+from app.core.rate_limit import limiter
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-limiter = Limiter(key_func=get_remote_address)
-
 app = FastAPI(title=settings.PROJECT_NAME)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -17,6 +15,42 @@ from app.db.init_db import init_db
 @app.on_event("startup")
 def startup_event():
     init_db()
+    from app.services.reasoning.engine import engine
+    from app.services.rag import corpus
+    try:
+        version = corpus.active_version()
+        if version:
+            engine.swap_corpus(corpus.load_snapshot(version, engine.retriever.embedding_fn))
+    except Exception as e:
+        print(f"WARNING: Could not load the active rule corpus, serving {engine.corpus.label}: {e}")
+    if settings.WARMUP_ON_START:
+        engine.warmup()
+
+@app.on_event("startup")
+async def start_corpus_watcher():
+    import asyncio
+    from app.services.reasoning.engine import engine
+    from app.services.rag.corpus import corpus_watcher
+    app.state.corpus_task = asyncio.create_task(corpus_watcher(engine))
+
+@app.on_event("startup")
+async def start_loop_watchdog():
+    from app.core.loop_watchdog import watchdog
+    if watchdog is not None:
+        watchdog.start()
+
+@app.on_event("startup")
+async def start_batch_worker():
+    import asyncio
+    from app.services.batch.runner import batch_worker
+    app.state.batch_task = asyncio.create_task(batch_worker())
+
+@app.on_event("startup")
+async def start_retention_worker():
+    if settings.HISTORY_ARCHIVE_AFTER_DAYS > 0:
+        import asyncio
+        from app.services.history.archive import retention_worker
+        app.state.retention_task = asyncio.create_task(retention_worker())
 
 # CORS Policy
 origins = [
@@ -37,6 +71,9 @@ app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["cha
 from app.api.v1.endpoints import chat_history
 app.include_router(chat_history.router, prefix=f"{settings.API_V1_STR}/history", tags=["history"])
 app.include_router(simulation.router, prefix=f"{settings.API_V1_STR}/simulation", tags=["simulation"])
+from app.api.v1.endpoints import batch
+app.include_router(batch.router, prefix=f"{settings.API_V1_STR}/batch", tags=["batch"])
+app.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["admin"])
 app.include_router(ai_proxy.router, prefix="/v1", tags=["ai-proxy"]) # Mimics the external service URL structure
 
 @app.get("/")
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+import uuid
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued", index=True) # queued, running, done, cancelled
+    scope = Column(JSON, nullable=True) # Retrieval filters for every item
+    total = Column(Integer, nullable=False)
+    # Worker holding the job; another may take it over once lease_expires_at has passed
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    items = relationship("BatchItem", back_populates="job", cascade="all, delete-orphan", order_by="BatchItem.position")
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, ForeignKey("batch_jobs.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    query = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending") # pending, running, done, error
+    result = Column(JSON, nullable=True) # ReasoningEngine response, as /chat/message returns it
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    job = relationship("BatchJob", back_populates="items")
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.sql import func
 from app.db.base_class import Base
+from datetime import datetime, timezone
 import uuid
 
 def generate_uuid():
@@ -21,6 +22,10 @@ class ChatSession(Base):
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
     # user relationship assumed in User model or backref here if needed
 
+    def touch(self):
+        # Set client-side: SQLite's CURRENT_TIMESTAMP has one-second resolution, too coarse for ETags
+        self.updated_at = datetime.now(timezone.utc)
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -39,3 +44,19 @@ class ChatMessage(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     session = relationship("ChatSession", back_populates="messages")
+
+class ChatSessionArchive(Base):
+    """Messages of a cold session, gzip-compressed NDJSON; the ChatSession row stays in place."""
+    __tablename__ = "chat_session_archives"
+
+    session_id = Column(String, ForeignKey("chat_sessions.id"), primary_key=True)
+    message_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ChatSessionRestore(Base):
+    """Last time a session was restored from its archive; the retention worker leaves it live until idle again."""
+    __tablename__ = "chat_session_restores"
+
+    session_id = Column(String, ForeignKey("chat_sessions.id"), primary_key=True)
+    restored_at = Column(DateTime(timezone=True), nullable=False)
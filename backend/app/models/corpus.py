@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class RuleCorpusVersion(Base):
+    __tablename__ = "rule_corpus_versions"
+
+    version = Column(String, primary_key=True) # Hash of the rules and the partition layout
+    status = Column(String, nullable=False, default="building", index=True) # building, ready, active, retired, failed
+    collection = Column(String, nullable=False) # Chroma collection (prefix of its partitions)
+    partition_by = Column(String, nullable=True)
+    rule_count = Column(Integer, nullable=False)
+    library = Column(JSON, nullable=True) # Precompiled rule equations (rule_library.build_library)
+    validation = Column(JSON, nullable=True) # What the build checked before marking it ready
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
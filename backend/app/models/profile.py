@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+import uuid
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+class RequestProfile(Base):
+    __tablename__ = "request_profiles"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    session_id = Column(String, index=True)
+    duration_ms = Column(Float, nullable=False)
+    samples = Column(Integer, nullable=False)
+    # gzip-compressed collapsed stacks ("root;frame;...;leaf count" per line)
+    collapsed = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Any, Dict
+from datetime import datetime
+
+class BatchJobCreate(BaseModel):
+    queries: List[str] = Field(min_length=1)
+    # Restrict rule retrieval for every query (see ChatRequest)
+    domain: Optional[str] = None
+    category: Optional[str] = None
+
+class BatchItem(BaseModel):
+    position: int
+    query: str
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchJob(BaseModel):
+    id: str
+    status: str
+    total: int
+    completed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    items: List[BatchItem] = []
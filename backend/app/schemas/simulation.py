@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Dict, Any
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
 class SimulationParams(BaseModel):
     params: Dict[str, float]
@@ -8,3 +8,71 @@ class SimulationState(BaseModel):
     nodes: list = []
     branches: list = []
     params: Dict[str, float] = {}
+    outputs: Dict[str, Any] = {}  # Live channel: value (+ value_imag, magnitude, phase_deg), compute_ms
+
+# --- Netlist / MNA ---
+class NetlistElement(BaseModel):
+    name: str                      # "R1", "V1", "E1" ... (first letter is the kind)
+    kind: str                      # R, L, C, V, I, E (VCVS), G (VCCS), F (CCCS), H (CCVS)
+    nodes: List[str]               # [n+, n-] or [n+, n-, nc+, nc-] for E/G
+    value: float                   # Ohms, Henry, Farad, Volt, Ampere or gain
+    control: Optional[str] = None  # Controlling voltage source for F/H
+
+class MNARequest(BaseModel):
+    netlist: Optional[str] = None  # SPICE-like text, alternative to `elements`
+    elements: List[NetlistElement] = []
+    frequency: float = 0.0         # Hz; 0 = DC operating point
+    ground: str = "0"
+
+class MNAResult(BaseModel):
+    frequency: float
+    node_voltages: Dict[str, float]
+    node_voltages_imag: Dict[str, float] = {}
+    branch_currents: Dict[str, float]
+    branch_currents_imag: Dict[str, float] = {}
+    size: int
+    solve_ms: float
+
+# --- AC Sweep ---
+class SweepRequest(BaseModel):
+    expression: str                       # In s (= jω), w/omega (rad/s) or f (Hz), e.g. "R + 1/(s*C)"
+    params: Dict[str, float] = {}         # Component values substituted before evaluation
+    f_start: float = Field(1.0, gt=0)
+    f_stop: float = Field(1e6, gt=0)
+    points: int = Field(1000, ge=2, le=200_000)
+    max_points: Optional[int] = Field(None, ge=2)  # Decimate the returned arrays to at most this many samples
+    decimation: str = "peak"              # "peak" keeps per-bucket min/max, "stride" keeps every k-th sample
+
+class SweepResult(BaseModel):
+    frequency: List[float]
+    magnitude: List[Optional[float]]      # null where the grid hits a pole
+    magnitude_db: List[Optional[float]]
+    phase_deg: List[Optional[float]]
+    points_evaluated: int
+    eval_ms: float
+
+# --- Two-Port ---
+class TwoPortSection(BaseModel):
+    kind: str                             # series, shunt, t, pi, bridge_t
+    impedances: List[str]                 # Expressions in s/w/f; t/pi: [Z1, Z2, Z3], bridge_t: [Z1, Z2, Z3, Z4]
+
+class TwoPortRequest(BaseModel):
+    sections: List[TwoPortSection]        # Input to output
+    params: Dict[str, float] = {}
+    repeat: int = Field(1, ge=1, le=10_000)  # Cascade the whole chain this many times
+    f_start: float = Field(1.0, gt=0)
+    f_stop: float = Field(1e6, gt=0)
+    points: int = Field(1000, ge=2, le=50_000)
+    parameters: str = "abcd"              # abcd, z, y or s
+    z0: float = Field(50.0, gt=0)         # S-parameter reference impedance
+    load: Optional[str] = None            # Port-2 termination for gain / input impedance ("inf" = open)
+
+class TwoPortResult(BaseModel):
+    frequency: List[float]
+    parameters: str
+    real: Dict[str, List[Optional[float]]]     # Keyed A..D, Z11..Z22, Y11..Y22 or S11..S22
+    imag: Dict[str, List[Optional[float]]]
+    input_impedance_real: Optional[List[Optional[float]]] = None
+    input_impedance_imag: Optional[List[Optional[float]]] = None
+    gain_db: Optional[List[Optional[float]]] = None
+    compute_ms: float
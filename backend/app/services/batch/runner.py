@@ -0,0 +1,219 @@
+"""
+Batch job runner.
+
+Every worker process runs `batch_worker`, which claims queued jobs (and jobs whose
+lease ran out, i.e. whose worker died) by a conditional UPDATE of the lease, so a
+job is only ever run by one worker. Items run through ReasoningEngine with
+BATCH_ITEM_CONCURRENCY per job under one `engine.shared_cache()`, so duplicate
+queries and repeated prompts or retrievals within a job are computed once. Each
+item's result is committed as soon as it finishes; a resumed job only runs the
+items that never finished.
+
+Items yield to interactive traffic: an item rejected by admission control, or by
+the AI proxy's per-user rate limit, waits out Retry-After (or an exponential
+backoff) and tries again instead of failing. Waits end early when the job is
+cancelled or its lease is lost; the item is then left pending for the resume.
+"""
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, update
+
+from app.api import deps
+from app.core import security
+from app.core.admission import AdmissionRejected, UpstreamRateLimited
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.batch import BatchItem, BatchJob
+from app.services.reasoning.engine import engine
+
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "error")
+
+_wake: Optional[asyncio.Event] = None
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def wake():
+    """Claims new work now instead of at the next poll (called after a job is submitted)."""
+    if _wake is not None:
+        _wake.set()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _claim(limit: int) -> list[tuple[str, int, Optional[dict]]]:
+    db = deps.SessionLocal()
+    try:
+        now = _now()
+        claimable = (BatchJob.status.in_(ACTIVE), or_(BatchJob.lease_expires_at.is_(None), BatchJob.lease_expires_at < now))
+        candidates = db.query(BatchJob.id, BatchJob.user_id, BatchJob.scope).filter(*claimable).order_by(BatchJob.created_at).limit(limit).all()
+        claimed = []
+        for job_id, user_id, scope in candidates:
+            taken = db.execute(
+                update(BatchJob).where(BatchJob.id == job_id, *claimable).values(
+                    status="running", lease_owner=worker_id(), lease_expires_at=now + timedelta(seconds=settings.BATCH_LEASE_S),
+                )
+            ).rowcount
+            if taken:
+                # Items a dead worker had started are run again; finished ones are kept
+                db.execute(update(BatchItem).where(BatchItem.job_id == job_id, BatchItem.status == "running").values(status="pending"))
+                claimed.append((job_id, user_id, scope))
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _renew(job_id: str) -> Optional[str]:
+    """Extends the lease; returns the job's status, or None when another worker took it over."""
+    db = deps.SessionLocal()
+    try:
+        renewed = db.execute(
+            update(BatchJob).where(BatchJob.id == job_id, BatchJob.lease_owner == worker_id()).values(
+                lease_expires_at=_now() + timedelta(seconds=settings.BATCH_LEASE_S),
+            )
+        ).rowcount
+        db.commit()
+        return db.query(BatchJob.status).filter(BatchJob.id == job_id).scalar() if renewed else None
+    finally:
+        db.close()
+
+
+def _pending_items(job_id: str) -> list[tuple[int, str]]:
+    db = deps.SessionLocal()
+    try:
+        return db.query(BatchItem.id, BatchItem.query).filter(
+            BatchItem.job_id == job_id, BatchItem.status.notin_(FINISHED)
+        ).order_by(BatchItem.position).all()
+    finally:
+        db.close()
+
+
+def _set_item(item_id: int, **values):
+    db = deps.SessionLocal()
+    try:
+        db.execute(update(BatchItem).where(BatchItem.id == item_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _finish_job(job_id: str):
+    db = deps.SessionLocal()
+    try:
+        db.execute(
+            update(BatchJob).where(BatchJob.id == job_id, BatchJob.lease_owner == worker_id(), BatchJob.status == "running")
+            .values(status="done", finished_at=_now(), lease_owner=None, lease_expires_at=None)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _backoff(stopped: asyncio.Event, delay: float) -> bool:
+    """Waits `delay` seconds; False when the job was stopped meanwhile."""
+    try:
+        await asyncio.wait_for(stopped.wait(), timeout=delay)
+        return False
+    except asyncio.TimeoutError:
+        return True
+
+
+async def _run_item(item_id: int, query: str, token: str, scope: Optional[dict], stopped: asyncio.Event):
+    await asyncio.to_thread(_set_item, item_id, status="running")
+    rate_limited = 0
+    while True:
+        try:
+            response = await engine.process_user_intent(query, token, scope=scope)
+            break
+        except AdmissionRejected as e:
+            if isinstance(e, UpstreamRateLimited):
+                rate_limited += 1
+                if rate_limited > settings.BATCH_RATE_LIMIT_RETRIES:
+                    response = {"status": "error", "message": f"Rate limited: {e.detail}"}
+                    break
+            retry_after = (e.headers or {}).get("Retry-After")
+            delay = float(retry_after) if retry_after else min(2 ** rate_limited, settings.BATCH_BACKOFF_MAX_S)
+            metrics.inc("batch_item_retries_total", {"reason": "rate_limited" if isinstance(e, UpstreamRateLimited) else "admission"})
+            if not await _backoff(stopped, delay):
+                await asyncio.to_thread(_set_item, item_id, status="pending")
+                return
+        except Exception as e:
+            response = {"status": "error", "message": f"Server Logic Error: {str(e)}"}
+            break
+    ok = response.get("status") == "success"
+    await asyncio.to_thread(
+        _set_item, item_id, status="done" if ok else "error", result=response,
+        error=None if ok else response.get("message"), finished_at=_now(),
+    )
+    metrics.inc("batch_items_total", {"outcome": "done" if ok else "error"})
+
+
+async def run_job(job_id: str, user_id: int, scope: Optional[dict]):
+    token = security.create_access_token(user_id)  # Fresh on every (re)start: nothing secret is stored
+    items = await asyncio.to_thread(_pending_items, job_id)
+    gate = asyncio.Semaphore(settings.BATCH_ITEM_CONCURRENCY)
+    stopped = asyncio.Event()
+
+    async def keep_lease():
+        while True:
+            await asyncio.sleep(settings.BATCH_LEASE_S / 3)
+            if await asyncio.to_thread(_renew, job_id) != "running":
+                stopped.set()  # Cancelled, or the lease was lost
+                return
+
+    async def one(item_id: int, query: str):
+        async with gate:
+            if not stopped.is_set():
+                await _run_item(item_id, query, token, scope, stopped)
+
+    renewer = asyncio.create_task(keep_lease())
+    try:
+        with engine.shared_cache():
+            await asyncio.gather(*(one(item_id, query) for item_id, query in items))
+    finally:
+        renewer.cancel()
+    if not stopped.is_set():
+        await asyncio.to_thread(_finish_job, job_id)
+        metrics.inc("batch_jobs_total", {"outcome": "done"})
+
+
+async def batch_worker():
+    """Claims and runs up to BATCH_MAX_JOBS jobs at a time in this worker."""
+    global _wake
+    _wake = asyncio.Event()
+    running: dict[str, asyncio.Task] = {}
+
+    def finished(job_id: str, task: asyncio.Task):
+        running.pop(job_id, None)
+        if not task.cancelled() and task.exception():
+            print(f"WARNING: Batch job {job_id} stopped: {task.exception()} (resumed once its lease expires)")
+        _wake.set()
+
+    while True:
+        _wake.clear()
+        slots = settings.BATCH_MAX_JOBS - len(running)
+        if slots > 0:
+            try:
+                claimed = await asyncio.to_thread(_claim, slots)
+            except Exception as e:
+                print(f"WARNING: Batch job claim failed: {e}")
+                claimed = []
+            for job_id, user_id, scope in claimed:
+                task = asyncio.create_task(run_job(job_id, user_id, scope))
+                running[job_id] = task
+                task.add_done_callback(lambda t, j=job_id: finished(j, t))
+        metrics.set_gauge("batch_jobs_running", float(len(running)))
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=settings.BATCH_POLL_S)
+        except asyncio.TimeoutError:
+            pass
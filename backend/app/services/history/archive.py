@@ -0,0 +1,148 @@
+"""
+Set-based session deletion and the retention worker.
+
+Cold sessions (idle for HISTORY_ARCHIVE_AFTER_DAYS) keep their ChatSession row, so
+listings, titles and ETags are unchanged, but their messages move into one
+gzip-compressed NDJSON ChatSessionArchive row and leave chat_messages. Any access
+that needs the messages calls `restore_session` first, which moves them back and
+records the restore, so a viewed session is only archived again once it has been
+idle for HISTORY_ARCHIVE_AFTER_DAYS since.
+"""
+import asyncio
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.chat import ChatMessage, ChatSession, ChatSessionArchive, ChatSessionRestore
+
+MESSAGE_COLUMNS = (
+    ChatMessage.id, ChatMessage.session_id, ChatMessage.role,
+    ChatMessage.content, ChatMessage.meta_audit, ChatMessage.created_at,
+)
+
+
+def message_record(id, session_id, role, content, meta_audit, created_at) -> dict:
+    """NDJSON record of a message (shared by the export and the archive payload)."""
+    return {
+        "type": "message", "id": id, "session_id": session_id, "role": role,
+        "content": content, "meta_audit": meta_audit,
+        "created_at": created_at.isoformat() if created_at else None,
+    }
+
+
+def archived_messages(payload: bytes) -> list[dict]:
+    return [json.loads(line) for line in gzip.decompress(payload).splitlines() if line]
+
+
+def delete_sessions(db: Session, user_id: int, session_ids: list[str]) -> int:
+    """Deletes the user's sessions among `session_ids` with one statement per table; returns how many."""
+    owned = select(ChatSession.id).where(ChatSession.user_id == user_id, ChatSession.id.in_(session_ids))
+    db.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(owned)))
+    db.execute(delete(ChatSessionArchive).where(ChatSessionArchive.session_id.in_(owned)))
+    db.execute(delete(ChatSessionRestore).where(ChatSessionRestore.session_id.in_(owned)))
+    deleted = db.execute(
+        delete(ChatSession).where(ChatSession.user_id == user_id, ChatSession.id.in_(session_ids))
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+def restore_session(db: Session, session_id: str) -> bool:
+    """Moves an archived session's messages back into chat_messages; False when it was not archived."""
+    payload = db.execute(
+        select(ChatSessionArchive.payload).where(ChatSessionArchive.session_id == session_id)
+    ).scalar()
+    if payload is None:
+        return False
+    # Deleting first makes a concurrent restore of the same session a no-op
+    if not db.execute(delete(ChatSessionArchive).where(ChatSessionArchive.session_id == session_id)).rowcount:
+        db.rollback()
+        return False
+    rows = []
+    for record in archived_messages(payload):
+        record.pop("type")
+        record["created_at"] = datetime.fromisoformat(record["created_at"]) if record["created_at"] else None
+        rows.append(record)
+    if rows:
+        db.execute(insert(ChatMessage), rows)
+    db.merge(ChatSessionRestore(session_id=session_id, restored_at=datetime.now(timezone.utc)))
+    db.commit()
+    metrics.inc("history_archive_total", {"action": "restore"})
+    return True
+
+
+def archive_session(db: Session, session_id: str) -> int:
+    """Compresses the session's messages into an archive row and deletes them; returns the count."""
+    rows = db.execute(
+        select(*MESSAGE_COLUMNS).where(ChatMessage.session_id == session_id).order_by(ChatMessage.id)
+    ).all()
+    if not rows:
+        return 0
+    payload = gzip.compress("".join(json.dumps(message_record(*r), default=str) + "\n" for r in rows).encode())
+    db.add(ChatSessionArchive(session_id=session_id, message_count=len(rows), payload=payload))
+    # Bounded by the last archived id: a message posted meanwhile stays live
+    db.execute(delete(ChatMessage).where(ChatMessage.session_id == session_id, ChatMessage.id <= rows[-1].id))
+    return len(rows)
+
+
+def archive_batch(cutoff: datetime, limit: int) -> int:
+    """Archives up to `limit` sessions idle since `cutoff` in one transaction; returns how many."""
+    db = deps.SessionLocal()
+    try:
+        candidates = db.execute(
+            select(ChatSession.id)
+            .where(
+                func.coalesce(ChatSession.updated_at, ChatSession.created_at) < cutoff,
+                ~exists().where(ChatSessionArchive.session_id == ChatSession.id),
+                ~exists().where(ChatSessionRestore.session_id == ChatSession.id, ChatSessionRestore.restored_at >= cutoff),
+                exists().where(ChatMessage.session_id == ChatSession.id),
+            )
+            .limit(limit)
+            .with_for_update(skip_locked=True)  # Postgres: workers sweeping together split the work
+        ).scalars().all()
+        messages = sum(archive_session(db, session_id) for session_id in candidates)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    metrics.inc("history_archive_total", {"action": "archive"}, len(candidates))
+    metrics.inc("history_archived_messages_total", value=messages)
+    return len(candidates)
+
+
+def _busy() -> bool:
+    # Every LLM slot taken: live traffic has priority over archival
+    return admission is not None and admission.in_flight >= admission.limit
+
+
+async def retention_worker(stop: Optional[asyncio.Event] = None):
+    """Archives cold sessions in HISTORY_ARCHIVE_BATCH-sized transactions, paced and off the event loop."""
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        pause = settings.HISTORY_ARCHIVE_PAUSE_S
+        if not _busy():
+            cutoff = datetime.now(timezone.utc) - timedelta(days=settings.HISTORY_ARCHIVE_AFTER_DAYS)
+            start = time.perf_counter()
+            try:
+                done = await asyncio.to_thread(archive_batch, cutoff, settings.HISTORY_ARCHIVE_BATCH)
+            except Exception as e:
+                print(f"WARNING: History archival batch failed: {e}")
+                done = 0
+            metrics.observe("history_archive_batch_ms", (time.perf_counter() - start) * 1000)
+            if done < settings.HISTORY_ARCHIVE_BATCH:
+                pause = settings.HISTORY_ARCHIVE_SWEEP_S
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=pause)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,382 @@
+"""
+Upstream model pool with per-phase hedging and per-model circuit breakers.
+
+LLM_MODEL_POOL lists endpoints in preference order, comma separated:
+
+    Qwen/Qwen2.5-72B-Instruct, meta-llama/Meta-Llama-3-8B-Instruct@together, local@http://127.0.0.1:9001
+
+"model" uses the default Hugging Face provider, "model@provider" an Inference
+Provider, and "model@http(s)://..." any OpenAI-compatible server.
+
+A call goes to the first endpoint whose breaker is closed. If it has not answered
+after the observed p95 latency of its phase, a hedged duplicate goes to the next
+endpoint and the first successful answer wins; an error fails over immediately.
+Losing calls are abandoned, not interrupted: the sync client finishes in its thread
+and the answer is discarded.
+
+`stream()` relays a completion token by token. It fails over to the next endpoint
+only while nothing has been relayed yet, and is not hedged: once tokens flow, the
+first-token latency has already been paid.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from huggingface_hub import InferenceClient
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+LATENCY_WINDOW = 200  # Successful calls per phase kept for the p95 estimate
+# Dedicated threads: abandoned hedge losers keep theirs until they return, and the
+# default executor (cpu + 4 threads) would queue new calls behind them
+CALL_THREADS = 64
+
+
+@dataclass
+class ModelEndpoint:
+    name: str
+    model: str
+    provider: Optional[str] = None
+    base_url: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "ModelEndpoint":
+        model, _, target = spec.strip().partition("@")
+        if target.startswith(("http://", "https://")):
+            return cls(spec.strip(), model, base_url=target)
+        return cls(spec.strip(), model, provider=target or None)
+
+
+@dataclass
+class Completion:
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    model: str
+    finish_reason: Optional[str] = None
+    hedged: bool = False
+
+
+class UpstreamError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive 5xx/connection failures and rejects calls
+    for `cooldown_s`; then lets one trial call through (half-open).
+    """
+
+    def __init__(self, threshold: int, cooldown_s: float):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown_s else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def success(self):
+        self.failures, self.opened_at, self.trial_in_flight = 0, None, False
+
+    def failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class ModelPool:
+    def __init__(self, endpoints: list[ModelEndpoint], api_key: Optional[str] = None, hedge: bool = True):
+        if not endpoints:
+            raise ValueError("LLM_MODEL_POOL is empty")
+        self.endpoints = endpoints
+        self.api_key = api_key
+        self.hedge = hedge
+        self.breakers = {
+            e.name: CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_COOLDOWN_S) for e in endpoints
+        }
+        self._latencies: dict[str, deque] = {}
+        self._clients: dict[str, InferenceClient] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None  # Created on first call, i.e. after fork
+
+    @classmethod
+    def from_settings(cls, api_key: Optional[str] = None) -> "ModelPool":
+        specs = [s for s in settings.LLM_MODEL_POOL.split(",") if s.strip()]
+        return cls([ModelEndpoint.parse(s) for s in specs], api_key, settings.LLM_HEDGE)
+
+    def hedge_delay(self, phase: str) -> float:
+        """Observed p95 of the phase, or LLM_HEDGE_DEFAULT_S until enough samples exist."""
+        window = self._latencies.get(phase)
+        if not window or len(window) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_S
+        ordered = sorted(window)
+        return max(settings.LLM_HEDGE_MIN_DELAY_S, ordered[int(len(ordered) * 0.95) - 1])
+
+    def _client(self, endpoint: ModelEndpoint) -> InferenceClient:
+        client = self._clients.get(endpoint.name)
+        if client is None:
+            if endpoint.base_url:
+                client = InferenceClient(base_url=endpoint.base_url, api_key=self.api_key, timeout=settings.LLM_TIMEOUT_S)
+            else:
+                client = InferenceClient(provider=endpoint.provider, token=self.api_key, timeout=settings.LLM_TIMEOUT_S)
+            self._clients[endpoint.name] = client
+        return client
+
+    def _call_sync(self, endpoint: ModelEndpoint, messages: list, max_tokens: int, temperature: float,
+                   stop: Optional[list[str]]) -> Completion:
+        try:
+            response = self._client(endpoint).chat_completion(
+                model=None if endpoint.base_url else endpoint.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stop=stop,
+                top_p=0.9,
+            )
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            raise UpstreamError(f"{endpoint.name}: {e}", status)
+        usage = getattr(response, "usage", None)
+        return Completion(
+            content=response.choices[0].message.content,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            model=endpoint.name,
+            finish_reason=getattr(response.choices[0], "finish_reason", None),
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=CALL_THREADS, thread_name_prefix="llm")
+        return self._executor
+
+    def _failed(self, endpoint: ModelEndpoint, error: UpstreamError):
+        breaker = self.breakers[endpoint.name]
+        # 4xx (bad request, auth, rate limit) says nothing about the model's health
+        if error.status_code is None or error.status_code >= 500:
+            breaker.failure()
+        else:
+            breaker.success()
+        metrics.inc("llm_model_calls_total", {"model": endpoint.name, "outcome": "error"})
+        metrics.set_gauge("llm_breaker_open", float(breaker.state != "closed"), {"model": endpoint.name})
+
+    def _succeeded(self, endpoint: ModelEndpoint, phase: str, elapsed: float):
+        self.breakers[endpoint.name].success()
+        self._latencies.setdefault(phase, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+        metrics.inc("llm_model_calls_total", {"model": endpoint.name, "outcome": "success"})
+        metrics.observe("llm_call_ms", elapsed * 1000, {"model": endpoint.name})
+        metrics.set_gauge("llm_breaker_open", 0.0, {"model": endpoint.name})
+
+    async def _call(self, endpoint: ModelEndpoint, messages: list, max_tokens: int, temperature: float,
+                    stop: Optional[list[str]], phase: str) -> Completion:
+        start = time.monotonic()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._call_sync, endpoint, messages, max_tokens, temperature, stop
+            )
+        except asyncio.CancelledError:
+            self.breakers[endpoint.name].trial_in_flight = False  # Lost a hedge race: no verdict on the model
+            raise
+        except UpstreamError as e:
+            self._failed(endpoint, e)
+            raise
+        self._succeeded(endpoint, phase, time.monotonic() - start)
+        return result
+
+    async def complete(self, messages: list, max_tokens: int = 512, temperature: float = 0.1,
+                       phase: str = "unknown", stop: Optional[list[str]] = None) -> Completion:
+        """First successful completion across the pool; raises UpstreamError when every endpoint failed."""
+        queue = list(self.endpoints)
+        running: dict[asyncio.Task, ModelEndpoint] = {}
+        launched: list[ModelEndpoint] = []
+        last_error: Optional[UpstreamError] = None
+
+        def launch() -> bool:
+            while queue:
+                endpoint = queue.pop(0)
+                if self.breakers[endpoint.name].allow():
+                    task = asyncio.create_task(self._call(endpoint, messages, max_tokens, temperature, stop, phase))
+                    running[task] = endpoint
+                    launched.append(endpoint)
+                    return True
+                metrics.inc("llm_model_calls_total", {"model": endpoint.name, "outcome": "breaker_open"})
+            return False
+
+        if not launch():
+            raise UpstreamError("All upstream models are unavailable (circuit breakers open)", 503)
+        try:
+            while running:
+                can_hedge = self.hedge and bool(queue)
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_delay(phase) if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    if launch():
+                        metrics.inc("llm_hedges_total", {"phase": phase})
+                    continue
+                for task in done:
+                    running.pop(task)
+                    try:
+                        result = task.result()
+                    except UpstreamError as e:
+                        last_error = e
+                        continue
+                    result.hedged = len(launched) > 1
+                    if result.hedged:
+                        metrics.inc("llm_hedge_winner_total", {"phase": phase, "model": result.model})
+                    return result
+                if not running:
+                    launch()  # Failover: the only call in flight errored
+        finally:
+            for task in running:
+                task.cancel()
+        raise last_error or UpstreamError("No upstream model answered", 503)
+
+    def stream(self, messages: list, max_tokens: int = 512, temperature: float = 0.1,
+               phase: str = "unknown", stop: Optional[list[str]] = None) -> "CompletionStream":
+        return CompletionStream(self, messages, max_tokens, temperature, phase, stop)
+
+
+class CompletionStream:
+    """
+    Text deltas of one streamed completion (`async for delta in stream`). Once the
+    stream is exhausted, `completion` holds the full text, usage and finish reason.
+    Usage comes from the upstream's final chunk when it sends one, otherwise the
+    number of content chunks stands in for completion tokens.
+    """
+
+    def __init__(self, pool: ModelPool, messages: list, max_tokens: int, temperature: float,
+                 phase: str, stop: Optional[list[str]]):
+        self.pool = pool
+        self.request = (messages, max_tokens, temperature, stop)
+        self.phase = phase
+        self.completion: Optional[Completion] = None
+        self.first_token_s: Optional[float] = None
+        self.model: Optional[str] = None  # Endpoint currently relaying
+        self.started = False
+
+    def __aiter__(self):
+        return self._run()
+
+    async def _run(self):
+        last_error: Optional[UpstreamError] = None
+        for endpoint in self.pool.endpoints:
+            breaker = self.pool.breakers[endpoint.name]
+            if not breaker.allow():
+                metrics.inc("llm_model_calls_total", {"model": endpoint.name, "outcome": "breaker_open"})
+                continue
+            start = time.monotonic()
+            try:
+                async for delta in self._relay(endpoint, start):
+                    yield delta
+            except UpstreamError as e:
+                self.pool._failed(endpoint, e)
+                if self.started:
+                    raise  # Tokens already went out; a second model cannot continue them
+                last_error = e
+                continue
+            except BaseException:
+                breaker.trial_in_flight = False  # Consumer went away: no verdict on the model
+                raise
+            self.pool._succeeded(endpoint, self.phase, time.monotonic() - start)
+            return
+        raise last_error or UpstreamError("All upstream models are unavailable (circuit breakers open)", 503)
+
+    async def _relay(self, endpoint: ModelEndpoint, start: float):
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        abandoned = threading.Event()
+        messages, max_tokens, temperature, stop = self.request
+        self.model = endpoint.name
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                abandoned.set()  # Loop closed
+
+        def pump():
+            try:
+                chunks = self.pool._client(endpoint).chat_completion(
+                    model=None if endpoint.base_url else endpoint.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=stop,
+                    top_p=0.9,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                for chunk in chunks:
+                    if abandoned.is_set():
+                        chunks.close()  # Closes the upstream connection
+                        return
+                    put(chunk)
+                put(None)
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                put(UpstreamError(f"{endpoint.name}: {e}", status))
+
+        loop.run_in_executor(self.pool.executor, pump)
+        parts, chunks, usage, finish_reason = [], 0, None, None
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, UpstreamError):
+                    raise item
+                usage = getattr(item, "usage", None) or usage
+                for choice in item.choices or []:
+                    finish_reason = choice.finish_reason or finish_reason
+                    delta = choice.delta.content if choice.delta else None
+                    if delta:
+                        if not self.started:
+                            self.started = True
+                            self.first_token_s = time.monotonic() - start
+                            metrics.observe("llm_first_token_ms", self.first_token_s * 1000, {"model": endpoint.name})
+                        parts.append(delta)
+                        chunks += 1
+                        yield delta
+        finally:
+            abandoned.set()
+        self.completion = Completion(
+            content="".join(parts),
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or chunks,
+            model=endpoint.name,
+            finish_reason=finish_reason,
+        )
+
+
+_pool: Optional[ModelPool] = None
+
+
+def get_pool(api_key: Optional[str] = None) -> ModelPool:
+    global _pool
+    if _pool is None or _pool.api_key != api_key:
+        _pool = ModelPool.from_settings(api_key)
+    return _pool
@@ -0,0 +1,27 @@
+"""
+Per-phase accounting of upstream LLM completions.
+
+Whoever talks to the upstream records the call once: the AI proxy for its callers,
+and ReasoningEngine when its AI_SERVICE_URL is the separate ai_service. The proxy
+marks its responses with ACCOUNTED_HEADER, so the engine does not count a call twice
+when it goes through the proxy.
+"""
+from typing import Optional
+
+from app.core.metrics import metrics
+from app.core.rate_limit import quota
+
+ACCOUNTED_HEADER = "X-LLM-Accounted"
+
+
+async def record_completion(phase: str, user_id, prompt_tokens: int, completion_tokens: int,
+                            finish_reason: Optional[str], elapsed_s: float):
+    labels = {"phase": phase}
+    metrics.inc("llm_phase_calls_total", labels)
+    metrics.inc("llm_phase_prompt_tokens_total", labels, prompt_tokens or 0)
+    metrics.inc("llm_phase_completion_tokens_total", labels, completion_tokens or 0)
+    metrics.observe("llm_phase_ms", elapsed_s * 1000, labels)
+    if finish_reason == "length":
+        metrics.inc("llm_phase_truncated_total", labels)  # max_tokens too tight for this phase
+    if user_id is not None:
+        await quota.arecord(user_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
@@ -0,0 +1,299 @@
+"""
+Versioned rule corpus.
+
+A corpus version is a set of rules built into its own Chroma collection
+("cirser_rules.v<version>" and, when partitioned, its partitions) together with its
+precompiled rule library, tracked by a RuleCorpusVersion row. The version is a hash
+of the rules and the partition layout, so building the same rules twice is a no-op.
+
+    build_version(rules)   builds and validates a version next to the one being served
+    activate(version)      makes it the active version in one transaction
+                           (activating a retired version is a rollback)
+
+Each worker's `corpus_watcher` notices a new active version, opens and warms it off
+the event loop, and swaps it into the engine: requests that started earlier finish
+on the snapshot they pinned, later ones use the new version. Until a version has
+been activated, the unversioned "cirser_rules" collection and RULE_LIBRARY_PATH are
+served.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.api import deps
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.corpus import RuleCorpusVersion
+from app.schemas.rule import Rule
+from app.services.rag.retriever import RAGRetriever, chroma_client
+from app.services.reasoning.rule_library import RuleLibrary, build_library
+
+BASE_COLLECTION = "cirser_rules"
+USABLE = ("ready", "active", "retired")
+BUILD_STALE_S = 3600  # A version "building" for longer than this lost its builder
+PROBE_RESULTS = 5
+
+_swap_lock = asyncio.Lock()
+_retiring: set = set()
+
+
+class CorpusSnapshot:
+    """One corpus version as served by this worker."""
+
+    def __init__(self, version: Optional[str], retriever: RAGRetriever, rule_library: Optional[RuleLibrary]):
+        self.version = version
+        self.retriever = retriever
+        self.rule_library = rule_library
+        self.in_flight = 0  # Requests pinned to this snapshot (only touched on the event loop)
+
+    @property
+    def label(self) -> str:
+        return self.version or "unversioned"
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits until no request is using this snapshot; False if some still are after `timeout`."""
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.in_flight
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def corpus_version(rules: list[Rule]) -> str:
+    payload = {
+        "partition_by": settings.RAG_PARTITION_BY,
+        "rules": sorted((r.model_dump() for r in rules), key=lambda r: r["rule_id"]),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def collection_name(version: str) -> str:
+    return f"{BASE_COLLECTION}.v{version}"
+
+
+def _drop_collections(name: str):
+    """Deletes a version's collection and its partitions."""
+    client = chroma_client()
+    for collection in client.list_collections():
+        if collection.name == name or collection.name.startswith(f"{name}__"):
+            client.delete_collection(collection.name)
+
+
+def _set_version(version: str, **values):
+    db = deps.SessionLocal()
+    try:
+        db.execute(update(RuleCorpusVersion).where(RuleCorpusVersion.version == version).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim_build(version: str, rule_count: int) -> bool:
+    """True when this caller should build `version`: it is new, failed, or its builder died."""
+    db = deps.SessionLocal()
+    try:
+        row = db.get(RuleCorpusVersion, version)
+        if row is None:
+            db.add(RuleCorpusVersion(
+                version=version, collection=collection_name(version),
+                partition_by=settings.RAG_PARTITION_BY, rule_count=rule_count,
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # Another builder got there first
+                return False
+            return True
+        if row.status in USABLE:
+            return False
+        stale = _now() - timedelta(seconds=BUILD_STALE_S)
+        taken = db.execute(
+            update(RuleCorpusVersion).where(
+                RuleCorpusVersion.version == version,
+                or_(RuleCorpusVersion.status == "failed",
+                    and_(RuleCorpusVersion.status == "building", RuleCorpusVersion.created_at < stale)),
+            ).values(status="building", error=None, created_at=_now())
+        ).rowcount
+        db.commit()
+        return bool(taken)
+    finally:
+        db.close()
+
+
+def validate(retriever: RAGRetriever, rules: list[Rule]) -> dict:
+    """
+    Checks a freshly built version before it may serve: every rule is stored, and a
+    sample of rules is found among the top results for its own embedding text.
+    """
+    if retriever.partition_by:
+        collections = [retriever.client.get_collection(name) for name in retriever.partitions().values()]
+    else:
+        collections = [retriever.collection]
+    stored = sum(c.count() for c in collections)
+    if stored != len(rules):
+        raise ValueError(f"Index holds {stored} rules, expected {len(rules)}")
+
+    probes = [r for r in rules if r.embedding_text]
+    probes = probes[::max(1, len(probes) // settings.CORPUS_VALIDATE_SAMPLE)][:settings.CORPUS_VALIDATE_SAMPLE]
+    found = sum(
+        any(c.rule.rule_id == rule.rule_id for c in retriever.search(rule.embedding_text, n_results=PROBE_RESULTS))
+        for rule in probes
+    )
+    recall = found / len(probes) if probes else 1.0
+    if recall < settings.CORPUS_VALIDATE_MIN_RECALL:
+        raise ValueError(f"Self-retrieval recall@{PROBE_RESULTS} is {recall:.2f}, below {settings.CORPUS_VALIDATE_MIN_RECALL}")
+    return {"stored": stored, "probes": len(probes), "recall": round(recall, 3)}
+
+
+def check_rules(rules: list[Rule]):
+    ids = [r.rule_id for r in rules]
+    if not rules or len(set(ids)) != len(ids):
+        raise ValueError("A corpus needs at least one rule and unique rule ids")
+
+
+def build_version(rules: list[Rule], embedding_fn=None) -> str:
+    """
+    Builds and validates a corpus version in its own collections and returns it; the
+    version being served is not touched. Returns at once if the version already exists
+    or another builder is on it. Raises ValueError for rules that cannot form a corpus
+    or an index that fails validation (the version is then marked failed).
+    """
+    check_rules(rules)
+    version = corpus_version(rules)
+    if not _claim_build(version, len(rules)):
+        return version
+
+    name = collection_name(version)
+    start = time.perf_counter()
+    try:
+        _drop_collections(name)  # Whatever an interrupted build left behind
+        retriever = RAGRetriever(name, embedding_fn)
+        retriever.add_rules(rules)
+        validation = validate(retriever, rules)
+        library = build_library(rules)
+    except Exception as e:
+        _set_version(version, status="failed", error=str(e))
+        try:
+            _drop_collections(name)
+        except Exception as drop_error:
+            print(f"WARNING: Could not drop collections of failed corpus {version}: {drop_error}")
+        metrics.inc("corpus_builds_total", {"outcome": "failed"})
+        raise
+    _set_version(version, status="ready", library=library, validation=validation)
+    metrics.inc("corpus_builds_total", {"outcome": "ready"})
+    metrics.observe("corpus_build_ms", (time.perf_counter() - start) * 1000)
+    return version
+
+
+def activate(version: str) -> Optional[str]:
+    """Makes a ready or retired version the active one; returns the version it replaced."""
+    db = deps.SessionLocal()
+    try:
+        row = db.query(RuleCorpusVersion).filter(RuleCorpusVersion.version == version).with_for_update().first()
+        if row is None:
+            raise ValueError(f"Unknown corpus version {version}")
+        if row.status not in USABLE:
+            raise ValueError(f"Corpus version {version} is {row.status}")
+        if row.partition_by != settings.RAG_PARTITION_BY:
+            raise ValueError(f"Corpus version {version} was built with RAG_PARTITION_BY={row.partition_by}")
+        previous = db.query(RuleCorpusVersion.version).filter(RuleCorpusVersion.status == "active").scalar()
+        if previous == version:
+            return None
+        db.execute(update(RuleCorpusVersion).where(RuleCorpusVersion.status == "active").values(status="retired"))
+        row.status = "active"
+        row.activated_at = _now()
+        db.commit()
+    finally:
+        db.close()
+    metrics.inc("corpus_activations_total")
+    _prune()
+    return previous
+
+
+def _prune():
+    """Deletes retired versions beyond the newest CORPUS_KEEP_VERSIONS, collections included."""
+    db = deps.SessionLocal()
+    try:
+        old = db.query(RuleCorpusVersion).filter(RuleCorpusVersion.status == "retired").order_by(
+            RuleCorpusVersion.activated_at.desc()
+        ).offset(settings.CORPUS_KEEP_VERSIONS).all()
+        for row in old:
+            try:
+                _drop_collections(row.collection)
+            except Exception as e:
+                print(f"WARNING: Could not drop collections of corpus {row.version}: {e}")
+                continue
+            db.delete(row)
+        db.commit()
+    finally:
+        db.close()
+
+
+def active_version() -> Optional[str]:
+    db = deps.SessionLocal()
+    try:
+        return db.query(RuleCorpusVersion.version).filter(RuleCorpusVersion.status == "active").order_by(
+            RuleCorpusVersion.activated_at.desc()
+        ).limit(1).scalar()
+    finally:
+        db.close()
+
+
+def load_snapshot(version: str, embedding_fn=None) -> CorpusSnapshot:
+    """Opens a built version and warms its index, so the first request on it does not pay for that."""
+    db = deps.SessionLocal()
+    try:
+        row = db.get(RuleCorpusVersion, version)
+        if row is None or row.status not in USABLE:
+            raise ValueError(f"Corpus version {version} is not built")
+        collection, library = row.collection, row.library
+    finally:
+        db.close()
+    snapshot = CorpusSnapshot(version, RAGRetriever(collection, embedding_fn), RuleLibrary(library) if library else None)
+    snapshot.retriever.search("warmup", n_results=1)
+    return snapshot
+
+
+async def _retire(snapshot: CorpusSnapshot):
+    start = time.perf_counter()
+    if await snapshot.drain(settings.CORPUS_DRAIN_TIMEOUT_S):
+        metrics.observe("corpus_drain_ms", (time.perf_counter() - start) * 1000)
+    else:
+        print(f"WARNING: {snapshot.in_flight} requests still on corpus {snapshot.label} after {settings.CORPUS_DRAIN_TIMEOUT_S}s")
+
+
+async def sync(engine) -> bool:
+    """Swaps the active version into `engine` unless it is already serving it; True when it swapped."""
+    async with _swap_lock:
+        version = await asyncio.to_thread(active_version)
+        if version is None or version == engine.corpus.version:
+            return False
+        snapshot = await asyncio.to_thread(load_snapshot, version, engine.corpus.retriever.embedding_fn)
+        previous = engine.swap_corpus(snapshot)
+    task = asyncio.create_task(_retire(previous))
+    _retiring.add(task)
+    task.add_done_callback(_retiring.discard)
+    return True
+
+
+async def corpus_watcher(engine, stop: Optional[asyncio.Event] = None):
+    """Keeps this worker on the active corpus version, checking every CORPUS_POLL_S."""
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            await sync(engine)
+        except Exception as e:
+            print(f"WARNING: Corpus sync failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.CORPUS_POLL_S)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent query embeddings into batched forward passes.
+
+    Callers await `embed(text)`. The first text of a batch starts a window of
+    EMBED_BATCH_WAIT_MS; the batch is flushed when the window closes or it reaches
+    EMBED_BATCH_MAX texts. One batch runs at a time on a dedicated thread, off
+    the event loop; texts arriving meanwhile collect (up to EMBED_BATCH_MAX) and
+    are flushed as soon as it completes, so under load batches grow without any
+    extra waiting.
+    """
+
+    def __init__(self, embedding_fn, max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.embedding_fn = embedding_fn
+        self.max_batch = max_batch or settings.EMBED_BATCH_MAX
+        self.max_wait = (settings.EMBED_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._loop = None
+
+    def _runtime(self) -> asyncio.AbstractEventLoop:
+        # Executor threads do not survive fork; a new event loop orphans the old queue
+        loop = asyncio.get_running_loop()
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+            self._pid = os.getpid()
+        if self._loop is not loop:
+            self._pending, self._timer, self._running, self._loop = [], None, False, loop
+        return loop
+
+    async def embed(self, text: str):
+        loop = self._runtime()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None and not self._running:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running:
+            return  # Picked up when the batch in flight completes
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if batch:
+            self._running = True
+            self._loop.create_task(self._run(batch))
+
+    def _embed(self, texts: list[str]) -> tuple[float, list]:
+        return time.perf_counter(), self.embedding_fn(texts)
+
+    async def _run(self, batch: list):
+        loop = self._loop
+        try:
+            await self._embed_batch(batch)
+        finally:
+            if self._loop is loop:  # Not orphaned by a new event loop meanwhile
+                self._running = False
+                self._flush()
+
+    async def _embed_batch(self, batch: list):
+        metrics.observe("embedding_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        try:
+            started, vectors = await self._loop.run_in_executor(self._executor, self._embed, [text for text, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Wait = window, or the time collecting behind the batch in flight
+        for _, _, enqueued in batch:
+            metrics.observe("embedding_batch_wait_ms", (started - enqueued) * 1000, buckets=WAIT_MS_BUCKETS)
+        metrics.observe("embedding_batch_ms", (time.perf_counter() - started) * 1000)
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():  # Caller may have been cancelled meanwhile
+                future.set_result(vector)
@@ -0,0 +1,135 @@
+"""
+Shared local embedding worker.
+
+One process owns the ONNX MiniLM model and serves embeddings over a Unix socket,
+so request workers never load the model themselves. Frames are a 4-byte
+big-endian length followed by a JSON body:
+
+    request:  {"texts": ["..."]}
+    response: {"embeddings": [[...]]} or {"error": "..."}
+
+Run with: python -m app.services.rag.embedding_worker --socket /tmp/cirser-embed.sock
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+
+from chromadb.utils import embedding_functions
+
+from app.core.config import settings
+
+_HEADER = struct.Struct(">I")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Embedding worker closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class SocketEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """
+    Chroma embedding function that delegates to the shared embedding worker.
+    Keeps one connection per thread; reconnects once if the worker restarted.
+
+    The worker serves Chroma's default model, so this function reports itself as
+    "default": collections seeded without the worker (and vice versa) reopen
+    without an embedding function conflict.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @staticmethod
+    def name() -> str:
+        return embedding_functions.DefaultEmbeddingFunction.name()
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict) -> embedding_functions.EmbeddingFunction:
+        if settings.EMBEDDING_SOCKET:
+            return SocketEmbeddingFunction(settings.EMBEDDING_SOCKET)
+        return embedding_functions.DefaultEmbeddingFunction()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _roundtrip(self, payload: bytes) -> dict:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+        sock.sendall(_HEADER.pack(len(payload)) + payload)
+        (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+        return json.loads(_recv_exact(sock, size))
+
+    def __call__(self, input):
+        payload = json.dumps({"texts": list(input)}).encode()
+        try:
+            response = self._roundtrip(payload)
+        except (OSError, ConnectionError):
+            # Stale connection (worker restart or fork) - retry once on a fresh socket
+            self._local.sock = None
+            response = self._roundtrip(payload)
+        if "error" in response:
+            raise RuntimeError(f"Embedding worker error: {response['error']}")
+        return response["embeddings"]
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, embed_fn, lock: asyncio.Lock):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            header = await reader.readexactly(_HEADER.size)
+            (size,) = _HEADER.unpack(header)
+            request = json.loads(await reader.readexactly(size))
+            try:
+                # The model is single-instance; serialize forward passes off the loop
+                async with lock:
+                    vectors = await loop.run_in_executor(None, embed_fn, request["texts"])
+                body = {"embeddings": [[float(x) for x in v] for v in vectors]}
+            except Exception as e:
+                body = {"error": str(e)}
+            data = json.dumps(body).encode()
+            writer.write(_HEADER.pack(len(data)) + data)
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: str):
+    embed_fn = embedding_functions.DefaultEmbeddingFunction()
+    embed_fn(["warmup"])  # Load the ONNX model before accepting connections
+    lock = asyncio.Lock()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(
+        lambda r, w: _handle(r, w, embed_fn, lock), path=socket_path
+    )
+    print(f"Embedding worker listening on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared ONNX embedding worker")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SOCKET or "/tmp/cirser-embed.sock")
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket))
@@ -2,30 +2,124 @@ import chromadb
 from chromadb.utils import embedding_functions
 from app.core.config import settings
 from app.schemas.rule import Rule, RuleSearchResult, RuleSource
+from app.core.metrics import metrics
+from app.services.rag.embedding_batcher import EmbeddingBatcher
+from typing import Optional, Union
+import asyncio
+import hashlib
 import json
 import os
+import re
+
+FILTER_FIELDS = ("domain", "category")
+Filter = Optional[Union[str, list[str]]]
+
+def chroma_client():
+    """A new Chroma client for the deployment mode (open one per process, after fork)."""
+    if settings.DEPLOYMENT_MODE == "lite":
+        print(f"Initializing ChromaDB in LITE mode at {settings.CHROMA_PERSIST_DIR}")
+        return chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    return chromadb.HttpClient(
+        host=settings.CHROMA_HOST, 
+        port=settings.CHROMA_PORT
+    )
 
 class RAGRetriever:
-    def __init__(self):
-        # Detect Mode
-        if settings.DEPLOYMENT_MODE == "lite":
-            print(f"Initializing ChromaDB in LITE mode at {settings.CHROMA_PERSIST_DIR}")
-            self.client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    def __init__(self, collection_name: str = "cirser_rules", embedding_fn=None):
+        # Corpus versions live in their own collections (see rag/corpus.py) and share the
+        # embedding function of the retriever they replace
+        self.collection_name = collection_name
+        # Embeddings come from the shared embedding worker when one is configured,
+        # otherwise each process loads its own ONNX model on first use.
+        if embedding_fn is not None:
+            self.embedding_fn = embedding_fn
+        elif settings.EMBEDDING_SOCKET:
+            from app.services.rag.embedding_worker import SocketEmbeddingFunction
+            self.embedding_fn = SocketEmbeddingFunction(settings.EMBEDDING_SOCKET)
         else:
-            self.client = chromadb.HttpClient(
-                host=settings.CHROMA_HOST, 
-                port=settings.CHROMA_PORT
-            )
-            
-        self.collection_name = "cirser_rules"
-        self.embedding_fn = embedding_functions.DefaultEmbeddingFunction() 
-        
-        self.collection = self.client.get_or_create_collection(
+            self.embedding_fn = embedding_functions.DefaultEmbeddingFunction() 
+        self._batcher: Optional[EmbeddingBatcher] = None
+
+        # Chroma clients hold sqlite/http connections that must not cross a fork,
+        # so they are created lazily in whichever process first uses them.
+        self._client = None
+        self._collection = None
+        self._pid = None
+        # RAG_PARTITION_BY = "domain"/"category": one collection per value, opened on first use,
+        # so a filtered search only loads that slice's HNSW index
+        self.partition_by = settings.RAG_PARTITION_BY
+        if self.partition_by not in (None, *FILTER_FIELDS):
+            raise ValueError(f"RAG_PARTITION_BY must be one of {FILTER_FIELDS}")
+        self._partitions: dict = {}
+        self._partition_names: Optional[dict[str, str]] = None
+
+    def _connect(self):
+        self._client = chroma_client()
+        self._collection = None if self.partition_by else self._client.get_or_create_collection(
             name=self.collection_name, 
             embedding_function=self.embedding_fn
         )
+        self._partitions = {}
+        self._partition_names = None
+        self._pid = os.getpid()
+
+    @property
+    def client(self):
+        if self._pid != os.getpid():
+            self._connect()
+        return self._client
+
+    @property
+    def collection(self):
+        if self._pid != os.getpid():
+            self._connect()
+        return self._collection
+
+    def partition_name(self, value: str) -> str:
+        # Collection names allow [a-zA-Z0-9._-]; the hash keeps distinct values distinct after slugging
+        slug = re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")[:48] or "none"
+        return f"{self.collection_name}__{slug}-{hashlib.sha1(value.encode()).hexdigest()[:6]}"
+
+    def partitions(self) -> dict[str, str]:
+        """Partition value -> collection name (empty when the corpus is not partitioned)."""
+        if not self.partition_by:
+            return {}
+        if self._partition_names is None or self._pid != os.getpid():
+            names = {}
+            for collection in self.client.list_collections():
+                meta = collection.metadata or {}
+                if meta.get("partition_of") == self.collection_name and meta.get("partition_by") == self.partition_by:
+                    names[meta["partition_value"]] = collection.name
+            self._partition_names = names
+        return self._partition_names
+
+    def _partition(self, value: str, create: bool = False):
+        collection = self._partitions.get(value)
+        if collection is None:
+            name = self.partition_name(value)
+            if create:
+                collection = self.client.get_or_create_collection(
+                    name=name,
+                    embedding_function=self.embedding_fn,
+                    metadata={"partition_of": self.collection_name, "partition_by": self.partition_by, "partition_value": value},
+                )
+                self.partitions()[value] = name
+            else:
+                collection = self.client.get_collection(name=name, embedding_function=self.embedding_fn)
+            self._partitions[value] = collection
+        return collection
 
     def add_rules(self, rules: list[Rule]):
+        if self.partition_by:
+            groups: dict[str, list[Rule]] = {}
+            for rule in rules:
+                groups.setdefault(getattr(rule, self.partition_by), []).append(rule)
+            for value, group in groups.items():
+                self._add(self._partition(value, create=True), group)
+        else:
+            self._add(self.collection, rules)
+
+    def _add(self, collection, rules: list[Rule]):
         ids = [r.rule_id for r in rules]
         documents = [r.embedding_text for r in rules]
         metadatas = [r.model_dump(exclude={"embedding_text"}) for r in rules]
@@ -40,16 +134,68 @@ class RAGRetriever:
                     clean_m[k] = v
             formatted_metadatas.append(clean_m)
 
-        self.collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=formatted_metadatas
-        )
+        # Chroma rejects oversized add() calls (5461 records for the sqlite backend)
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch):
+            collection.add(
+                ids=ids[start:start + batch],
+                documents=documents[start:start + batch],
+                metadatas=formatted_metadatas[start:start + batch]
+            )
+
+    @staticmethod
+    def _where(filters: dict[str, Filter]) -> Optional[dict]:
+        clauses = []
+        for field, value in filters.items():
+            if value:
+                clauses.append({field: {"$in": value} if isinstance(value, list) else value})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def search(self, query: str, n_results: int = 5, domain: Filter = None, category: Filter = None) -> list[RuleSearchResult]:
+        """
+        Top rules for the query, optionally restricted to domain(s)/category(ies).
+        Filters are pushed down as Chroma `where` clauses; with partitioning, a filter on
+        the partition field selects which partition collections are queried at all.
+        """
+        return self._search(self.embedding_fn([query])[0], n_results, domain, category)
+
+    async def asearch(self, query: str, n_results: int = 5, domain: Filter = None, category: Filter = None) -> list[RuleSearchResult]:
+        """`search` for the event loop: the embedding is batched with concurrent queries, the lookup runs in a thread."""
+        if self._batcher is None or self._batcher.embedding_fn is not self.embedding_fn:
+            self._batcher = EmbeddingBatcher(self.embedding_fn)
+        embedding = await self._batcher.embed(query)
+        return await asyncio.to_thread(self._search, embedding, n_results, domain, category)
+
+    def _search(self, embedding, n_results: int, domain: Filter, category: Filter) -> list[RuleSearchResult]:
+        filters = {"domain": domain, "category": category}
+        embedded = {"query_embeddings": [embedding]}
+        if not self.partition_by:
+            metrics.inc("retrieval_searches_total", {"scope": "filtered" if self._where(filters) else "full"})
+            return self._query(self.collection, embedded, n_results, self._where(filters))
+
+        wanted = filters.pop(self.partition_by)
+        known = self.partitions()
+        if wanted:
+            values = [v for v in ([wanted] if isinstance(wanted, str) else wanted) if v in known]
+        else:
+            values = list(known)
+        metrics.inc("retrieval_searches_total", {"scope": "partition" if wanted else "all_partitions"})
+        if not values:
+            return []
+        where = self._where(filters)
+        merged = []
+        for value in values:
+            merged.extend(self._query(self._partition(value), embedded, n_results, where))
+        merged.sort(key=lambda c: c.similarity_score, reverse=True)
+        return merged[:n_results]
 
-    def search(self, query: str, n_results: int = 5) -> list[RuleSearchResult]:
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+    def _query(self, collection, query: dict, n_results: int, where: Optional[dict]) -> list[RuleSearchResult]:
+        results = collection.query(
+            **query,
+            n_results=n_results,
+            where=where
         )
         
         candidates = []
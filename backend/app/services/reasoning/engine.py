@@ -1,9 +1,26 @@
+import asyncio
+import contextvars
 import httpx
 import json
+import numpy as np
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from app.core.admission import admission, AdmissionRejected, UpstreamRateLimited
+from app.core import security
 from app.core.config import settings
-from app.services.rag.retriever import RAGRetriever
-from app.services.reasoning.solver import SafeSolver
+from app.core.metrics import metrics
+from app.services.llm.usage import ACCOUNTED_HEADER, record_completion
+from app.services.rag.corpus import CorpusSnapshot
+from app.services.rag.retriever import RAGRetriever, FILTER_FIELDS
+from app.services.reasoning.solver import SafeSolver, start_workers
+from app.services.reasoning.followup import detect_followup, known_symbols
+from app.services.reasoning.intent import classifier as intent_classifier
+from app.services.reasoning.json_repair import repair_json
+from app.services.reasoning.rule_library import library as rule_library
+from app.services.simulation.mna import MNASystem, looks_like_netlist, parse_netlist
 from app.schemas.reasoning import EngineeringContext, SymbolicPlan
+from pydantic import ValidationError
 from app.schemas.rule import Rule
 
 
@@ -17,31 +34,206 @@ GLOBAL CONSTRAINTS:
 4. If a question is purely conceptual, do not invent numbers.
 """
 
+# JSON answers usually end "}\n```"; stopping on the closing fence drops whatever prose
+# the model would add after the object. "```json\n" opening a reply never matches it.
+JSON_STOP = ["\n```\n"]
+
+# Per-phase decode budget, sent with every completion request (see ai_proxy.InferenceRequest).
+# Sized from the phase's output schema; llm_phase_completion_tokens_total and
+# llm_phase_truncated_total show whether a budget is too tight or too generous.
+# A completion cut off at its budget is retried once with twice the budget (_post_completion).
+GENERATION_PROFILES = {
+    "intent": {"max_tokens": 160, "temperature": 0.05, "stop": JSON_STOP},
+    "context": {"max_tokens": 512, "temperature": 0.1, "stop": JSON_STOP},
+    "formulation": {"max_tokens": 256, "temperature": 0.05, "stop": JSON_STOP},
+    "context_formulation": {"max_tokens": 768, "temperature": 0.1, "stop": JSON_STOP},
+    "verify": {"max_tokens": 384, "temperature": 0.1, "stop": JSON_STOP},
+    "explanation": {"max_tokens": 768, "temperature": 0.2, "stop": None},
+}
+DEFAULT_PROFILE = {"max_tokens": 512, "temperature": 0.1, "stop": None}
+
+# Memo of LLM completions and retrievals shared by everything running under
+# ReasoningEngine.shared_cache() (e.g. the items of one batch job)
+_shared_cache: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("engine_shared_cache", default=None)
+# Corpus snapshot a request started on: it keeps using it if a new version is swapped in meanwhile
+_pinned_corpus: contextvars.ContextVar[Optional[CorpusSnapshot]] = contextvars.ContextVar("engine_corpus", default=None)
+
+
+def _raise_for_status(response: httpx.Response):
+    """
+    Under shared_cache() (batch items) the proxy's per-user rate limit raises
+    UpstreamRateLimited for the batch runner to back off and retry. Interactive
+    calls get the plain HTTP error, so a turn keeps its fallbacks.
+    """
+    if response.status_code == 429 and _shared_cache.get() is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        raise UpstreamRateLimited(float(retry_after) if retry_after.isdigit() else None)
+    response.raise_for_status()
+
+
 class ReasoningEngine:
     def __init__(self):
-        self.retriever = RAGRetriever()
+        # Unversioned corpus until rag.corpus swaps in the active version
+        self.corpus = CorpusSnapshot(None, RAGRetriever(), rule_library)
         self.solver = SafeSolver()
+        self.intent_classifier = intent_classifier if settings.LOCAL_INTENT_CLASSIFIER else None
         self.ai_url = f"{settings.AI_SERVICE_URL.rstrip('/')}/v1/chat/completions"
 
-    async def _call_ai(self, messages: list, token: str) -> str:
+    def warmup(self, retrieval: bool = True):
+        """
+        Loads lazily-initialized heavy state ahead of the first request.
+        Pre-fork (gunicorn master) only SymPy is warmed; Chroma, the embedding model and
+        the solver's worker processes are per-process and started after fork with retrieval=True.
+        """
+        self.solver.evaluate_numeric("(Za*Zb) / (Za+Zb+Zc)", {"Za": 1.0, "Zb": 1.0, "Zc": 1.0})
+        self.solver.solve_symbolic("Zin*(Za+Zb) - Za*Zb", "Zin")
+        if retrieval:
+            start_workers()
+            try:
+                self.retriever.search("warmup", n_results=1)
+            except Exception as e:
+                print(f"WARNING: Retrieval warmup failed: {e}")
+
+    @property
+    def retriever(self) -> RAGRetriever:
+        return (_pinned_corpus.get() or self.corpus).retriever
+
+    @property
+    def rule_library(self):
+        return (_pinned_corpus.get() or self.corpus).rule_library
+
+    def swap_corpus(self, snapshot: CorpusSnapshot) -> CorpusSnapshot:
+        """New requests use `snapshot`; running ones finish on the snapshot returned."""
+        previous, self.corpus = self.corpus, snapshot
+        metrics.inc("corpus_swaps_total", {"version": snapshot.label})
+        print(f"Corpus {previous.label} -> {snapshot.label} ({previous.in_flight} requests draining)")
+        return previous
+
+    @contextmanager
+    def shared_cache(self):
+        """
+        Within this block, and tasks started from it, identical prompts and retrievals are
+        computed once; concurrent duplicates wait for the first. Streamed calls are not cached.
+        """
+        reset = _shared_cache.set({})
+        try:
+            yield
+        finally:
+            _shared_cache.reset(reset)
+
+    async def _memo(self, kind: str, key, compute):
+        cache = _shared_cache.get()
+        if cache is None:
+            return await compute()
+        key = (kind, key)
+        future = cache.get(key)
+        if future is None:
+            future = cache[key] = asyncio.ensure_future(compute())
+            future.add_done_callback(lambda f: (f.cancelled() or f.exception() is not None) and cache.pop(key, None))  # Failures are retried
+            metrics.inc("engine_shared_cache_total", {"kind": kind, "outcome": "miss"})
+        else:
+            metrics.inc("engine_shared_cache_total", {"kind": kind, "outcome": "hit"})
+        # Shielded: one cancelled waiter must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    async def _search(self, user_query: str, **filters) -> list:
+        corpus = _pinned_corpus.get() or self.corpus
+        key = (corpus.version, user_query, tuple(sorted((k, str(v)) for k, v in filters.items())))
+        return list(await self._memo("retrieval", key, lambda: corpus.retriever.asearch(user_query, n_results=3, **filters)))
+
+    async def _call_ai(self, messages: list, token: str, phase: str = "unknown",
+                       on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Completion text; with `on_delta`, tokens are streamed and handed over as they arrive."""
+        if on_delta is None and _shared_cache.get() is not None:
+            key = (phase, json.dumps(messages, sort_keys=True))
+            return await self._memo("completion", key, lambda: self._admitted(messages, token, phase, None))
+        return await self._admitted(messages, token, phase, on_delta)
+
+    async def _admitted(self, messages: list, token: str, phase: str, on_delta: Optional[Callable[[str], None]]) -> str:
+        if admission is None:
+            return await self._post_completion(messages, token, phase, on_delta)
+        async with admission.slot(phase):
+            return await self._post_completion(messages, token, phase, on_delta)
+
+    async def _post_completion(self, messages: list, token: str, phase: str,
+                               on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        A completion cut off at the phase's max_tokens is retried once with twice the
+        budget; if that is cut off too the phase fails. A streamed completion has
+        already reached the client, so its truncation is only counted.
+        """
+        profile = GENERATION_PROFILES.get(phase, DEFAULT_PROFILE)
+        if on_delta is not None:
+            return await self._stream_completion(messages, token, phase, profile, on_delta)
+        content, finish_reason = await self._complete(messages, token, phase, profile)
+        if finish_reason == "length":
+            metrics.inc("llm_phase_truncation_retries_total", {"phase": phase})
+            profile = {**profile, "max_tokens": profile["max_tokens"] * 2}
+            content, finish_reason = await self._complete(messages, token, phase, profile)
+            if finish_reason == "length":
+                raise ValueError(f"{phase} completion truncated at {profile['max_tokens']} tokens")
+        return content
+
+    async def _complete(self, messages: list, token: str, phase: str, profile: dict) -> tuple[str, Optional[str]]:
+        start = time.perf_counter()
         async with httpx.AsyncClient(timeout=60.0) as client:
             headers = {"Authorization": f"Bearer {token}"}
             response = await client.post(
                 self.ai_url, 
-                json={"messages": messages, "tools": None},
+                json={"messages": messages, "tools": None, "phase": phase, **profile},
                 headers=headers
             )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
-
-    async def _get_json_response_with_retry(self, messages: list, token: str, max_retries: int = 1) -> dict:
-        """Call AI and attempt to parse JSON. Retry nicely on failure."""
+            _raise_for_status(response)
+        body = response.json()
+        choice = body["choices"][0]
+        await self._account(response, body.get("usage"), choice.get("finish_reason"), token, phase, start)
+        return choice["message"]["content"], choice.get("finish_reason")
+
+    async def _account(self, response: httpx.Response, usage: Optional[dict], finish_reason: Optional[str],
+                       token: str, phase: str, start: float):
+        # Calls through the backend's own AI proxy were already recorded there
+        if response.headers.get(ACCOUNTED_HEADER):
+            return
+        usage = usage or {}
+        await record_completion(
+            phase, security.token_subject(token), usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0), finish_reason, time.perf_counter() - start,
+        )
+
+    async def _stream_completion(self, messages: list, token: str, phase: str, profile: dict,
+                                 on_delta: Callable[[str], None]) -> str:
+        body = {"messages": messages, "tools": None, "phase": phase, "stream": True, **profile}
+        parts, usage, finish_reason = [], None, None
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            async with client.stream("POST", self.ai_url, json=body, headers={"Authorization": f"Bearer {token}"}) as response:
+                _raise_for_status(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    if line == "data: [DONE]":
+                        break
+                    event = json.loads(line[len("data: "):])
+                    if "error" in event:
+                        raise RuntimeError(event["error"].get("message", "stream error"))
+                    usage = event.get("usage") or usage
+                    for choice in event.get("choices", []):
+                        finish_reason = choice.get("finish_reason") or finish_reason
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            on_delta(delta)
+        await self._account(response, usage, finish_reason, token, phase, start)
+        return "".join(parts)
+
+    async def _get_json_response_with_retry(self, messages: list, token: str, max_retries: int = 1, schema=None, phase: str = "unknown") -> dict:
+        """Call AI and attempt to parse JSON. Repair locally, then retry nicely on failure."""
         
         # 1. Initial Call
-        raw_content = await self._call_ai(messages, token)
+        raw_content = await self._call_ai(messages, token, phase)
         
         try:
-            return self._extract_json(raw_content)
+            return self._parse_json_payload(raw_content, schema, phase)
         except ValueError as e:
             if max_retries > 0:
                 # 2. Retry Logic: Feed error back to model
@@ -51,11 +243,32 @@ class ReasoningEngine:
                     {"role": "user", "content": f"SYSTEM ERROR: Invalid JSON format. Error: {str(e)}. \n\nPlease fix the JSON and output ONLY the raw JSON block."}
                 ]
                 print(f"DEBUG: Retrying JSON parse. Error: {e}")
-                retry_content = await self._call_ai(retry_messages, token)
-                return self._extract_json(retry_content)
+                metrics.inc("llm_json_retries_total", {"phase": phase})
+                retry_content = await self._call_ai(retry_messages, token, phase)
+                return self._parse_json_payload(retry_content, schema, phase)
             else:
                 raise e
 
+    def _parse_json_payload(self, content: str, schema, phase: str) -> dict:
+        """
+        Strict parse first, then the local repair stages. The result is validated
+        against `schema` (a pydantic model) when given; any failure raises ValueError.
+        """
+        try:
+            data, stage = self._extract_json(content), "strict"
+        except ValueError:
+            data, stage = repair_json(content)
+
+        if schema is not None:
+            try:
+                data = schema(**data).model_dump()
+            except ValidationError as e:
+                raise ValueError(f"JSON Schema Validation Error: {e}")
+
+        if stage != "strict":
+            metrics.inc("llm_json_retries_avoided_total", {"phase": phase, "stage": stage})
+        return data
+
     def _extract_json(self, content: str) -> dict:
         # STRICT extraction. No regex duct tape.
         try:
@@ -73,8 +286,50 @@ class ReasoningEngine:
         except Exception as e:
              raise ValueError(f"JSON Parse Error: {str(e)}")
 
-    async def process_user_intent(self, user_query: str, token: str) -> dict:
+    def _build_plan(self, intents: list, explanation: str, context: dict, symbolic_plan: dict) -> dict:
+        # Persisted as the assistant message's meta_audit; follow-up turns read it back
+        return {
+            "action": "SOLVE_NUMERIC" if "NUMERICAL" in intents else ("SOLVE_SYMBOLIC" if "SYMBOLIC" in intents else "EXPLAIN"), 
+            "thought": explanation,
+            "equation": symbolic_plan.get('equation', 'N/A'),
+            "parameter_definition": context.get('parameter_definition', ''),
+            "physical_interpretation": context.get('physical_interpretation', ''),
+            "applicability_check": context.get('applicability_check', {}),
+            "selected_rule_id": context.get('selected_rule_id', 'N/A'),
+            "intents": intents,
+            "variable": symbolic_plan.get('variables', ''),
+            "rule_ref": symbolic_plan.get('rule_ref')
+        }
+
+    async def process_user_intent(self, user_query: str, token: str, previous_turn: Optional[dict] = None,
+                                  scope: Optional[dict] = None, on_delta: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        `scope` ({"domain": ..., "category": ...}) restricts retrieval for the whole session;
+        without it, a domain proposed by the intent phase is used when it names a partition.
+        The whole request runs on one corpus version, recorded in the first reasoning step.
+        """
+        corpus = self.corpus
+        corpus.in_flight += 1
+        pinned = _pinned_corpus.set(corpus)
+        try:
+            response = await self._process_user_intent(user_query, token, previous_turn, scope, on_delta)
+        finally:
+            _pinned_corpus.reset(pinned)
+            corpus.in_flight -= 1
+        if response.get("reasoning_steps"):
+            response["reasoning_steps"][0]["corpus_version"] = corpus.label
+        return response
+
+    async def _process_user_intent(self, user_query: str, token: str, previous_turn: Optional[dict],
+                                   scope: Optional[dict], on_delta: Optional[Callable[[str], None]]) -> dict:
         reasoning_trace = []
+
+        # --- FOLLOW-UP SHORTCUT ---
+        # "now with Z3 = 50" reuses the previous turn's rule and equation: no intent call, no retrieval
+        if previous_turn:
+            followup_response = await self._handle_followup(user_query, previous_turn, token)
+            if followup_response:
+                return followup_response
         
         # --- PHASE 0: INTENT CLASSIFICATION ---
         intent_data = await self._phase_0_intent(user_query, token)
@@ -90,23 +345,45 @@ class ReasoningEngine:
                 "status": "success",
                 "plan": {
                     "action": "GREETING",
-                    "thought": intent_data.get("response", "Hello. Ready to compute.")
+                    "thought": intent_data.get("response", "Hello. Ready to compute."),
+                    "intent_source": intent_data.get("source", "llm")
                 },
                 "reasoning_steps": []
             }
         
-        reasoning_trace.append({
+        intent_step = {
             "step": 0, "phase": "INTENT",
             "thought": f"Classified intents as {intents}",
-            "intent": main_intent
-        })
+            "intent": main_intent,
+            "source": intent_data.get("source", "llm")
+        }
+        reasoning_trace.append(intent_step)
+
+        # --- NETLIST SHORTCUT ---
+        # A pasted netlist is solved exactly by MNA: no retrieval, no formulation call
+        if "NUMERICAL" in intents and looks_like_netlist(user_query):
+            netlist_response = self._handle_netlist(user_query, intents, reasoning_trace)
+            if netlist_response:
+                netlist_response["plan"]["intent_source"] = intent_data.get("source", "llm")
+                return netlist_response
 
         try:
-            # --- PHASE 1: CONTEXT & DEFINITION ---
-            context_data = await self._phase_1_context(user_query, token)
+            conceptual_only = "CONCEPTUAL" in intents and not ("SYMBOLIC" in intents or "NUMERICAL" in intents)
+            candidates, retrieval_filter = await self._retrieve(user_query, scope, intent_data.get("domain"))
+            if retrieval_filter:
+                intent_step["retrieval_filter"] = retrieval_filter
+
+            # --- PHASE 1 (+2 when fused): CONTEXT & DEFINITION ---
+            fused_plan = None
+            if settings.FUSED_CONTEXT_FORMULATION and not conceptual_only:
+                fused = await self._phase_12_fused(user_query, candidates, token)
+                if fused:
+                    context_data, fused_plan = fused
+            if fused_plan is None:
+                context_data = await self._phase_1_context(user_query, token, candidates=candidates)
             reasoning_trace.append({
                 "step": 1, "phase": "DEFINITION",
-                "thought": f"Defined context.",
+                "thought": "Defined context and formulation in one call." if fused_plan else "Defined context.",
                 "rule_id": context_data.get('selected_rule_id', 'N/A')
             })
 
@@ -114,14 +391,15 @@ class ReasoningEngine:
             result_val = "N/A"
 
             # Skip Solver for Purely Conceptual Queries (unless they also requested derivation)
-            if "CONCEPTUAL" in intents and not ("SYMBOLIC" in intents or "NUMERICAL" in intents):
+            if conceptual_only:
                 result_val = "Skipped (Conceptual)"
                 symbolic_plan['equation'] = "Conceptual Explanation Only"
             
             else:
                 # --- PHASE 2: SYMBOLIC FORMULATION ---
                 # Run if SYMBOLIC or NUMERICAL
-                symbolic_plan = await self._phase_2_formulation(user_query, context_data, token)
+                symbolic_plan = fused_plan or await self._phase_2_formulation(user_query, context_data, token)
+                self._expand_rule_reference(symbolic_plan)
                 
                 # Check for Hard Failure (from updated Phase 2 Prompt)
                 if symbolic_plan.get('equation') == "UNDEFINED":
@@ -144,7 +422,8 @@ class ReasoningEngine:
                         result_val = await self._phase_3_execution(symbolic_plan)
                         reasoning_trace.append({
                             "step": 3, "phase": "EXECUTION",
-                            "thought": "Evaluated equation safely.",
+                            "thought": self._execution_thought(symbolic_plan),
+                            "solver_tier": symbolic_plan.get("solver_tier"),
                             "result": result_val
                         })
                     else:
@@ -169,21 +448,20 @@ class ReasoningEngine:
 
             # Robust Phase 4 call with Fallback
             try:
-                final_explanation = await self._phase_4_explanation(user_query, context_data, symbolic_plan, result_val, str(intents), token)
+                final_explanation = await self._phase_4_explanation(user_query, context_data, symbolic_plan, result_val, str(intents), token, on_delta)
+                if on_delta and verification_note:
+                    on_delta(verification_note)
+            except UpstreamRateLimited:
+                raise  # Batch item: retried whole by the runner instead of keeping a bare result
             except Exception as e:
                 final_explanation = f"**Result:** {result_val}\n\n*Note: Detailed engineering explanation unavailable (Service Error: {str(e)}).*"
             
             final_explanation += verification_note
             
-            final_plan = {
-                "action": "SOLVE_NUMERIC" if "NUMERICAL" in intents else ("SOLVE_SYMBOLIC" if "SYMBOLIC" in intents else "EXPLAIN"), 
-                "thought": final_explanation,
-                "equation": symbolic_plan.get('equation', 'N/A'),
-                "parameter_definition": context_data.get('parameter_definition', ''),
-                "physical_interpretation": context_data.get('physical_interpretation', ''),
-                "applicability_check": context_data.get('applicability_check', {}),
-                "variable": symbolic_plan.get('variables', '') 
-            }
+            final_plan = self._build_plan(intents, final_explanation, context_data, symbolic_plan)
+            final_plan["intent_source"] = intent_data.get("source", "llm")
+            # Only an explicit scope sticks to the session; an intent-proposed domain is per question
+            final_plan["retrieval_scope"] = {k: v for k, v in (scope or {}).items() if k in FILTER_FIELDS and v}
 
             return {
                 "status": "success",
@@ -193,6 +471,8 @@ class ReasoningEngine:
                 "candidates": [] 
             }
 
+        except AdmissionRejected:
+            raise  # Surfaces as 429 + Retry-After instead of a generic error reply
         except Exception as e:
             # Fail Gracefully with Trace
             # Clean up the error message for the user
@@ -209,7 +489,156 @@ class ReasoningEngine:
                 "reasoning_steps": reasoning_trace
             }
 
+    async def _handle_followup(self, user_query: str, previous_turn: dict, token: str) -> Optional[dict]:
+        """
+        Parameter-change follow-ups re-run Phase 3 on the previous equation. Other cued
+        follow-ups get a short Phase 2 re-formulation against the previous rule.
+        Returns None to fall through to the full pipeline.
+        """
+        prev_vars = previous_turn.get("variable", "") or ""
+        is_eval = prev_vars.startswith("EVAL")
+        assignments = self.solver.parse_variable_assignments(prev_vars.replace("EVAL", "", 1)) if is_eval else {}
+
+        followup = detect_followup(user_query, previous_turn, known_symbols(previous_turn.get("equation"), assignments))
+        if not followup:
+            return None
+
+        overrides = followup["overrides"]
+        intents = previous_turn.get("intents") or ["NUMERICAL"]
+        context_data = {
+            "parameter_definition": previous_turn.get("parameter_definition", ""),
+            "physical_interpretation": previous_turn.get("physical_interpretation", ""),
+            "applicability_check": previous_turn.get("applicability_check", {}),
+            "selected_rule_id": previous_turn.get("selected_rule_id", "N/A"),
+        }
+        reasoning_trace = [{
+            "step": 0, "phase": "FOLLOW_UP",
+            "thought": f"Detected {followup['kind']} follow-up; reusing previous turn context (no retrieval).",
+            "overrides": overrides
+        }]
+
+        try:
+            if followup["kind"] == "PARAMETER_CHANGE" and is_eval:
+                assignments.update(overrides)
+                symbolic_plan = {
+                    "equation": previous_turn["equation"],
+                    "variables": "EVAL, " + ", ".join(f"{k}={v!r}" for k, v in assignments.items()),
+                    "rule_ref": previous_turn.get("rule_ref")
+                }
+            else:
+                symbolic_plan = await self._phase_2_formulation(user_query, context_data, token, previous_plan=previous_turn)
+                if symbolic_plan.get('equation') == "UNDEFINED":
+                    return None
+                self._expand_rule_reference(symbolic_plan)
+                reasoning_trace.append({
+                    "step": 2, "phase": "FORMULATION",
+                    "thought": "Re-formulated equation from previous turn's rule.",
+                    "equation": symbolic_plan['equation']
+                })
+
+            result_val = await self._phase_3_execution(symbolic_plan)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            print(f"DEBUG: Follow-up shortcut failed, running full pipeline. Error: {e}")
+            return None
+
+        reasoning_trace.append({
+            "step": 3, "phase": "EXECUTION",
+            "thought": self._execution_thought(symbolic_plan),
+            "solver_tier": symbolic_plan.get("solver_tier"),
+            "result": result_val
+        })
+
+        changes = ", ".join(f"{k} = {v:g}" for k, v in overrides.items())
+        explanation = (
+            f"**Result:** {result_val}\n\n"
+            f"Re-evaluated `{symbolic_plan['equation']}` with {changes}; "
+            f"all other parameters are unchanged from the previous turn."
+        )
+        if "NUMERICAL" not in intents:
+            intents = intents + ["NUMERICAL"]
+
+        plan = self._build_plan(intents, explanation, context_data, symbolic_plan)
+        plan["intent_source"] = "followup"
+        return {
+            "status": "success",
+            "plan": plan,
+            "result": result_val,
+            "reasoning_steps": reasoning_trace,
+            "candidates": []
+        }
+
+    def _handle_netlist(self, user_query: str, intents: list, reasoning_trace: list) -> Optional[dict]:
+        """
+        Solves a netlist embedded in the query with sparse MNA.
+        Returns None (full pipeline) when the netlist does not parse or is singular.
+        """
+        try:
+            elements, frequency = parse_netlist(user_query)
+            system = MNASystem(elements, frequency)
+            solution = system.solve()
+        except (ValueError, KeyError) as e:
+            print(f"DEBUG: Netlist shortcut failed, running full pipeline. Error: {e}")
+            return None
+        metrics.observe("mna_solve_ms", solution.solve_ms)
+
+        if frequency > 0:
+            voltages = {
+                node: complex(re, solution.node_voltages_imag[node])
+                for node, re in solution.node_voltages.items()
+            }
+            lines = [f"- V({node}) = {abs(v):.6g} V ∠ {np.degrees(np.angle(v)):.2f}°" for node, v in voltages.items()]
+        else:
+            lines = [f"- V({node}) = {v:.6g} V" for node, v in solution.node_voltages.items()]
+        shown = lines[:20] + ([f"- ... {len(lines) - 20} more nodes"] if len(lines) > 20 else [])
+        analysis = f"AC analysis at {frequency:g} Hz" if frequency > 0 else "DC operating point"
+        result_val = ", ".join(line[2:] for line in lines[:20])
+
+        reasoning_trace.append({
+            "step": 3, "phase": "EXECUTION",
+            "thought": f"Solved {len(elements)}-element netlist by sparse MNA ({system.size} unknowns, {solution.solve_ms:.2f} ms).",
+            "equation": "MNA",
+            "result": result_val
+        })
+        explanation = (
+            f"**{analysis}** ({len(elements)} elements, {system.size} unknowns), solved exactly by "
+            f"Modified Nodal Analysis:\n\n" + "\n".join(shown)
+        )
+        context_data = {
+            "parameter_definition": "Netlist elements as given.",
+            "physical_interpretation": analysis,
+            "applicability_check": {
+                "conditions_required": ["Linear lumped elements", "Single frequency or DC"],
+                "conditions_met": True,
+                "justification": "Every element stamp is linear; the system is solved exactly."
+            },
+            "selected_rule_id": "MNA",
+        }
+        symbolic_plan = {"equation": "MNA", "variables": ""}
+        return {
+            "status": "success",
+            "plan": self._build_plan(intents, explanation, context_data, symbolic_plan),
+            "result": result_val,
+            "simulation": solution.model_dump(),
+            "reasoning_steps": reasoning_trace,
+            "candidates": []
+        }
+
     async def _phase_0_intent(self, user_query: str, token: str) -> dict:
+        # Local classifier first; the LLM only sees queries it is unsure about
+        if self.intent_classifier is not None:
+            local = self.intent_classifier.predict(user_query)
+            if local["confidence"] >= settings.INTENT_CONFIDENCE_THRESHOLD:
+                metrics.inc("intent_classifications_total", {"path": "local"})
+                return local
+        metrics.inc("intent_classifications_total", {"path": "llm"})
+
+        # With a partitioned corpus the intent call also picks the slice retrieval searches
+        domains = sorted(self.retriever.partitions()) if self.retriever.partition_by == "domain" else []
+        domain_block = f"\n        Domains (choose one only if the query clearly belongs to it): {domains}\n" if domains else ""
+        domain_field = '\n            "domain": "One of the Domains or null",' if domains else ""
+
         prompt = f"""
         PHASE 0: INTENT CLASSIFICATION
         Goal: Classify the user query into one or more categories.
@@ -221,10 +650,10 @@ class ReasoningEngine:
         - CONCEPTUAL: Explanatory questions.
         - SYMBOLIC: Derivation requested.
         - NUMERICAL: Calculation requested.
-
+        {domain_block}
         OUTPUT JSON:
         {{
-            "intents": ["SYMBOLIC", "NUMERICAL"], 
+            "intents": ["SYMBOLIC", "NUMERICAL"], {domain_field}
             "response": "Pre-generated response if GREETING"
         }}
         """
@@ -233,11 +662,27 @@ class ReasoningEngine:
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
-        return await self._get_json_response_with_retry(messages, token)
-
-    async def _phase_1_context(self, user_query: str, token: str) -> dict:
-        candidates = self.retriever.search(user_query, n_results=3)
-        candidate_str = "\n".join([f"RuleID: {c.rule.rule_id}\nDef: {c.rule.formal_definition}\nCond: {c.rule.applicability_conditions}" for c in candidates])
+        return await self._get_json_response_with_retry(messages, token, phase="intent")
+
+    async def _retrieve(self, user_query: str, scope: Optional[dict], intent_domain: Optional[str]) -> tuple[list, dict]:
+        """Filtered search when a scope applies; falls back to the whole corpus if the slice has no match."""
+        filters = {k: v for k, v in (scope or {}).items() if k in FILTER_FIELDS and v}
+        if "domain" not in filters and isinstance(intent_domain, str) and intent_domain in self.retriever.partitions():
+            filters["domain"] = intent_domain
+        if filters:
+            candidates = await self._search(user_query, **filters)
+            if candidates:
+                return candidates, filters
+            metrics.inc("retrieval_searches_total", {"scope": "fallback"})
+        return await self._search(user_query), {}
+
+    def _format_candidates(self, candidates: list) -> str:
+        return "\n".join([f"RuleID: {c.rule.rule_id}\nDef: {c.rule.formal_definition}\nCond: {c.rule.applicability_conditions}" for c in candidates])
+
+    async def _phase_1_context(self, user_query: str, token: str, candidates: Optional[list] = None) -> dict:
+        if candidates is None:
+            candidates = await self._search(user_query)
+        candidate_str = self._format_candidates(candidates)
         
         prompt = f"""
         PHASE 1: ENGINEERING CONTEXT
@@ -268,16 +713,87 @@ class ReasoningEngine:
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
-        return await self._get_json_response_with_retry(messages, token)
+        return await self._get_json_response_with_retry(messages, token, schema=EngineeringContext, phase="context")
+
+    async def _phase_12_fused(self, user_query: str, candidates: list, token: str) -> Optional[tuple[dict, dict]]:
+        """
+        Phases 1 and 2 in a single round trip. Returns (context, plan) validated against
+        EngineeringContext/SymbolicPlan, or None so the caller runs the two-call path.
+        """
+        prompt = f"""
+        PHASE 1+2: ENGINEERING CONTEXT AND SYMBOLIC FORMULATION
+        Goal: Define the problem physics, select a rule, then create the symbolic equation from it.
+        
+        User Query: {user_query}
+        
+        Available Rules:
+        {self._format_candidates(candidates)}
+        {self._precompiled_block([c.rule.rule_id for c in candidates])}
+        Formulation Instructions:
+        - Output the Python expression for the parameter in "plan.equation".
+        - Output variable assignments in "plan.variables".
+        
+        CRITICAL CONSTRAINTS:
+        1. DO NOT use port variables (V1, I1, V2, I2) in the equation.
+        2. Express the result ONLY in terms of component impedances (Z1, Z2, R1, etc.) or intermediate values defined in 'variables'.
+        3. STRICT: If the equation cannot be derived explicitly from the selected rule definition, return "equation": "UNDEFINED".
+        4. No assumptions. Ever.
+        
+        OUTPUT JSON (one object):
+        IMPORTANT: Single backslashes in strings MUST be escaped.
+        {{
+            "context": {{
+                "parameter_definition": "Formal definition",
+                "physical_interpretation": "Physical context",
+                "candidate_rules": ["List IDs"],
+                "selected_rule_id": "Best Rule ID",
+                "rule_rejection_reasoning": "Why others failed",
+                "applicability_check": {{
+                    "conditions_required": ["List"],
+                    "conditions_met": true/false,
+                    "justification": "CRITICAL: If rule conditions not met, set false."
+                }}
+            }},
+            "plan": {{
+                "equation": "R_load * I_in", 
+                "variables": "EVAL, R_load=100, I_in=0.5"
+            }}
+        }}
+        """
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        try:
+            data = await self._get_json_response_with_retry(messages, token, max_retries=0, phase="context_formulation")
+            context = EngineeringContext(**data["context"])
+            plan = SymbolicPlan(**data["plan"])
+        except (ValueError, ValidationError, KeyError, TypeError) as e:
+            print(f"DEBUG: Fused Phase 1+2 output rejected, using two-call path. Error: {e}")
+            metrics.inc("fused_phase_total", {"outcome": "fallback"})
+            return None
+
+        metrics.inc("fused_phase_total", {"outcome": "accepted"})
+        return context.model_dump(), plan.model_dump()
+
+    async def _phase_2_formulation(self, user_query: str, context: dict, token: str, previous_plan: Optional[dict] = None) -> dict:
+        previous_block = ""
+        if previous_plan:
+            previous_block = f"""
+        Previous Turn (update it for the follow-up request below):
+        Follow-up Request: {user_query}
+        Previous Equation: {previous_plan.get('equation', 'N/A')}
+        Previous Variables: {previous_plan.get('variable', '')}
+        """
 
-    async def _phase_2_formulation(self, user_query: str, context: dict, token: str) -> dict:
         prompt = f"""
         PHASE 2: SYMBOLIC FORMULATION
         Goal: Create the symbolic equation based on Phase 1.
         
         Phase 1 Definition: {context['parameter_definition']}
         Selected Rule: {context['selected_rule_id']}
-        
+        {self._precompiled_block([context['selected_rule_id']])}
+        {previous_block}
         Instructions:
         - Output the Python expression for the parameter.
         - Output variable assignments in 'variables' field.
@@ -300,20 +816,75 @@ class ReasoningEngine:
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
-        return await self._get_json_response_with_retry(messages, token)
+        return await self._get_json_response_with_retry(messages, token, schema=SymbolicPlan, phase="formulation")
+
+    def _precompiled_block(self, rule_ids: list) -> str:
+        """Prompt section listing closed forms from the rule library for the given rules."""
+        if self.rule_library is None:
+            return ""
+        described = "\n        ".join(d.replace("\n", "\n        ") for d in (self.rule_library.describe(r) for r in rule_ids) if d)
+        if not described:
+            return ""
+        return f"""
+        Precompiled Solutions (already solved and verified; to use one, set "equation" to its reference, e.g. "rule:RuleID:Variable"):
+        {described}
+        """
+
+    def _expand_rule_reference(self, plan: dict) -> dict:
+        """
+        Turns an equation of the form "rule:<RuleID>:<Variable>" into the rule's
+        closed form (kept under "rule_ref" for Phase 3). Raises on unknown references.
+        """
+        solutions = self.rule_library.resolve(plan.get("equation", "")) if self.rule_library is not None else None
+        if solutions:
+            plan["rule_ref"] = plan["equation"]
+            if len(solutions[0].roots) == 1:
+                plan["equation"] = str(solutions[0].roots[0])
+        return plan
+
+    def _execution_thought(self, plan: dict) -> str:
+        if plan.get("rule_ref") and self.rule_library is not None:
+            return f"Evaluated precompiled solution {plan['rule_ref']} (rule library {self.rule_library.version})."
+        if plan.get("solver_tier") not in (None, "evaluate"):
+            return f"Solved symbolically ({plan['solver_tier']} tier)."
+        return "Evaluated equation safely."
 
     async def _phase_3_execution(self, plan: dict) -> str:
         # Pure Python, no AI
         variable_field = plan.get("variables", "")
-        if variable_field.startswith("EVAL"):
+        is_eval = variable_field.startswith("EVAL")
+        params = {}
+        if is_eval:
             param_str = variable_field.replace("EVAL", "").strip()
             if param_str.startswith(","): param_str = param_str[1:]
             params = self.solver.parse_variable_assignments(param_str)
+
+        # Precompiled rule solution: a dict lookup plus a compiled call, no sympy.solve
+        if plan.get("rule_ref") and self.rule_library is not None:
+            solutions = self.rule_library.resolve(plan["rule_ref"])
+            if is_eval:
+                solution, value = self.rule_library.evaluate(plan["rule_ref"], params)
+            else:
+                solution, value = solutions[0], str(solutions[0].roots)
+            metrics.inc("rule_library_lookups_total", {"mode": "eval" if is_eval else "symbolic"})
+            plan["solver_tier"] = "precompiled"
+            if len(solution.roots) == 1:
+                plan["equation"] = str(solution.roots[0])  # The form actually evaluated
+            return value
+
+        if is_eval:
+            plan["solver_tier"] = "evaluate"
             return self.solver.evaluate_numeric(plan["equation"], params)
         else:
-            return self.solver.solve_symbolic(plan["equation"], variable_field)
-
-    async def _phase_4_explanation(self, query: str, context: dict, plan: dict, result: str, intent: str, token: str) -> str:
+            # Tiers can take seconds in the worst case: keep the event loop free meanwhile
+            solved = await asyncio.to_thread(self.solver.solve_symbolic_detailed, plan["equation"], variable_field)
+            plan["solver_tier"] = solved["tier"]
+            metrics.inc("solver_tier_total", {"tier": solved["tier"]})
+            metrics.observe("solver_ms", solved["ms"], {"tier": solved["tier"]})
+            return solved["result"]
+
+    async def _phase_4_explanation(self, query: str, context: dict, plan: dict, result: str, intent: str, token: str,
+                                   on_delta: Optional[Callable[[str], None]] = None) -> str:
         prompt = f"""
         PHASE 4: EXPLANATION
         Goal: Explain the result to the engineer professionally.
@@ -335,7 +906,7 @@ class ReasoningEngine:
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
-        return await self._call_ai(messages, token)
+        return await self._call_ai(messages, token, phase="explanation", on_delta=on_delta)
 
     async def _phase_5_deep_verify(self, query: str, context: dict, plan: dict, token: str) -> dict:
         try:
@@ -371,6 +942,6 @@ class ReasoningEngine:
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
-        return await self._get_json_response_with_retry(messages, token)
+        return await self._get_json_response_with_retry(messages, token, phase="verify")
 
 engine = ReasoningEngine()
@@ -0,0 +1,76 @@
+import re
+from typing import Optional
+
+# "Z3 = 50 ohms", "R_load: 2.2k", "set C1 to 10 uF"
+ASSIGNMENT_RE = re.compile(
+    r"\b([A-Za-z][A-Za-z0-9_]*)\s*(?:=|:|\bto\b)\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*([A-Za-zΩµ]*)"
+)
+FOLLOWUP_CUE_RE = re.compile(
+    r"^\s*(now|what if|what about|and|then|with|try|change|set|use|instead|same|again|recompute|redo|repeat)\b",
+    re.IGNORECASE,
+)
+# What may remain of a bare assignment message ("Z1 = 5, Z2 = 7 and Z3 = 9") once the assignments are removed
+FILLER_RE = re.compile(r"[\s,;.!?]|\band\b", re.IGNORECASE)
+
+SI_PREFIXES = {
+    "p": 1e-12, "n": 1e-9, "u": 1e-6, "µ": 1e-6, "m": 1e-3,
+    "k": 1e3, "K": 1e3, "M": 1e6, "meg": 1e6, "G": 1e9,
+}
+UNITS = {"ohm", "ohms", "Ω", "f", "h", "v", "a", "hz", "s", "w", "farad", "henry", "volt", "volts", "amp", "amps"}
+
+
+def _unit_scale(suffix: str) -> float:
+    if not suffix:
+        return 1.0
+    if suffix.lower() in UNITS:
+        return 1.0
+    if suffix in SI_PREFIXES:
+        return SI_PREFIXES[suffix]
+    for prefix in ("meg", suffix[0]):
+        rest = suffix[len(prefix):]
+        if suffix.startswith(prefix) and prefix in SI_PREFIXES and (rest.lower() in UNITS or rest == ""):
+            return SI_PREFIXES[prefix]
+    return 1.0
+
+
+def parse_overrides(query: str) -> dict[str, float]:
+    """Extracts `name = value[unit]` assignments from a user message, applying SI prefixes."""
+    overrides = {}
+    for name, value, suffix in ASSIGNMENT_RE.findall(query):
+        overrides[name] = float(value) * _unit_scale(suffix)
+    return overrides
+
+
+def detect_followup(query: str, previous_turn: Optional[dict], symbols: set[str]) -> Optional[dict]:
+    """
+    Classifies a message against the previous assistant turn's meta_audit.
+
+    Returns None for an unrelated message, otherwise:
+      {"kind": "PARAMETER_CHANGE", "overrides": {...}} - cued or assignment-only message whose
+                                                          assignments all target known symbols
+      {"kind": "REFORMULATE", "overrides": {...}}      - cued follow-up ("now with ...") that introduces new symbols
+
+    Without a cue, a sentence around the assignments ("Find the gain with Z1=100")
+    is a new question even when it reuses the previous equation's symbol names.
+    """
+    if not previous_turn or not previous_turn.get("equation") or previous_turn.get("equation") in ("N/A", "UNDEFINED", "Conceptual Explanation Only"):
+        return None
+
+    overrides = parse_overrides(query)
+    if not overrides:
+        return None
+
+    cued = bool(FOLLOWUP_CUE_RE.match(query))
+    if set(overrides) <= symbols and (cued or not FILLER_RE.sub("", ASSIGNMENT_RE.sub("", query))):
+        return {"kind": "PARAMETER_CHANGE", "overrides": overrides}
+    if cued:
+        return {"kind": "REFORMULATE", "overrides": overrides}
+    return None
+
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def known_symbols(equation: str, assignments: dict) -> set[str]:
+    """Identifiers of the previous turn's equation and variable assignments."""
+    return (set(IDENTIFIER_RE.findall(equation or "")) | set(assignments)) - {"EVAL"}
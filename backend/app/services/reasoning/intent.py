@@ -0,0 +1,96 @@
+"""
+Local Phase 0 intent classifier.
+
+A hashed bag-of-words/bigram logistic model (one sigmoid per label) plus a
+numeric-literal detector. Prediction is a handful of dict lookups, so the engine
+can skip the Phase 0 LLM call whenever the model is confident. Weights are
+produced by scripts/train_intent_classifier.py.
+"""
+import json
+import math
+import os
+import re
+import zlib
+from typing import Optional
+
+LABELS = ["GREETING", "CONCEPTUAL", "SYMBOLIC", "NUMERICAL"]
+N_FEATURES = 4096
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "intent_model.json")
+
+TOKEN_RE = re.compile(r"[a-z_][a-z0-9_]*|\d+(?:\.\d+)?|[=?+\-*/^]")
+# "R1 = 50", "10 kohm", "2.2uF", "5V" - numbers bound to a quantity imply a calculation
+NUMERIC_LITERAL_RE = re.compile(
+    r"(?:[A-Za-z][A-Za-z0-9_]*\s*=\s*-?\d)|(?:\d+(?:\.\d+)?\s*(?:[pnuµmkKMG]?(?:ohms?|Ω|F|H|V|A|Hz|W|S)\b|[kKM]\b))"
+)
+
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode()) % N_FEATURES
+
+
+def featurize(query: str) -> list[int]:
+    """Sorted unique hashed feature indices. Shared by training and inference."""
+    tokens = TOKEN_RE.findall(query.lower())
+    features = {f"w:{t}" for t in tokens}
+    features.update(f"b:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    features.add(f"len:{min(len(tokens) // 4, 6)}")
+    if NUMERIC_LITERAL_RE.search(query):
+        features.add("numeric_literal")
+    if any(t.replace(".", "", 1).isdigit() for t in tokens):
+        features.add("has_number")
+    return sorted({_bucket(f) for f in features})
+
+
+class IntentClassifier:
+    def __init__(self, weights: dict[str, dict[int, float]], bias: dict[str, float], version: str = "unversioned"):
+        self.weights = weights
+        self.bias = bias
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> Optional["IntentClassifier"]:
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        weights = {label: {int(i): w for i, w in data["weights"][label].items()} for label in LABELS}
+        return cls(weights, data["bias"], data.get("version", "unversioned"))
+
+    def probabilities(self, query: str) -> dict[str, float]:
+        features = featurize(query)
+        probs = {}
+        for label in LABELS:
+            w = self.weights[label]
+            z = self.bias[label] + sum(w.get(i, 0.0) for i in features)
+            probs[label] = 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+        return probs
+
+    def predict(self, query: str) -> dict:
+        """
+        Returns the Phase 0 payload shape ({"intents": [...]}) plus "confidence":
+        the least certain per-label decision, so one ambiguous label forces a fallback.
+        """
+        probs = self.probabilities(query)
+        if NUMERIC_LITERAL_RE.search(query):
+            # Numeric-literal detector overrides the linear model
+            probs["NUMERICAL"] = max(probs["NUMERICAL"], 0.99)
+            probs["GREETING"] = min(probs["GREETING"], 0.01)
+
+        confidence = min(max(p, 1.0 - p) for p in probs.values())
+
+        if probs["GREETING"] >= 0.5:
+            return {
+                "intents": ["GREETING"],
+                "response": "Hello. Ready to compute.",
+                "confidence": confidence,
+                "source": "local",
+            }
+
+        task_labels = [l for l in LABELS if l != "GREETING"]
+        intents = [l for l in task_labels if probs[l] >= 0.5]
+        if not intents:
+            intents = [max(task_labels, key=lambda l: probs[l])]
+        return {"intents": intents, "confidence": confidence, "source": "local"}
+
+
+classifier = IntentClassifier.load()
@@ -0,0 +1,203 @@
+"""
+Deterministic repair of almost-JSON model output.
+
+Tried in order, cheapest first, before the engine pays for an LLM retry:
+  1. balanced   - first balanced {...} block (string aware), ignoring prose and fences
+  2. escapes    - lone backslashes from LaTeX (\\frac, \\theta, \\Omega) doubled
+  3. tolerant   - forgiving parser: trailing commas, single quotes, bare keys,
+                  True/False/None and raw newlines in strings
+
+Output cut off mid-object, mid-array or mid-string is not repaired: the answer is
+incomplete, so it fails here and goes to the engine's retry. An echoed `true/false`
+template becomes None, which a schema with a bool field rejects the same way.
+"""
+import json
+import re
+
+# A valid escape is kept; any other backslash is doubled. \b \f \n \r \t directly
+# followed by a letter is almost always LaTeX (\frac, \theta, \beta, \rho, \nabla).
+_ESCAPE_RE = re.compile(r'\\(?:u[0-9a-fA-F]{4}|[bfnrt](?![A-Za-z])|["\\/])|\\')
+
+_LATEX_ESCAPE_RE = re.compile(r'(?<!\\)\\[bfnrt][A-Za-z]')
+
+_BARE_RE = re.compile(r"[A-Za-z0-9_+\-./]+")
+
+_LITERALS = {
+    "true": True, "True": True, "false": False, "False": False,
+    "null": None, "None": None, "none": None,
+    # Prompt templates show `true/false`; a verbatim echo means the model did not decide
+    "true/false": None, "false/true": None,
+}
+
+
+def extract_balanced(text: str) -> str:
+    """Returns the first {...} block with balanced braces, or the unterminated tail."""
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("No JSON object found")
+    depth, in_string, quote, escaped = 0, False, "", False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                in_string = False
+        elif ch in "\"'":
+            in_string, quote = True, ch
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_escapes(text: str) -> str:
+    return _ESCAPE_RE.sub(lambda m: m.group(0) if len(m.group(0)) > 1 else "\\\\", text)
+
+
+class _TolerantParser:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def parse(self):
+        return self._value()
+
+    def _ws(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n,":
+            # Commas are skipped like whitespace: tolerates trailing and missing commas
+            self.pos += 1
+
+    def _peek(self) -> str:
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def _value(self):
+        self._ws()
+        ch = self._peek()
+        if ch == "{":
+            return self._object()
+        if ch == "[":
+            return self._array()
+        if ch in "\"'":
+            return self._string()
+        if ch == "":
+            raise ValueError("Unexpected end of input")
+        return self._bare()
+
+    def _object(self) -> dict:
+        self.pos += 1
+        result = {}
+        while True:
+            self._ws()
+            ch = self._peek()
+            if ch == "}":
+                self.pos += 1
+                return result
+            if ch == "":
+                raise ValueError("Truncated output: unterminated object")
+            key = self._string() if ch in "\"'" else str(self._bare())
+            self._ws()
+            if self._peek() != ":":
+                raise ValueError(f"Expected ':' after key {key!r} at position {self.pos}")
+            self.pos += 1
+            self._ws()
+            if self._peek() == "":
+                raise ValueError(f"Truncated output: no value for key {key!r}")
+            if self._peek() == "}":
+                result[key] = None
+                continue
+            result[key] = self._value()
+
+    def _array(self) -> list:
+        self.pos += 1
+        result = []
+        while True:
+            self._ws()
+            ch = self._peek()
+            if ch == "]":
+                self.pos += 1
+                return result
+            if ch == "":
+                raise ValueError("Truncated output: unterminated array")
+            if ch == "}":
+                return result  # Mismatched bracket: close the array
+            result.append(self._value())
+
+    def _string(self) -> str:
+        quote = self._peek()
+        self.pos += 1
+        out = []
+        while self.pos < len(self.text):
+            ch = self.text[self.pos]
+            if ch == quote:
+                self.pos += 1
+                return "".join(out)
+            if ch == "\\" and self.pos + 1 < len(self.text):
+                if self.text[self.pos + 1] == quote:
+                    out.append(quote)
+                    self.pos += 2
+                    continue
+                match = _ESCAPE_RE.match(self.text, self.pos)
+                token = match.group(0)
+                if len(token) == 1:
+                    out.append("\\")  # Invalid escape: keep the backslash literally
+                    self.pos += 1
+                else:
+                    out.append(json.loads(f'"{token}"'))
+                    self.pos += len(token)
+                continue
+            out.append(ch)
+            self.pos += 1
+        raise ValueError("Truncated output: unterminated string")
+
+    def _bare(self):
+        match = _BARE_RE.match(self.text, self.pos)
+        if not match:
+            raise ValueError(f"Unexpected character {self._peek()!r} at position {self.pos}")
+        self.pos = match.end()
+        word = match.group(0)
+        if word in _LITERALS:
+            return _LITERALS[word]
+        try:
+            return int(word)
+        except ValueError:
+            pass
+        try:
+            return float(word)
+        except ValueError:
+            return word  # Bare identifier (e.g. unquoted key)
+
+
+def tolerant_loads(text: str):
+    return _TolerantParser(text).parse()
+
+
+def repair_json(content: str) -> tuple[dict, str]:
+    """
+    Returns (object, stage) for the first repair stage that yields a JSON object.
+    Raises ValueError when none does.
+    """
+    block = extract_balanced(content)
+    attempts = [
+        ("balanced", lambda: json.loads(block)),
+        ("escapes", lambda: json.loads(repair_escapes(block))),
+        ("tolerant", lambda: tolerant_loads(block)),
+    ]
+    if _LATEX_ESCAPE_RE.search(block):
+        # "\frac" is valid JSON (form feed + "rac"); don't accept that silently
+        attempts.pop(0)
+    last_error = None
+    for stage, attempt in attempts:
+        try:
+            value = attempt()
+        except (ValueError, RecursionError) as e:
+            last_error = e
+            continue
+        if isinstance(value, dict):
+            return value, stage
+    raise ValueError(f"JSON Repair Failed: {last_error}")
@@ -0,0 +1,198 @@
+"""
+Precompiled rule-equation library.
+
+At ingest time (seed_rules.py) every governing equation "lhs = rhs" is parsed once
+with SafeSolver's restricted parser and solved for each of its free variables.
+The closed forms are stored in a versioned JSON artifact (RULE_LIBRARY_PATH);
+at startup they are re-parsed and lambdified, so "solve rule X for Y" at request
+time is a dict lookup plus a compiled call, never sympy.solve.
+
+Time-domain notation is flattened before parsing: "v(t) = i(t) * R" is stored as
+"v = i*R". Equations the safe parser rejects (e.g. "Sum(v_drop) = ...") are
+recorded under "skipped" and remain text-only.
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+import sympy
+
+from app.core.config import settings
+from app.services.reasoning.solver import SafeSolver
+
+FORMAT_VERSION = 1
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# "rule:<RuleID>:<Variable>" in a SymbolicPlan equation references a precompiled solution
+RULE_REF_RE = re.compile(r"^\s*rule:([A-Za-z0-9_\-]+):([A-Za-z_][A-Za-z0-9_]*)\s*$")
+_TIME_ARG_RE = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*)\((?:t|s|w|jw)\)")
+
+
+def library_path(path: Optional[str] = None) -> str:
+    # Relative paths are anchored at backend/: seed_rules.py runs from the repo root, the API from backend/
+    path = path or settings.RULE_LIBRARY_PATH
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
+
+def _flatten_time_args(text: str, solver: SafeSolver) -> str:
+    return _TIME_ARG_RE.sub(lambda m: m.group(0) if m.group(1) in solver.allowed_locals else m.group(1), text)
+
+
+def compile_equation(equation: str, solver: SafeSolver) -> dict:
+    """
+    {"equation", "lhs", "symbols", "solutions": {var: [root, ...]}} for one "lhs = rhs"
+    string. "lhs" is the variable the equation is written for (None if not a bare symbol).
+    """
+    if equation.count("=") != 1:
+        raise ValueError("Expected exactly one '='")
+    lhs, rhs = (solver.parse(_flatten_time_args(side, solver)) for side in equation.split("="))
+    expr = lhs - rhs
+    symbols = sorted(expr.free_symbols, key=str)
+    if not symbols:
+        raise ValueError("No free variables")
+
+    solutions = {}
+    for var in symbols:
+        solved = sympy.solve(expr, var)
+        if solved:
+            solutions[str(var)] = [str(s) for s in solved]
+    return {
+        "equation": equation,
+        "lhs": str(lhs) if isinstance(lhs, sympy.Symbol) else None,
+        "symbols": [str(s) for s in symbols],
+        "solutions": solutions,
+    }
+
+
+def build_library(rules: list, solver: Optional[SafeSolver] = None) -> dict:
+    """Artifact dict for a list of Rule models. Version is a hash of the equations."""
+    solver = solver or SafeSolver()
+    entries = {}
+    for rule in rules:
+        compiled, skipped = [], []
+        for equation in rule.governing_equations:
+            try:
+                compiled.append(compile_equation(equation, solver))
+            except Exception as e:
+                skipped.append({"equation": equation, "error": str(e)})
+        entries[rule.rule_id] = {"equations": compiled, "skipped": skipped}
+
+    digest = hashlib.sha256(json.dumps(
+        {r.rule_id: r.governing_equations for r in rules}, sort_keys=True
+    ).encode()).hexdigest()[:12]
+    return {
+        "format": FORMAT_VERSION,
+        "version": digest,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "sympy_version": sympy.__version__,
+        "rules": entries,
+    }
+
+
+def write_library(library: dict, path: Optional[str] = None) -> None:
+    path = library_path(path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(library, f, indent=1)
+    os.replace(tmp, path)  # Readers never see a half-written artifact
+
+
+class CompiledSolution:
+    """All roots of one governing equation solved for one variable, lambdified."""
+
+    def __init__(self, rule_id: str, variable: str, equation: str, roots: list[sympy.Expr]):
+        self.rule_id = rule_id
+        self.variable = variable
+        self.equation = equation
+        self.roots = roots
+        self.args = sorted({str(s) for r in roots for s in r.free_symbols})
+        arg_symbols = [sympy.Symbol(a) for a in self.args]
+        self._fns = [sympy.lambdify(arg_symbols, r, modules="numpy") for r in roots]
+
+    def accepts(self, params: dict) -> bool:
+        return all(a in params for a in self.args)
+
+    def __call__(self, params: dict[str, float]):
+        """The value, or a list of values when the equation has several roots."""
+        values = []
+        for fn in self._fns:
+            value = complex(fn(*(params[a] for a in self.args)))
+            values.append(value.real if value.imag == 0 else value)
+        return values[0] if len(values) == 1 else values
+
+    def __str__(self) -> str:
+        return " | ".join(str(r) for r in self.roots)
+
+
+class RuleLibrary:
+    def __init__(self, data: dict, solver: Optional[SafeSolver] = None):
+        solver = solver or SafeSolver()
+        self.version = data.get("version", "unversioned")
+        # (rule_id, variable) -> one CompiledSolution per equation containing the variable
+        self.solutions: dict[tuple[str, str], list[CompiledSolution]] = {}
+        self.equations: dict[str, list[dict]] = {}
+        for rule_id, entry in data.get("rules", {}).items():
+            self.equations[rule_id] = entry["equations"]
+            for eq in entry["equations"]:
+                for var, roots in eq["solutions"].items():
+                    self.solutions.setdefault((rule_id, var), []).append(
+                        CompiledSolution(rule_id, var, eq["equation"], [solver.parse(r) for r in roots])
+                    )
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["RuleLibrary"]:
+        path = library_path(path)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("format") != FORMAT_VERSION:
+                print(f"WARNING: Rule library {path} has format {data.get('format')}, expected {FORMAT_VERSION}; ignoring.")
+                return None
+            return cls(data)
+        except Exception as e:
+            print(f"WARNING: Failed to load rule library {path}: {e}")
+            return None
+
+    def lookup(self, rule_id: str, variable: str) -> list[CompiledSolution]:
+        return self.solutions.get((rule_id, variable), [])
+
+    def resolve(self, reference: str) -> Optional[list[CompiledSolution]]:
+        """Solutions for a "rule:<RuleID>:<Variable>" reference, None if it is not one."""
+        match = RULE_REF_RE.match(reference or "")
+        if not match:
+            return None
+        solutions = self.lookup(*match.groups())
+        if not solutions:
+            raise ValueError(f"No precompiled solution for {match.group(1)}:{match.group(2)}")
+        return solutions
+
+    def evaluate(self, reference: str, params: dict[str, float]) -> tuple[CompiledSolution, object]:
+        """Evaluates the first solved form of the reference whose inputs are all given."""
+        solutions = self.resolve(reference)
+        if solutions is None:
+            raise ValueError(f"Not a rule reference: {reference}")
+        for solution in solutions:
+            if solution.accepts(params):
+                return solution, solution(params)
+        needs = " or ".join(str(s.args) for s in solutions)
+        raise ValueError(f"Missing values for {reference}: needs {needs}")
+
+    def describe(self, rule_id: str) -> str:
+        """Prompt block: each equation in its written direction plus the other solvable variables."""
+        lines, others = [], set()
+        for eq in self.equations.get(rule_id, []):
+            if eq["lhs"]:
+                form = " | ".join(eq["solutions"][eq["lhs"]])
+                lines.append(f"rule:{rule_id}:{eq['lhs']} -> {eq['lhs']} = {form}")
+            others.update(v for v in eq["solutions"] if v != eq["lhs"])
+        if others:
+            lines.append(f"rule:{rule_id}:<X> is also precompiled for X in {sorted(others)}")
+        return "\n".join(lines)
+
+
+library = RuleLibrary.load()
@@ -1,7 +1,191 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import sympy
-from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication, implicit_application
 import numpy as np
 
+# Tiered solving: cheapest strategy that applies wins. Budgets are seconds per tier.
+# The cheap tiers run in small per-tier thread pools; a thread that overruns cannot be
+# killed, so while a tier's threads are all busy with abandoned work the tier is skipped
+# ("saturated") rather than queued behind it. The open-ended tiers (sympy.solve, nsolve)
+# run in per-tier worker processes instead: a task that overruns its budget kills its
+# worker, which is respawned on the next solve.
+TIER_BUDGETS = {
+    "linear": 0.5,
+    "polynomial": 1.0,
+    "rational": 1.0,
+    "general": 3.0,
+    "numeric": 1.0,
+}
+PROCESS_TIERS = ("general", "numeric")
+TIER_WORKERS = 2
+WORKER_START_TIMEOUT_S = 60.0
+_tier_pools: dict[str, "ThreadTier | ProcessTier"] = {}
+_tier_pools_pid = None
+_tier_pools_lock = threading.Lock()
+
+
+def _tier_pool(tier: str) -> "ThreadTier | ProcessTier":
+    # Created per process: warmup() solves in the gunicorn master, and neither pool threads
+    # nor worker pipes survive fork
+    global _tier_pools_pid
+    with _tier_pools_lock:
+        if _tier_pools_pid != os.getpid():
+            _tier_pools.clear()
+            _tier_pools_pid = os.getpid()
+        if tier not in _tier_pools:
+            _tier_pools[tier] = (ProcessTier if tier in PROCESS_TIERS else ThreadTier)(tier, TIER_WORKERS)
+        return _tier_pools[tier]
+
+
+class TierSaturated(Exception):
+    """Every worker of the tier is busy (with work abandoned by earlier timeouts)."""
+
+
+class ThreadTier:
+    def __init__(self, tier: str, size: int):
+        self.size = size
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"solver-{tier}")
+
+    def _release(self, _future):
+        with self._lock:
+            self.busy -= 1
+
+    def run(self, fn, args: tuple, timeout: float):
+        with self._lock:
+            if self.busy >= self.size:
+                raise TierSaturated
+            self.busy += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # Still queued: dropped; already running: finishes in the background
+            raise
+
+
+def _worker_main(conn):
+    conn.send("ready")
+    while True:
+        try:
+            fn, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                conn.send((False, RuntimeError(str(e))))  # Unpicklable exception
+
+
+class _Worker:
+    def __init__(self, tier: str):
+        # spawn, not fork: the API process is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), name=f"solver-{tier}", daemon=True)
+        self.process.start()
+        child.close()
+        # Waits out the interpreter start and imports, so they never count against a budget
+        if not self.conn.poll(WORKER_START_TIMEOUT_S):
+            self.kill()
+            raise RuntimeError(f"{tier} solver worker did not start")
+        self.conn.recv()
+
+    def run(self, fn, args: tuple, timeout: float):
+        self.conn.send((fn, args))
+        if not self.conn.poll(timeout):
+            raise FutureTimeout
+        ok, value = self.conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ProcessTier:
+    def __init__(self, tier: str, size: int):
+        self.tier = tier
+        self.size = size
+        self.busy = 0
+        self._idle: list[_Worker] = []
+        self._lock = threading.Lock()
+
+    def run(self, fn, args: tuple, timeout: float):
+        with self._lock:
+            if self.busy >= self.size:
+                raise TierSaturated
+            self.busy += 1
+            worker = self._idle.pop() if self._idle else None
+        keep = False
+        try:
+            worker = worker or _Worker(self.tier)
+            result = worker.run(fn, args, timeout)
+            keep = True
+            return result
+        except FutureTimeout:
+            raise  # Overran: the worker is killed below, taking the runaway solve with it
+        except (EOFError, OSError) as e:
+            raise RuntimeError(f"{self.tier} solver worker died") from e
+        except Exception:
+            keep = worker is not None  # The strategy raised; the worker is fine
+            raise
+        finally:
+            with self._lock:
+                self.busy -= 1
+                if keep:
+                    self._idle.append(worker)
+            if not keep and worker is not None:
+                worker.kill()
+                self.prestart()
+
+    def prestart(self):
+        """Starts idle workers up to the pool size in the background, so no solve waits for one."""
+        threading.Thread(target=self._fill, name=f"solver-{self.tier}-spawn", daemon=True).start()
+
+    def _fill(self):
+        while True:
+            with self._lock:
+                if self.busy + len(self._idle) >= self.size:
+                    return
+            try:
+                worker = _Worker(self.tier)
+            except Exception as e:
+                print(f"WARNING: Could not start {self.tier} solver worker: {e}")
+                return
+            with self._lock:
+                if self.busy + len(self._idle) < self.size:
+                    self._idle.append(worker)
+                    continue
+            worker.kill()
+            return
+
+
+def _solve_general(expr: sympy.Expr, var: sympy.Symbol) -> list:
+    return sympy.solve(expr, var)
+
+
+def start_workers():
+    """Spawns the process tiers' workers ahead of the first solve (after fork)."""
+    for tier in PROCESS_TIERS:
+        _tier_pool(tier).prestart()
+
+
+class TierNotApplicable(Exception):
+    """The expression is not of the form this tier handles."""
+
 class SafeSolver:
     def __init__(self):
         self.allowed_locals = {
@@ -35,36 +219,144 @@ class SafeSolver:
             "Add": sympy.Add,
             "Pow": sympy.Pow,
         }
-        self.transformations = (standard_transformations + (implicit_multiplication_application,))
+        # No split_symbols: component names like "Za" or "Z1" must stay single symbols
+        self.transformations = (standard_transformations + (implicit_multiplication, implicit_application))
+
+    def parse(self, expression_str: str) -> sympy.Expr:
+        """
+        Parses an expression with the restricted namespace (no globals, whitelisted functions only).
+        """
+        # Sanitize: Remove spaces to handle cases like "Z a" -> "Za"
+        return parse_expr(
+            expression_str.replace(" ", ""),
+            transformations=self.transformations,
+            global_dict={}, # No globals
+            local_dict=self.allowed_locals
+        )
+
+    def parse_equation(self, equation_str: str) -> sympy.Expr:
+        """Like parse(), but "lhs = rhs" becomes lhs - rhs (meaning = 0)."""
+        if equation_str.count("=") == 1 and "==" not in equation_str:
+            lhs, rhs = equation_str.split("=")
+            return self.parse(lhs) - self.parse(rhs)
+        return self.parse(equation_str)
 
     def solve_symbolic(self, equation_str: str, variable_str: str) -> str:
         """
         Solves an equation for a specific variable safely.
         Equation format: "x + y - 5" (meaning = 0)
         """
+        return self.solve_symbolic_detailed(equation_str, variable_str)["result"]
+
+    def solve_symbolic_detailed(self, equation_str: str, variable_str: str) -> dict:
+        """
+        solve_symbolic plus provenance: {"result", "tier", "ms", "attempts": [{tier, outcome, ms}]}.
+        Tiers run in order linear -> polynomial -> rational -> general (sympy.solve) -> numeric
+        (nsolve, only for expressions with no other symbols); the first that succeeds wins.
+        """
+        start = time.perf_counter()
+        attempts = []
+
+        def done(result: str, tier: str) -> dict:
+            return {"result": result, "tier": tier, "ms": (time.perf_counter() - start) * 1000, "attempts": attempts}
+
         try:
-            # Sanitize equation: Remove spaces to handle cases like "Z a" -> "Za"
-            sanitized_eq = equation_str.replace(" ", "")
-            expr = parse_expr(
-                sanitized_eq, 
-                transformations=self.transformations,
-                global_dict={}, # No globals
-                local_dict=self.allowed_locals
-            )
-            
-            target_var = sympy.Symbol(variable_str)
-            
+            expr = self.parse_equation(equation_str)
+            target_var = sympy.Symbol(variable_str.replace(" ", ""))
+
             # Robustness Check:
             # If the expression is purely numeric (no variables) and doesn't contain the target,
             # the AI likely outputted an expression to evaluate (e.g. "10 + 50") instead of an equation equal to zero.
             if not expr.free_symbols and not expr.has(target_var):
-                return str(float(expr))
-
-            solution = sympy.solve(expr, target_var)
-            
-            return str(solution)
+                return done(str(float(expr)), "evaluate")
         except Exception as e:
-            return f"Error: {str(e)}"
+            return done(f"Error: {str(e)}", "parse")
+
+        tiers = [
+            ("linear", self._solve_linear),
+            ("polynomial", self._solve_polynomial),
+            ("rational", self._solve_rational),
+            ("general", _solve_general),
+            ("numeric", self._solve_numeric),
+        ]
+        last_error = "No solution found"
+        for tier, strategy in tiers:
+            tier_start = time.perf_counter()
+            try:
+                solution = _tier_pool(tier).run(strategy, (expr, target_var), TIER_BUDGETS[tier])
+                outcome = "solved"
+            except TierNotApplicable:
+                solution, outcome = None, "skipped"
+            except TierSaturated:
+                solution, outcome, last_error = None, "saturated", f"{tier} solver busy with earlier overruns"
+            except FutureTimeout:
+                solution, outcome, last_error = None, "timeout", f"{tier} solver exceeded {TIER_BUDGETS[tier]}s"
+            except Exception as e:
+                solution, outcome, last_error = None, "error", str(e)
+            attempts.append({"tier": tier, "outcome": outcome, "ms": (time.perf_counter() - tier_start) * 1000})
+            if solution is not None:
+                return done(str(solution), tier)
+        return done(f"Error: {last_error}", "failed")
+
+    # --- Solver tiers: return a list of solutions or raise TierNotApplicable ---
+    def _solve_linear(self, expr: sympy.Expr, var: sympy.Symbol) -> list:
+        # a*x + b with a, b free of x: x = -b/a, no search at all
+        slope = sympy.diff(expr, var)
+        if slope.has(var) or slope == 0:
+            raise TierNotApplicable
+        return [-expr.subs(var, 0) / slope]
+
+    def _solve_polynomial(self, expr: sympy.Expr, var: sympy.Symbol) -> list:
+        try:
+            poly = sympy.Poly(expr, var)
+        except sympy.PolynomialError:
+            raise TierNotApplicable
+        if poly.degree() < 1:
+            raise TierNotApplicable
+        found = sympy.roots(poly, multiple=True)
+        if len(found) == poly.degree():
+            return list(dict.fromkeys(found))
+        if poly.free_symbols - {var}:
+            raise TierNotApplicable  # No closed form and symbolic coefficients: leave to sympy.solve
+        return poly.nroots()
+
+    def _solve_rational(self, expr: sympy.Expr, var: sympy.Symbol) -> list:
+        # Clear denominators, solve the numerator, drop roots that zero a denominator
+        numerator, denominator = sympy.fraction(sympy.together(expr))
+        if not denominator.has(var):
+            raise TierNotApplicable
+        try:
+            candidates = self._solve_linear(numerator, var)
+        except TierNotApplicable:
+            candidates = self._solve_polynomial(numerator, var)
+        return [r for r in candidates if not self._is_zero(denominator.subs(var, r))]
+
+    def _is_zero(self, expr: sympy.Expr) -> bool:
+        # A random numeric point settles "nonzero" cheaply; only near-zero values pay for cancel()
+        point = {sym: sympy.Float(0.5 + 0.37 * i) for i, sym in enumerate(sorted(expr.free_symbols, key=str))}
+        try:
+            # xreplace folds Floats as it rebuilds; evalf(subs=...) is far slower on large trees
+            if abs(complex(expr.xreplace(point))) > 1e-9:
+                return False
+        except (TypeError, ValueError, ZeroDivisionError):
+            pass
+        return sympy.cancel(expr) == 0
+
+    @staticmethod
+    def _solve_numeric(expr: sympy.Expr, var: sympy.Symbol) -> list:
+        if expr.free_symbols != {var}:
+            raise TierNotApplicable
+        roots = []
+        for guess in (0.5, 1.0, -1.0, 10.0, 1e3, 1e-3):
+            try:
+                root = sympy.nsolve(expr, var, guess)
+            except (ValueError, ZeroDivisionError):
+                continue
+            if not any(abs(root - r) < 1e-9 * max(1.0, abs(r)) for r in roots):
+                roots.append(root)
+        if not roots:
+            raise ValueError("nsolve did not converge")
+        return roots
 
     def parse_variable_assignments(self, variable_str: str) -> dict:
         """
@@ -87,14 +379,7 @@ class SafeSolver:
         Evaluates a symbolic expression with numeric parameters.
         """
         try:
-            # Sanitize expression: Remove spaces to handle cases like "Z a" -> "Za"
-            sanitized_expr = expression_str.replace(" ", "")
-            expr = parse_expr(
-                sanitized_expr,
-                transformations=self.transformations,
-                global_dict={}, 
-                local_dict=self.allowed_locals
-            )
+            expr = self.parse(expression_str)
             
             # Substitute
             # Ensure params keys are Symbols AND sanitized (remove spaces from keys too)
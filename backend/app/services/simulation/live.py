@@ -0,0 +1,88 @@
+"""
+Live re-evaluation of a session's equation for slider-driven updates.
+
+The last assistant plan of a chat session (equation + "EVAL, x=1, ..." defaults)
+is parsed and lambdified once and cached per session, so each slider frame is a
+dict merge plus one compiled call. Reactive expressions in s (= jω) or w are
+evaluated at the "f" parameter when one is supplied.
+"""
+import math
+import time
+from collections import OrderedDict
+
+import sympy
+
+from app.schemas.simulation import SimulationState
+from app.services.reasoning.solver import SafeSolver
+
+MAX_CACHED_MODELS = 256
+FREQUENCY_PARAMS = ("f", "freq", "frequency")
+
+_solver = SafeSolver()
+_models: "OrderedDict[tuple, CompiledModel]" = OrderedDict()
+
+
+class CompiledModel:
+    def __init__(self, equation: str, defaults: dict[str, float]):
+        self.equation = equation
+        self.defaults = defaults
+        if equation.count("=") == 1:
+            # "V_out = ..." as written by the planner: evaluate the right-hand side
+            lhs, rhs = equation.split("=")
+            if not isinstance(_solver.parse(lhs), sympy.Symbol):
+                raise ValueError(f"Cannot evaluate implicit equation '{equation}'")
+            equation = rhs
+        expr = _solver.parse(equation)
+        self.args = sorted(str(s) for s in expr.free_symbols)
+        self._fn = sympy.lambdify([sympy.Symbol(a) for a in self.args], expr, modules="cmath")
+
+    def evaluate(self, params: dict[str, float]) -> SimulationState:
+        bad = [k for k, v in params.items() if isinstance(v, bool) or not isinstance(v, (int, float))]
+        if bad:
+            raise ValueError(f"Parameters must be numbers: {bad}")
+        values = {**self.defaults, **params}
+        frequency = next((values[k] for k in FREQUENCY_PARAMS if k in values), None)
+        if frequency is not None:
+            w = 2 * math.pi * frequency
+            values.setdefault("w", w)
+            values.setdefault("omega", w)
+            values.setdefault("s", 1j * w)
+        missing = [a for a in self.args if a not in values]
+        if missing:
+            raise ValueError(f"Missing values for {missing}")
+
+        start = time.perf_counter()
+        result = complex(self._fn(*(values[a] for a in self.args)))
+        outputs = {"value": result.real, "compute_ms": 0.0}
+        if result.imag != 0:
+            outputs.update({
+                "value_imag": result.imag,
+                "magnitude": abs(result),
+                "phase_deg": math.degrees(math.atan2(result.imag, result.real)),
+            })
+        outputs["compute_ms"] = (time.perf_counter() - start) * 1000
+
+        return SimulationState(
+            params={k: v for k, v in values.items() if isinstance(v, (int, float))},
+            outputs=outputs,
+        )
+
+
+def model_for_plan(session_id: str, plan: dict) -> CompiledModel:
+    """Compiled model of a session's latest plan; recompiled only when the plan changes."""
+    equation = plan.get("equation") or ""
+    if equation in ("", "N/A", "UNDEFINED", "MNA", "Conceptual Explanation Only"):
+        raise ValueError("The session's last answer has no evaluable equation")
+    # Phase 3 has already replaced a rule reference by the single root it evaluated
+    variables = plan.get("variable") or ""
+    key = (session_id, equation, variables)
+    model = _models.get(key)
+    if model is None:
+        defaults = _solver.parse_variable_assignments(variables.replace("EVAL", "", 1)) if variables.startswith("EVAL") else {}
+        model = CompiledModel(equation, defaults)
+        _models[key] = model
+        if len(_models) > MAX_CACHED_MODELS:
+            _models.popitem(last=False)
+    _models.move_to_end(key)
+    return model
+
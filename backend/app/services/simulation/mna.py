@@ -0,0 +1,300 @@
+"""
+Sparse Modified Nodal Analysis.
+
+Unknowns are the non-ground node voltages followed by one branch current per
+element that needs it (V, E, H, and L at DC). The system matrix depends only on
+element values and frequency, so it is factorized once with sparse LU and
+re-solved for new source values by rebuilding the right-hand side only.
+
+Sign conventions follow SPICE: a branch current flows from n+ through the
+element to n-, and an independent current source pushes its value from n+ to n-
+through itself (i.e. into n-).
+"""
+import math
+import re
+import time
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+from app.schemas.simulation import NetlistElement, MNAResult
+
+GROUND_NAMES = {"0", "gnd", "GND", "ground"}
+KINDS = set("RLCVIEGFH")
+SPICE_SUFFIXES = {"t": 1e12, "g": 1e9, "meg": 1e6, "k": 1e3, "m": 1e-3, "u": 1e-6, "µ": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15}
+
+_VALUE_RE = re.compile(r"^([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)([A-Za-zµ]*)$")
+
+
+def parse_value(token: str) -> float:
+    """SPICE number: case-insensitive suffixes, 'meg' for mega, trailing units ignored (10kohm)."""
+    match = _VALUE_RE.match(token)
+    if not match:
+        raise ValueError(f"Invalid value '{token}'")
+    number, suffix = float(match.group(1)), match.group(2).lower()
+    if suffix.startswith("meg"):
+        return number * 1e6
+    if suffix and suffix[0] in SPICE_SUFFIXES:
+        return number * SPICE_SUFFIXES[suffix[0]]
+    return number
+
+
+def _parse_element(tokens: list[str]) -> NetlistElement:
+    head = tokens[0]
+    kind = head[0].upper()
+    if kind in "EG":
+        if len(tokens) < 6:
+            raise ValueError(f"'{' '.join(tokens)}': expected {kind}name n+ n- nc+ nc- gain")
+        return NetlistElement(name=head, kind=kind, nodes=tokens[1:5], value=parse_value(tokens[5]))
+    if kind in "FH":
+        if len(tokens) < 5:
+            raise ValueError(f"'{' '.join(tokens)}': expected {kind}name n+ n- Vcontrol gain")
+        return NetlistElement(name=head, kind=kind, nodes=tokens[1:3], control=tokens[3], value=parse_value(tokens[4]))
+    if len(tokens) < 4:
+        raise ValueError(f"'{' '.join(tokens)}': expected {kind}name n+ n- value")
+    value_token = tokens[4] if tokens[3].upper() in ("DC", "AC") and len(tokens) > 4 else tokens[3]
+    return NetlistElement(name=head, kind=kind, nodes=tokens[1:3], value=parse_value(value_token))
+
+
+def _element_lines(text: str):
+    """Yields (tokens, element or the ValueError it raised) per candidate element line, and ('.ac', f) lines."""
+    for raw in text.splitlines():
+        line = raw.split(";")[0].strip()
+        if not line or line.startswith("*"):
+            continue
+        tokens = line.split()
+        head = tokens[0]
+        if head.lower() in (".ac", ".freq") and len(tokens) > 1:
+            yield tokens, None
+            continue
+        if head.startswith(".") or head[0].upper() not in KINDS:
+            continue
+        try:
+            yield tokens, _parse_element(tokens)
+        except ValueError as e:
+            yield tokens, e
+
+
+def parse_netlist(text: str, strict: bool = False) -> tuple[list[NetlistElement], float]:
+    """
+    Parses SPICE-like lines ("R1 1 2 10k", "E1 3 0 1 2 10", "F1 3 0 V1 2").
+    Returns (elements, frequency_hz); frequency comes from an optional ".ac <f>" line.
+
+    Lines that do not parse as a complete element (prose around a netlist pasted into
+    chat, "Find the node voltages ...") are skipped; ValueError is raised only when no
+    element line parses. With `strict`, the first malformed line raises instead.
+    """
+    elements, frequency, first_error = [], 0.0, None
+    for tokens, parsed in _element_lines(text):
+        if parsed is None:
+            frequency = parse_value(tokens[-1])
+        elif isinstance(parsed, ValueError):
+            if strict:
+                raise parsed
+            first_error = first_error or parsed
+        else:
+            elements.append(parsed)
+    if not elements and first_error is not None:
+        raise first_error
+    return elements, frequency
+
+
+def looks_like_netlist(text: str, min_elements: int = 2) -> bool:
+    """True when a chat message carries at least `min_elements` complete element lines."""
+    return sum(1 for _, parsed in _element_lines(text) if isinstance(parsed, NetlistElement)) >= min_elements
+
+
+class MNASystem:
+    """
+    Assembled and factorized MNA system for one circuit at one frequency.
+    `solve()` may be called repeatedly with new independent-source values.
+    """
+
+    def __init__(self, elements: list[NetlistElement], frequency: float = 0.0, ground: str = "0"):
+        self.elements = elements
+        self.frequency = frequency
+        self.omega = 2 * math.pi * frequency
+        self.ground = {ground} | GROUND_NAMES
+        self.dtype = complex if frequency > 0 else float
+
+        # 1. Index nodes and auxiliary branch currents
+        self.node_index: dict[str, int] = {}
+        for el in elements:
+            for node in el.nodes:
+                if node not in self.ground and node not in self.node_index:
+                    self.node_index[node] = len(self.node_index)
+        self.n_nodes = len(self.node_index)
+
+        self.branch_index: dict[str, int] = {}
+        for el in elements:
+            if el.kind in "VEH" or (el.kind == "L" and self.omega == 0):
+                self.branch_index[el.name] = self.n_nodes + len(self.branch_index)
+        self.size = self.n_nodes + len(self.branch_index)
+        if self.size == 0:
+            raise ValueError("Circuit has no non-ground nodes")
+
+        # 2. Stamp the matrix (COO triplets; duplicates are summed on conversion)
+        rows, cols, vals = [], [], []
+        self._source_rhs: dict[str, list[tuple[int, float]]] = {}
+        self.source_values: dict[str, float] = {}
+
+        def add(r, c, v):
+            if r >= 0 and c >= 0:
+                rows.append(r)
+                cols.append(c)
+                vals.append(v)
+
+        # Per-element current recipes, evaluated vectorized after each solve
+        self._y_names, self._y_nodes, self._y_vals = [], [], []
+        self._g_names, self._g_nodes, self._g_vals = [], [], []
+        self._f_names, self._f_index, self._f_vals = [], [], []
+
+        def admittance(a, b, y):
+            self._y_names.append(el.name)
+            self._y_nodes.append((a, b))
+            self._y_vals.append(y)
+            add(a, a, y)
+            add(b, b, y)
+            add(a, b, -y)
+            add(b, a, -y)
+
+        def branch(a, b, k):
+            add(a, k, 1)
+            add(b, k, -1)
+            add(k, a, 1)
+            add(k, b, -1)
+
+        for el in elements:
+            a, b = self._node(el.nodes[0]), self._node(el.nodes[1])
+            kind = el.kind
+            if kind == "R":
+                if el.value == 0:
+                    raise ValueError(f"{el.name}: zero resistance; use a 0 V source for a short")
+                admittance(a, b, 1.0 / el.value)
+            elif kind == "C":
+                # Open circuit at DC: zero admittance, zero current
+                admittance(a, b, 1j * self.omega * el.value if self.omega > 0 else 0.0)
+            elif kind == "L":
+                if self.omega > 0:
+                    admittance(a, b, 1.0 / (1j * self.omega * el.value))
+                else:
+                    branch(a, b, self.branch_index[el.name])  # DC short: 0 V source
+            elif kind == "V":
+                k = self.branch_index[el.name]
+                branch(a, b, k)
+                self._source_rhs[el.name] = [(k, 1.0)]
+                self.source_values[el.name] = el.value
+            elif kind == "I":
+                self._source_rhs[el.name] = [(i, s) for i, s in ((a, -1.0), (b, 1.0)) if i >= 0]
+                self.source_values[el.name] = el.value
+            elif kind == "E":
+                k = self.branch_index[el.name]
+                c, d = self._node(el.nodes[2]), self._node(el.nodes[3])
+                branch(a, b, k)
+                add(k, c, -el.value)
+                add(k, d, el.value)
+            elif kind == "G":
+                c, d = self._node(el.nodes[2]), self._node(el.nodes[3])
+                self._g_names.append(el.name)
+                self._g_nodes.append((c, d))
+                self._g_vals.append(el.value)
+                add(a, c, el.value)
+                add(a, d, -el.value)
+                add(b, c, -el.value)
+                add(b, d, el.value)
+            elif kind in "FH":
+                m = self.branch_index.get(el.control)
+                if m is None:
+                    raise ValueError(f"{el.name}: controlling source '{el.control}' must be a V element")
+                if kind == "F":
+                    self._f_names.append(el.name)
+                    self._f_index.append(m)
+                    self._f_vals.append(el.value)
+                    add(a, m, el.value)
+                    add(b, m, -el.value)
+                else:
+                    k = self.branch_index[el.name]
+                    branch(a, b, k)
+                    add(k, m, -el.value)
+            else:
+                raise ValueError(f"Unsupported element kind '{kind}' ({el.name})")
+
+        self.matrix = sp.csc_matrix((np.array(vals, dtype=self.dtype), (rows, cols)), shape=(self.size, self.size))
+        self._y_nodes = np.array(self._y_nodes, dtype=int).reshape(-1, 2)
+        self._y_vals = np.array(self._y_vals, dtype=self.dtype)
+        self._g_nodes = np.array(self._g_nodes, dtype=int).reshape(-1, 2)
+        self._g_vals = np.array(self._g_vals, dtype=float)
+        self._f_index = np.array(self._f_index, dtype=int)
+        self._f_vals = np.array(self._f_vals, dtype=float)
+        self._node_names = list(self.node_index)
+        self._branch_names = list(self.branch_index)
+
+        # 3. Factorize once
+        start = time.perf_counter()
+        try:
+            self._lu = splu(self.matrix)
+        except RuntimeError as e:
+            raise ValueError(f"Singular circuit matrix (floating node or voltage-source loop): {e}")
+        self.factor_ms = (time.perf_counter() - start) * 1000
+
+    def _node(self, name: str) -> int:
+        return -1 if name in self.ground else self.node_index[name]
+
+    def _rhs(self) -> np.ndarray:
+        rhs = np.zeros(self.size, dtype=self.dtype)
+        for name, entries in self._source_rhs.items():
+            for i, sign in entries:
+                rhs[i] += sign * self.source_values[name]
+        return rhs
+
+    def solve_vector(self, source_values: Optional[dict[str, float]] = None) -> np.ndarray:
+        """Raw solution vector (node voltages then branch currents) from the cached LU."""
+        if source_values:
+            unknown = set(source_values) - set(self.source_values)
+            if unknown:
+                raise ValueError(f"Not independent sources of this circuit: {sorted(unknown)}")
+            self.source_values.update(source_values)
+        return self._lu.solve(self._rhs())
+
+    def solve(self, source_values: Optional[dict[str, float]] = None) -> MNAResult:
+        """Solves with the cached LU; only independent source values may change."""
+        start = time.perf_counter()
+        x = self.solve_vector(source_values)
+
+        # Ground is index -1: append a 0 so node lookups need no branching
+        xg = np.append(x, 0.0)
+        names, values = list(self._branch_names), [x[self.n_nodes:]]
+        if len(self._y_vals):
+            names += self._y_names
+            values.append(self._y_vals * (xg[self._y_nodes[:, 0]] - xg[self._y_nodes[:, 1]]))
+        if len(self._g_vals):
+            names += self._g_names
+            values.append(self._g_vals * (xg[self._g_nodes[:, 0]] - xg[self._g_nodes[:, 1]]))
+        if len(self._f_vals):
+            names += self._f_names
+            values.append(self._f_vals * x[self._f_index])
+        for name in self._source_rhs:
+            if name not in self.branch_index:  # Current sources
+                names.append(name)
+                values.append(np.array([self.source_values[name]]))
+        currents = np.concatenate(values)
+        voltages = x[:self.n_nodes]
+        solve_ms = (time.perf_counter() - start) * 1000
+
+        is_ac = self.dtype is complex
+        # Values are produced here, so skip pydantic re-validation of thousands of floats
+        return MNAResult.model_construct(
+            frequency=self.frequency,
+            node_voltages=dict(zip(self._node_names, np.real(voltages).tolist())),
+            node_voltages_imag=dict(zip(self._node_names, np.imag(voltages).tolist())) if is_ac else {},
+            branch_currents=dict(zip(names, np.real(currents).tolist())),
+            branch_currents_imag=dict(zip(names, np.imag(currents).tolist())) if is_ac else {},
+            size=self.size,
+            solve_ms=solve_ms,
+        )
+
+
+def solve_netlist(elements: list[NetlistElement], frequency: float = 0.0, ground: str = "0") -> MNAResult:
+    return MNASystem(elements, frequency, ground).solve()
@@ -0,0 +1,115 @@
+"""
+Vectorized AC frequency sweep of a derived transfer function or impedance.
+
+The expression is written in terms of the complex frequency `s` (= jω), the
+angular frequency `w`/`omega` or the frequency `f` in Hz, e.g.
+"R + 1/(s*C)" or "1/(1 + j*w*R*C)". Component values are substituted
+symbolically once; the remaining expression is lambdified to NumPy and evaluated
+over the whole log-spaced grid in a single complex pass.
+"""
+import time
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import sympy
+
+from app.services.reasoning.solver import SafeSolver
+
+_solver = SafeSolver()
+_s, _w, _omega, _f = sympy.symbols("s w omega f")
+FREQUENCY_SYMBOLS = {_s, _w, _omega, _f}
+DECIMATION_MODES = ("peak", "stride")
+
+
+@lru_cache(maxsize=256)
+def _compile(expression: str, params: tuple[tuple[str, float], ...]):
+    expr = _solver.parse(expression).subs({sympy.Symbol(k.replace(" ", "")): v for k, v in params})
+    unknown = expr.free_symbols - FREQUENCY_SYMBOLS
+    if unknown:
+        raise ValueError(f"Missing values for {sorted(str(u) for u in unknown)}")
+    return sympy.lambdify((_s, _w, _omega, _f), expr, modules="numpy")
+
+
+def compile_response(expression: str, params: Optional[dict[str, float]] = None):
+    """Returns H(s, w, omega, f) as a NumPy ufunc-like callable (cached per expression and values)."""
+    return _compile(expression, tuple(sorted((params or {}).items())))
+
+
+def log_grid(f_start: float, f_stop: float, points: int) -> np.ndarray:
+    if not 0 < f_start < f_stop:
+        raise ValueError("Require 0 < f_start < f_stop")
+    if points < 2:
+        raise ValueError("Require at least 2 points")
+    return np.geomspace(f_start, f_stop, points)
+
+
+def decimate(n: int, max_points: int, magnitude_db: np.ndarray, mode: str = "peak") -> np.ndarray:
+    """
+    Indices of at most `max_points` samples, always including both endpoints.
+    "stride" keeps every k-th sample; "peak" keeps the min and max of each bucket
+    so resonances and notches survive (below 4 points there is no room for a
+    bucket's pair, so it falls back to stride).
+    """
+    if max_points >= n:
+        return np.arange(n)
+    if mode not in DECIMATION_MODES:
+        raise ValueError(f"Unknown decimation '{mode}' (expected one of {DECIMATION_MODES})")
+    if mode == "stride" or max_points < 4:
+        return np.unique(np.linspace(0, n - 1, max_points).round().astype(int))
+
+    buckets = max(1, (max_points - 2) // 2)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(int)
+    inner = magnitude_db[1:n - 1]
+    # Pad buckets to equal width so argmin/argmax run as one 2-D reduction
+    width = int(np.diff(edges).max())
+    starts = edges[:-1] - 1
+    idx = np.minimum(starts[:, None] + np.arange(width), len(inner) - 1)
+    valid = np.arange(width) < np.diff(edges)[:, None]
+    block = np.where(valid, np.nan_to_num(inner[idx], nan=0.0), np.nan)
+    picks = np.concatenate([
+        idx[np.arange(buckets), np.nanargmin(block, axis=1)],
+        idx[np.arange(buckets), np.nanargmax(block, axis=1)],
+    ]) + 1
+    return np.unique(np.concatenate([[0, n - 1], picks]))
+
+
+def finite_list(values: np.ndarray) -> list:
+    # JSON has no inf/nan: poles on the grid become nulls
+    finite = np.isfinite(values)
+    if finite.all():
+        return values.tolist()
+    return [v if ok else None for v, ok in zip(values.tolist(), finite.tolist())]
+
+
+def sweep(
+    expression: str,
+    params: Optional[dict[str, float]] = None,
+    f_start: float = 1.0,
+    f_stop: float = 1e6,
+    points: int = 1000,
+    max_points: Optional[int] = None,
+    decimation: str = "peak",
+) -> dict:
+    """Bode data (|H|, |H| in dB, unwrapped phase in degrees) over a log grid."""
+    response = compile_response(expression, params)
+
+    start = time.perf_counter()
+    f = log_grid(f_start, f_stop, points)
+    w = 2 * np.pi * f
+    with np.errstate(all="ignore"):
+        h = np.broadcast_to(np.asarray(response(1j * w, w, w, f), dtype=complex), f.shape)
+        magnitude = np.abs(h)
+        magnitude_db = 20 * np.log10(magnitude)
+    phase_deg = np.degrees(np.unwrap(np.angle(h)))
+    eval_ms = (time.perf_counter() - start) * 1000
+
+    keep = decimate(points, max_points, magnitude_db, decimation) if max_points else slice(None)
+    return {
+        "frequency": f[keep].tolist(),
+        "magnitude": finite_list(magnitude[keep]),
+        "magnitude_db": finite_list(magnitude_db[keep]),
+        "phase_deg": finite_list(phase_deg[keep]),
+        "points_evaluated": points,
+        "eval_ms": eval_ms,
+    }
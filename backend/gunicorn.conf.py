@@ -0,0 +1,55 @@
+# Multi-worker deployment of the Cirser backend.
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# The app is imported once in the master (preload_app) and SymPy is warmed there,
+# so the workers share those pages copy-on-write. The ONNX embedding model lives in
+# a single embedding worker process that all request workers reach over a Unix
+# socket (EMBEDDING_SOCKET). Chroma clients are opened per worker after fork.
+import gc
+import os
+import subprocess
+import sys
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+os.environ.setdefault("EMBEDDING_SOCKET", "/tmp/cirser-embed.sock")
+os.environ.setdefault("WARMUP_ON_START", "true")
+
+_embedding_proc = None
+
+
+def on_starting(server):
+    global _embedding_proc
+    socket_path = os.environ["EMBEDDING_SOCKET"]
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    # Separate interpreter (not a fork of the master) so the model is not duplicated
+    _embedding_proc = subprocess.Popen(
+        [sys.executable, "-m", "app.services.rag.embedding_worker", "--socket", socket_path],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    for _ in range(600):
+        if os.path.exists(socket_path) or _embedding_proc.poll() is not None:
+            break
+        time.sleep(0.1)
+    if not os.path.exists(socket_path):
+        server.log.warning("Embedding worker did not come up; workers will fail retrieval until it does.")
+
+    # Warm SymPy in the master, then freeze the heap so refcount/GC writes in the
+    # workers don't un-share the preloaded pages.
+    from app.services.reasoning.engine import engine
+    engine.warmup(retrieval=False)
+    gc.collect()
+    gc.freeze()
+
+
+def on_exit(server):
+    if _embedding_proc is not None and _embedding_proc.poll() is None:
+        _embedding_proc.terminate()
@@ -0,0 +1,117 @@
+"""
+Latency and answer-agreement benchmark: fused Phase 1+2 vs the two-call pipeline.
+
+Runs every query through ReasoningEngine.process_user_intent twice (two-call, then
+fused) against the configured AI_SERVICE_URL and a seeded rule index, and reports:
+
+  - wall-clock latency per mode (mean / p50 / p95)
+  - how often the fused call was accepted vs fell back to two calls
+  - agreement: same selected_rule_id, symbolically equivalent equation, same result
+
+Usage (from backend/, with the AI service reachable):
+    python scripts/bench_fused_pipeline.py --token $JWT
+    python scripts/bench_fused_pipeline.py --token $JWT --queries my_queries.jsonl --repeat 3 --json out.json
+
+Query files are JSONL with a "query" field; by default the SYMBOLIC/NUMERICAL rows of
+scripts/data/intent_seed.jsonl are used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sympy
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.reasoning.engine import engine
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_seed.jsonl")
+
+
+def load_queries(path: str) -> list[str]:
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if path == DEFAULT_QUERIES:
+        rows = [r for r in rows if {"SYMBOLIC", "NUMERICAL"} & set(r["intents"])]
+    return [r["query"] for r in rows]
+
+
+def equivalent(eq_a: str, eq_b: str) -> bool:
+    if eq_a == eq_b:
+        return True
+    try:
+        return sympy.simplify(engine.solver.parse(eq_a) - engine.solver.parse(eq_b)) == 0
+    except Exception:
+        return False
+
+
+async def run_mode(query: str, token: str, fused: bool) -> tuple[float, dict]:
+    settings.FUSED_CONTEXT_FORMULATION = fused
+    start = time.perf_counter()
+    response = await engine.process_user_intent(query, token)
+    return time.perf_counter() - start, response
+
+
+def summarize(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_s": statistics.mean(ordered),
+        "p50_s": ordered[len(ordered) // 2],
+        "p95_s": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+async def main_async(args):
+    queries = load_queries(args.queries) * args.repeat
+    rows = []
+    for query in queries:
+        t_two, two = await run_mode(query, args.token, fused=False)
+        t_fused, fused = await run_mode(query, args.token, fused=True)
+        plan_a, plan_b = two.get("plan") or {}, fused.get("plan") or {}
+        rows.append({
+            "query": query,
+            "two_call_s": t_two,
+            "fused_s": t_fused,
+            "both_success": two.get("status") == fused.get("status") == "success",
+            "same_rule": plan_a.get("selected_rule_id") == plan_b.get("selected_rule_id"),
+            "same_equation": equivalent(plan_a.get("equation", ""), plan_b.get("equation", "")),
+            "same_result": str(two.get("result")) == str(fused.get("result")),
+        })
+        print(f"{t_two:6.2f}s  {t_fused:6.2f}s  rule={rows[-1]['same_rule']!s:5}  eq={rows[-1]['same_equation']!s:5}  {query[:60]}")
+
+    ok = [r for r in rows if r["both_success"]] or rows
+    report = {
+        "n": len(rows),
+        "two_call": summarize([r["two_call_s"] for r in rows]),
+        "fused": summarize([r["fused_s"] for r in rows]),
+        "fused_accepted": metrics.counter_value("fused_phase_total", {"outcome": "accepted"}),
+        "fused_fallbacks": metrics.counter_value("fused_phase_total", {"outcome": "fallback"}),
+        "agreement": {
+            "rule": sum(r["same_rule"] for r in ok) / len(ok),
+            "equation": sum(r["same_equation"] for r in ok) / len(ok),
+            "result": sum(r["same_result"] for r in ok) / len(ok),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"report": report, "rows": rows}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--token", required=True, help="Bearer token accepted by AI_SERVICE_URL")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", help="Write per-query rows and the report to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Tail-latency benchmark of the upstream model pool against local stand-in upstreams.
+
+Starts OpenAI-compatible stand-ins on localhost with injected latency (log-normal
+body plus a slow tail) and injected 5xx errors, then drives ModelPool.complete with
+hedging off and on and reports p50 / p95 / p99, the hedge rate and winners. A last
+scenario fails the primary outright to show its circuit breaker opening.
+
+Usage (from backend/):
+    python scripts/bench_model_pool.py
+    python scripts/bench_model_pool.py --calls 400 --concurrency 16 --tail-p 0.05 --tail-s 3 --json out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.llm.model_pool import ModelEndpoint, ModelPool, UpstreamError
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def standin(name: str, median_s: float, tail_p: float, tail_s: float, error_p: float, seed: int) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.error_p = error_p
+
+    @app.post("/v1/chat/completions")
+    async def complete(body: dict):
+        delay = rng.lognormvariate(0, 0.35) * median_s
+        if rng.random() < tail_p:
+            delay += tail_s
+        await asyncio.sleep(delay)
+        if rng.random() < app.state.error_p:
+            raise HTTPException(status_code=503, detail=f"{name} overloaded")
+        return {
+            "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": name,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": name}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    return app
+
+
+def serve(app: FastAPI) -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def percentiles(values: list[float]) -> dict:
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {"mean_s": statistics.mean(ordered), "p50_s": pick(0.5), "p95_s": pick(0.95), "p99_s": pick(0.99)}
+
+
+async def drive(pool: ModelPool, calls: int, concurrency: int) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    latencies, winners, hedged, errors = [], {}, 0, 0
+
+    async def one():
+        nonlocal hedged, errors
+        async with gate:
+            start = time.perf_counter()
+            try:
+                result = await pool.complete(MESSAGES, phase="bench")
+            except UpstreamError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            winners[result.model] = winners.get(result.model, 0) + 1
+            hedged += result.hedged
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return {**percentiles(latencies), "hedged": hedged, "errors": errors, "winners": winners}
+
+
+async def main_async(args):
+    # Hedging only kicks in once a phase has enough samples; warm up without it
+    settings.LLM_HEDGE_MIN_SAMPLES = min(settings.LLM_HEDGE_MIN_SAMPLES, args.calls // 4)
+    primary = serve(standin("primary", args.median_s, args.tail_p, args.tail_s, args.error_p, seed=1))
+    secondary_app = standin("secondary", args.median_s * 1.5, args.tail_p, args.tail_s, args.error_p, seed=2)
+    secondary = serve(secondary_app)
+    endpoints = [ModelEndpoint.parse(f"primary@{primary}"), ModelEndpoint.parse(f"secondary@{secondary}")]
+
+    report = {}
+    for label, hedge in (("no_hedge", False), ("hedge", True)):
+        pool = ModelPool(endpoints, api_key="bench", hedge=hedge)
+        await drive(pool, settings.LLM_HEDGE_MIN_SAMPLES, args.concurrency)  # Latency window warm-up
+        report[label] = await drive(pool, args.calls, args.concurrency)
+        report[label]["hedge_delay_s"] = pool.hedge_delay("bench")
+        print(f"{label:9s} " + "  ".join(f"{k}={v:.3f}" for k, v in report[label].items() if k.endswith("_s"))
+              + f"  hedged={report[label]['hedged']}  errors={report[label]['errors']}  winners={report[label]['winners']}")
+
+    # Breaker: the primary answers every call with 503
+    failing = serve(standin("failing", args.median_s, 0, 0, 1.0, seed=3))
+    pool = ModelPool([ModelEndpoint.parse(f"failing@{failing}"), endpoints[1]], api_key="bench")
+    report["breaker"] = await drive(pool, args.calls // 4, 1)
+    report["breaker"]["primary_calls"] = metrics.counter_value("llm_model_calls_total", {"model": pool.endpoints[0].name, "outcome": "error"})
+    report["breaker"]["skipped_while_open"] = metrics.counter_value("llm_model_calls_total", {"model": pool.endpoints[0].name, "outcome": "breaker_open"})
+    print(f"breaker   primary 5xx calls={report['breaker']['primary_calls']:.0f}  "
+          f"skipped while open={report['breaker']['skipped_while_open']:.0f}  p50={report['breaker']['p50_s']:.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median-s", type=float, default=0.2, help="Median stand-in latency (secondary is 1.5x)")
+    parser.add_argument("--tail-p", type=float, default=0.05, help="Probability of a slow-tail call")
+    parser.add_argument("--tail-s", type=float, default=2.0, help="Extra latency of a slow-tail call")
+    parser.add_argument("--error-p", type=float, default=0.01, help="Probability of an injected 503")
+    parser.add_argument("--json", help="Write the report to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
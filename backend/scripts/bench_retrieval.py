@@ -0,0 +1,274 @@
+"""
+Retrieval benchmark at corpus scale: build time, index size, memory, query latency
+and recall@k of RAGRetriever against synthetic rule corpora (scripts/synthetic_rules.py).
+
+For every corpus size and backend, a forked child ingests the corpus, replays the
+labeled queries through RAGRetriever.search and reports:
+
+  - build_s         ingest wall time (embedding + insert)
+  - index_mb        on-disk size of the persist dir (chroma-lite) / vector bytes (exact)
+  - rss_mb          resident memory of the child after build
+  - p50_ms, p99_ms  per-query latency of the full search path
+  - recall@1, @3    fraction of queries whose gold rule_id is in the top k
+
+Backends:
+  chroma-lite   PersistentClient in a temp dir (DEPLOYMENT_MODE=lite)
+  chroma-http   HttpClient against --chroma-host/--chroma-port (docker mode)
+  exact         brute-force cosine over the same embeddings: the recall ceiling of
+                the embedding, separating model misses from HNSW approximation
+
+Embeddings: "default" is what the API uses (ONNX MiniLM, or EMBEDDING_SOCKET when set);
+"hashing" is a dependency-free feature-hashing embedding for machines that cannot
+download the model. Only compare reports with the same embedding.
+
+--partition-by domain|category stores one collection per value (RAG_PARTITION_BY);
+--filter domain|category passes the gold rule's value as a search filter, i.e. the
+best case of a correctly scoped session.
+
+Reports carry the git revision, chromadb version and a digest of the corpus and
+query set; --baseline prints deltas against an earlier report for the same digests.
+
+Usage (from backend/):
+    python scripts/bench_retrieval.py --sizes 1000,10000,100000 --json retrieval.json
+    python scripts/bench_retrieval.py --sizes 10000 --embedding hashing --baseline retrieval.json
+    python scripts/bench_retrieval.py --sizes 100000 --partition-by domain --filter domain
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chromadb
+import numpy as np
+from chromadb.utils import embedding_functions
+
+from app.core.config import settings
+from app.services.rag.retriever import RAGRetriever
+from synthetic_rules import corpus_digest, generate_queries, generate_rules
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """Signed feature hashing of words and character trigrams, L2-normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        grams = [w[i:i + 3] for w in words for i in range(max(1, len(w) - 2))]
+        return words + grams
+
+    def __call__(self, input):
+        out = np.zeros((len(input), self.dim), dtype=np.float32)
+        for row, text in enumerate(input):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-9)
+        return [v for v in out]
+
+
+def embedding_for(name: str):
+    if name == "hashing":
+        return HashingEmbeddingFunction()
+    return RAGRetriever().embedding_fn
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def dir_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / 1e6
+
+
+def pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def replay(search, queries: list[dict], k: int, filter_field: str = None) -> dict:
+    latencies, hits1, hits_k = [], 0, 0
+    for q in queries:
+        filters = {filter_field: q[filter_field]} if filter_field else {}
+        start = time.perf_counter()
+        ids = search(q["query"], k, **filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits1 += bool(ids) and ids[0] == q["gold"]
+        hits_k += q["gold"] in ids[:k]
+    return {
+        "p50_ms": pct(latencies, 0.5),
+        "p99_ms": pct(latencies, 0.99),
+        "recall@1": hits1 / len(queries),
+        f"recall@{k}": hits_k / len(queries),
+    }
+
+
+def run_chroma(args, rules, queries, http: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix="cirser-bench-")
+    settings.RAG_PARTITION_BY = args.partition_by
+    retriever = RAGRetriever()
+    retriever.embedding_fn = embedding_for(args.embedding)
+    retriever.collection_name = f"bench-{uuid.uuid4().hex[:8]}"
+    if http:
+        settings.DEPLOYMENT_MODE, settings.CHROMA_HOST, settings.CHROMA_PORT = "docker", args.chroma_host, args.chroma_port
+    else:
+        settings.DEPLOYMENT_MODE, settings.CHROMA_PERSIST_DIR = "lite", workdir
+    try:
+        start = time.perf_counter()
+        retriever.add_rules(rules)
+        build_s = time.perf_counter() - start
+        result = {"build_s": build_s, "rss_mb": rss_mb(), "index_mb": None if http else dir_mb(workdir)}
+        search = lambda text, k, **filters: [c.rule.rule_id for c in retriever.search(text, n_results=k, **filters)]
+        result.update(replay(search, queries, args.k, args.filter))
+        return result
+    finally:
+        if http:
+            for name in list(retriever.partitions().values()) or [retriever.collection_name]:
+                retriever.client.delete_collection(name)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_exact(args, rules, queries) -> dict:
+    embed = embedding_for(args.embedding)
+    ids = [r.rule_id for r in rules]
+    start = time.perf_counter()
+    texts = [r.embedding_text for r in rules]
+    matrix = np.vstack([np.asarray(embed(texts[i:i + 1024]), dtype=np.float32) for i in range(0, len(texts), 1024)])
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9)
+    build_s = time.perf_counter() - start
+
+    fields = {f: np.array([getattr(r, f) for r in rules]) for f in ("domain", "category")}
+
+    def search(text: str, k: int, **filters) -> list[str]:
+        q = np.asarray(embed([text])[0], dtype=np.float32)
+        scores = matrix @ (q / max(np.linalg.norm(q), 1e-9))
+        for field, value in filters.items():
+            scores = np.where(fields[field] == value, scores, -np.inf)
+        top = np.argpartition(-scores, min(k, len(ids) - 1))[:k]
+        return [ids[i] for i in top[np.argsort(-scores[top])]]
+
+    result = {"build_s": build_s, "rss_mb": rss_mb(), "index_mb": matrix.nbytes / 1e6}
+    result.update(replay(search, queries, args.k, args.filter))
+    return result
+
+
+def _child(args, backend: str, size: int, out):
+    try:
+        rules = generate_rules(size, args.seed)
+        queries = generate_queries(rules, args.queries, args.seed)
+        base_rss = rss_mb()
+        if backend == "exact":
+            result = run_exact(args, rules, queries)
+        else:
+            result = run_chroma(args, rules, queries, http=backend == "chroma-http")
+        result["rss_mb"] -= base_rss
+        result["digest"] = corpus_digest(rules, queries)
+        out.put(result)
+    except Exception as e:
+        out.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(args, backend: str, size: int) -> dict:
+    """Each cell runs in a fresh fork so memory and caches do not leak between cells."""
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(args, backend, size, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def environment(args) -> dict:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "git_revision": revision,
+        "chromadb": chromadb.__version__,
+        "embedding": args.embedding,
+        "seed": args.seed,
+        "queries": args.queries,
+        "k": args.k,
+        "partition_by": args.partition_by,
+        "filter": args.filter,
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_deltas(rows: list[dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r["backend"], r["size"], r.get("digest")): r for r in json.load(f)["rows"]}
+    print(f"\nDeltas vs {baseline_path}:")
+    for row in rows:
+        old = baseline.get((row["backend"], row["size"], row.get("digest")))
+        if not old or "error" in row or "error" in old:
+            print(f"  {row['backend']:12s} {row['size']:>7}  no comparable baseline row")
+            continue
+        parts = [f"{key}={row[key] - old[key]:+.3f}" for key in ("build_s", "p50_ms", "p99_ms", "recall@1")
+                 if row.get(key) is not None and old.get(key) is not None]
+        print(f"  {row['backend']:12s} {row['size']:>7}  " + "  ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--backends", default="chroma-lite,exact", help="chroma-lite, chroma-http, exact")
+    parser.add_argument("--embedding", choices=("default", "hashing"), default="default")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--partition-by", choices=("domain", "category"), help="One collection per value")
+    parser.add_argument("--filter", choices=("domain", "category"), help="Filter each query on its gold rule's value")
+    parser.add_argument("--chroma-host", default=settings.CHROMA_HOST)
+    parser.add_argument("--chroma-port", type=int, default=settings.CHROMA_PORT)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Earlier --json report to diff against")
+    args = parser.parse_args()
+
+    env = environment(args)
+    print(json.dumps(env))
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        for backend in args.backends.split(","):
+            row = {"backend": backend, "size": size, **run_isolated(args, backend, size)}
+            rows.append(row)
+            if "error" in row:
+                print(f"{backend:12s} {size:>7}  ERROR {row['error']}")
+                continue
+            print(f"{backend:12s} {size:>7}  build={row['build_s']:7.1f}s  index={row['index_mb'] or 0:7.1f}MB  "
+                  f"rss={row['rss_mb']:7.1f}MB  p50={row['p50_ms']:6.2f}ms  p99={row['p99_ms']:6.2f}ms  "
+                  f"r@1={row['recall@1']:.3f}  r@{args.k}={row[f'recall@{args.k}']:.3f}")
+
+    if args.baseline:
+        print_deltas(rows, args.baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"environment": env, "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
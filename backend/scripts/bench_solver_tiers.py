@@ -0,0 +1,171 @@
+"""
+Tiered SafeSolver.solve_symbolic vs plain sympy.solve on logged equations.
+
+The corpus is the symbolic Phase 3 calls the engine actually made: assistant turns
+whose plan has an equation and a non-EVAL target variable (--from-db), plus JSONL
+files of {"equation": ..., "variable": ...} (default: scripts/data/solver_corpus.jsonl).
+
+Each solve (tiered and baseline) runs in its own forked child, so a runaway solve
+can be killed at --timeout and neither path inherits caches warmed by the other.
+The random check point lies in (0.3, 1.3) to stay on principal branches (atan, log).
+
+Usage (from backend/):
+    python scripts/bench_solver_tiers.py
+    python scripts/bench_solver_tiers.py --from-db --timeout 30 --json out.json
+
+Reports per-tier counts, latency p50/p95/max for both paths, timeouts, and whether
+the tiered answer satisfies the equation wherever the baseline produced one.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sympy
+
+from app.services.reasoning.solver import SafeSolver
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "solver_corpus.jsonl")
+solver = SafeSolver()
+
+
+def load_jsonl(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_from_db() -> list[dict]:
+    from app.api.deps import SessionLocal
+    from app.models.chat import ChatMessage
+
+    db = SessionLocal()
+    rows, seen = [], set()
+    try:
+        for msg in db.query(ChatMessage).filter(ChatMessage.role == "assistant").yield_per(500):
+            audit = msg.meta_audit or {}
+            equation, variable = audit.get("equation"), (audit.get("variable") or "").strip()
+            if not equation or equation in ("N/A", "UNDEFINED", "MNA") or not variable or variable.startswith("EVAL"):
+                continue
+            if audit.get("rule_ref") or (equation, variable) in seen:
+                continue
+            seen.add((equation, variable))
+            rows.append({"equation": equation, "variable": variable})
+    finally:
+        db.close()
+    return rows
+
+
+def _child(mode: str, equation: str, variable: str, queue):
+    start = time.perf_counter()
+    if mode == "tiered":
+        detailed = solver.solve_symbolic_detailed(equation, variable)
+        queue.put((detailed["result"], (time.perf_counter() - start) * 1000, detailed["tier"]))
+        return
+    try:
+        result = str(sympy.solve(solver.parse_equation(equation), sympy.Symbol(variable)))
+    except Exception as e:
+        result = f"Error: {e}"
+    queue.put((result, (time.perf_counter() - start) * 1000, "sympy.solve"))
+
+
+def run_isolated(mode: str, equation: str, variable: str, timeout: float) -> tuple[str, float, str, bool]:
+    """
+    Runs one solve in a forked child. Both modes fork from the same parent state, so
+    neither inherits SymPy caches warmed by the other, and a runaway solve is killable.
+    """
+    queue = mp.Queue()
+    proc = mp.Process(target=_child, args=(mode, equation, variable, queue))
+    proc.start()
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+        return "timeout", timeout * 1000, "timeout", True
+    result, ms, tier = queue.get()
+    return result, ms, tier, False
+
+
+def satisfies(equation: str, variable: str, result: str) -> bool:
+    """True when every solution in `result` makes the equation ~0 at a random point."""
+    try:
+        expr = solver.parse_equation(equation)
+        solutions = solver.parse(result)
+        solutions = list(solutions) if isinstance(solutions, (list, tuple, sympy.Tuple)) else [solutions]
+        rng = random.Random(0)
+        point = {s: sympy.Float(rng.uniform(0.3, 1.3)) for s in expr.free_symbols if str(s) != variable}
+        for sol in solutions:
+            value = complex(expr.xreplace({sympy.Symbol(variable): sol}).xreplace(point).xreplace(point))
+            scale = max(1.0, abs(complex(sympy.Abs(expr).xreplace(point).xreplace({sympy.Symbol(variable): sympy.Float(1)}))))
+            if abs(value) > 1e-6 * scale:
+                return False
+        return bool(solutions)
+    except Exception:
+        return False
+
+
+def pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", action="append", default=[], help="JSONL corpus file(s)")
+    parser.add_argument("--from-db", action="store_true", help="Also mine symbolic Phase 3 calls from chat logs")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--json", help="Write per-equation rows and the report to this file")
+    args = parser.parse_args()
+
+    rows = [r for path in (args.data or [DEFAULT_CORPUS]) for r in load_jsonl(path)]
+    if args.from_db:
+        rows += load_from_db()
+
+    # Pay one-time SymPy imports and tier-pool setup in the parent, before any fork
+    solver.solve_symbolic("x - 1", "x")
+    sympy.solve(sympy.Symbol("x") - 1, sympy.Symbol("x"))
+    results = []
+    for row in rows:
+        eq, var = row["equation"], row["variable"]
+        tiered_result, tiered_ms, tier, _ = run_isolated("tiered", eq, var, args.timeout)
+        base_result, base_ms, _, base_timeout = run_isolated("baseline", eq, var, args.timeout)
+        base_ok = not base_timeout and not base_result.startswith("Error") and base_result != "[]"
+        results.append({
+            "equation": eq, "variable": var,
+            "tier": tier, "tiered_ms": tiered_ms, "tiered_result": tiered_result,
+            "baseline_ms": base_ms, "baseline_timeout": base_timeout,
+            "tiered_correct": satisfies(eq, var, tiered_result) if not tiered_result.startswith(("Error", "timeout")) else False,
+            "baseline_answered": base_ok,
+        })
+        r = results[-1]
+        base_str = "timeout" if base_timeout else f"{base_ms:9.1f}ms"
+        print(f"{r['tier']:10} {r['tiered_ms']:9.1f}ms  base {base_str:>11}  ok={r['tiered_correct']!s:5}  {var:6} {eq[:60]}")
+
+    tiers = {}
+    for r in results:
+        tiers.setdefault(r["tier"], []).append(r["tiered_ms"])
+    answered = [r for r in results if r["baseline_answered"]]
+    report = {
+        "n": len(results),
+        "tiers": {t: {"count": len(ms), "p50_ms": pct(ms, 0.5), "max_ms": max(ms)} for t, ms in sorted(tiers.items())},
+        "tiered": {"p50_ms": pct([r["tiered_ms"] for r in results], 0.5), "p95_ms": pct([r["tiered_ms"] for r in results], 0.95),
+                   "max_ms": max(r["tiered_ms"] for r in results), "total_s": sum(r["tiered_ms"] for r in results) / 1000},
+        "baseline": {"p50_ms": pct([r["baseline_ms"] for r in results], 0.5), "p95_ms": pct([r["baseline_ms"] for r in results], 0.95),
+                     "timeouts": sum(r["baseline_timeout"] for r in results), "total_s": sum(r["baseline_ms"] for r in results) / 1000},
+        "tiered_correct_where_baseline_answered": sum(r["tiered_correct"] for r in answered) / len(answered) if answered else None,
+        "tiered_answered_baseline_timeout": sum(1 for r in results if r["baseline_timeout"] and r["tiered_correct"]),
+        "mean_speedup": statistics.mean(r["baseline_ms"] / max(r["tiered_ms"], 1e-3) for r in results),
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"report": report, "rows": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Per-worker memory benchmark for the multi-worker deployment (Linux only).
+
+Starts the backend with N workers in one of two modes, waits for warmup, then
+reads /proc/<pid>/smaps_rollup for the master and every child process:
+
+    baseline  uvicorn --workers N   (every worker loads its own model and SymPy)
+    shared    gunicorn -c gunicorn.conf.py (preload + shared embedding worker)
+
+Usage (from backend/):
+    python scripts/bench_worker_rss.py --mode baseline --workers 8
+    python scripts/bench_worker_rss.py --mode shared --workers 8 --json results.json
+
+PSS is the number to compare: it splits shared copy-on-write pages between
+the processes that map them, so summing PSS gives the real footprint.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_smaps(pid: int) -> dict:
+    stats = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(":")
+            if key in FIELDS:
+                stats[key] = int(parts[1])  # kB
+    return stats
+
+
+def children_of(pid: int) -> list[int]:
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+            found.extend(children_of(int(entry)))
+    return found
+
+
+def command_for(mode: str, workers: int, port: int) -> tuple[list[str], dict]:
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), WARMUP_ON_START="true")
+    if mode == "baseline":
+        env.pop("EMBEDDING_SOCKET", None)
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"]
+    return cmd, env
+
+
+def run(mode: str, workers: int, port: int, settle: float) -> dict:
+    cmd, env = command_for(mode, workers, port)
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    try:
+        time.sleep(settle)  # Workers warm up on startup (WARMUP_ON_START)
+        processes = [proc.pid] + children_of(proc.pid)
+        rows = []
+        for pid in processes:
+            try:
+                with open(f"/proc/{pid}/cmdline") as f:
+                    name = f.read().replace("\0", " ").strip()[:60]
+                rows.append({"pid": pid, "cmd": name, **read_smaps(pid)})
+            except OSError:
+                continue
+        return {
+            "mode": mode,
+            "workers": workers,
+            "processes": rows,
+            "total_rss_kb": sum(r.get("Rss", 0) for r in rows),
+            "total_pss_kb": sum(r.get("Pss", 0) for r in rows),
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["baseline", "shared"], default="shared")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--settle", type=float, default=45.0, help="Seconds to wait for warmup")
+    parser.add_argument("--json", help="Write the raw results to this file")
+    args = parser.parse_args()
+
+    result = run(args.mode, args.workers, args.port, args.settle)
+    print(f"{'PID':>8}  {'RSS MB':>8}  {'PSS MB':>8}  {'Private MB':>10}  CMD")
+    for r in result["processes"]:
+        private = r.get("Private_Clean", 0) + r.get("Private_Dirty", 0)
+        print(f"{r['pid']:>8}  {r.get('Rss', 0) / 1024:>8.1f}  {r.get('Pss', 0) / 1024:>8.1f}  {private / 1024:>10.1f}  {r['cmd']}")
+    print(f"\n{args.mode}: {args.workers} workers, total PSS {result['total_pss_kb'] / 1024:.1f} MB "
+          f"(RSS sum {result['total_rss_kb'] / 1024:.1f} MB)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Deterministic synthetic rule corpora and labeled queries for retrieval benchmarks.
+
+A rule is one combination of law family x component x application x operating
+regime (24 x 20 x 30 x 8 = 115,200 distinct rules), rendered into every field of
+the Rule schema. Corpora of any size up to that are a seeded sample of the
+combinations, so the same (size, seed) always yields the same rules, ids and
+queries. Queries paraphrase one rule with synonyms and name its gold rule_id.
+"""
+import hashlib
+import json
+import random
+
+from app.schemas.rule import Rule, RuleSource
+
+# (code, name, category, quantity, equation, keywords, query phrasings)
+FAMILIES = [
+    ("VDIV", "Voltage Divider", "Linear Circuit Theory", "output voltage", "V_out = V_in*Z2/(Z1 + Z2)", "voltage divider ratio series impedance", ["output voltage of the divider", "divided voltage"]),
+    ("IDIV", "Current Divider", "Linear Circuit Theory", "branch current", "I_1 = I_in*Z2/(Z1 + Z2)", "current divider parallel branch split", ["current in one branch", "branch current split"]),
+    ("RCTAU", "RC Time Constant", "Transient Analysis", "time constant", "tau = R*C", "rc time constant charging exponential", ["charging time constant", "how fast it charges"]),
+    ("RLTAU", "RL Time Constant", "Transient Analysis", "time constant", "tau = L/R", "rl time constant inductor current rise", ["current rise time constant", "inductive time constant"]),
+    ("LCRES", "LC Resonance", "Frequency Response", "resonant frequency", "f_0 = 1/(2*pi*sqrt(L*C))", "resonance lc tank natural frequency", ["resonant frequency", "tank frequency"]),
+    ("QFACT", "Quality Factor", "Frequency Response", "quality factor", "Q = omega_0*L/R", "quality factor q selectivity bandwidth", ["q factor", "selectivity"]),
+    ("RCCUT", "RC Cutoff Frequency", "Frequency Response", "cutoff frequency", "f_c = 1/(2*pi*R*C)", "cutoff corner frequency -3db rc filter", ["corner frequency", "-3 dB point"]),
+    ("PDISS", "Power Dissipation", "Power Analysis", "dissipated power", "P = I**2*R", "power dissipation heat joule loss", ["power lost as heat", "dissipated power"]),
+    ("MAXPT", "Maximum Power Transfer", "Power Analysis", "load impedance", "Z_L = conjugate(Z_s)", "maximum power transfer conjugate match load", ["best load for max power", "matched load"]),
+    ("THEV", "Thevenin Equivalent", "Network Theorems", "equivalent impedance", "V_th = V_oc", "thevenin equivalent open circuit source", ["thevenin equivalent", "equivalent source seen by the load"]),
+    ("NORT", "Norton Equivalent", "Network Theorems", "equivalent current", "I_n = I_sc", "norton equivalent short circuit current source", ["norton current", "short-circuit equivalent"]),
+    ("SUPP", "Superposition", "Network Theorems", "total response", "v = v_1 + v_2", "superposition linear sources sum response", ["response to several sources", "sum of individual source contributions"]),
+    ("IMPED", "Complex Impedance", "AC Analysis", "impedance", "Z = R + I*omega*L + 1/(I*omega*C)", "impedance reactance phasor ac", ["total impedance", "ac impedance"]),
+    ("PHASE", "Phase Shift", "AC Analysis", "phase angle", "phi = atan(X/R)", "phase shift angle lead lag", ["phase angle", "how much the signal lags"]),
+    ("PFACT", "Power Factor", "AC Power", "power factor", "PF = P/S", "power factor real apparent reactive", ["power factor", "ratio of real to apparent power"]),
+    ("GAINNI", "Non-Inverting Gain", "Amplifier Design", "closed-loop gain", "A_v = 1 + R_f/R_g", "non inverting amplifier gain feedback", ["non-inverting gain", "closed loop gain"]),
+    ("GAININV", "Inverting Gain", "Amplifier Design", "closed-loop gain", "A_v = -R_f/R_in", "inverting amplifier gain negative feedback", ["inverting gain", "gain with the input on the minus pin"]),
+    ("GBW", "Gain-Bandwidth Product", "Amplifier Design", "bandwidth", "BW = GBW/A_v", "gain bandwidth product unity gain", ["available bandwidth at this gain", "bandwidth limit"]),
+    ("SKIN", "Skin Depth", "Electromagnetics", "skin depth", "delta = sqrt(2*rho/(omega*mu))", "skin effect depth high frequency conductor", ["skin depth", "current crowding depth"]),
+    ("ZCHAR", "Characteristic Impedance", "Transmission Lines", "characteristic impedance", "Z_0 = sqrt(L_p/C_p)", "characteristic impedance transmission line per unit length", ["line impedance", "characteristic impedance"]),
+    ("REFL", "Reflection Coefficient", "Transmission Lines", "reflection coefficient", "Gamma = (Z_L - Z_0)/(Z_L + Z_0)", "reflection coefficient mismatch standing wave", ["reflection coefficient", "how much bounces back"]),
+    ("TURNS", "Transformer Turns Ratio", "Magnetics", "secondary voltage", "V_s = V_p*N_s/N_p", "transformer turns ratio primary secondary", ["secondary voltage", "turns ratio"]),
+    ("RIPPLE", "Ripple Voltage", "Power Electronics", "ripple voltage", "V_r = I_load/(f*C)", "ripple voltage filter capacitor rectifier", ["ripple", "peak-to-peak ripple"]),
+    ("NOISE", "Thermal Noise", "Noise Analysis", "noise voltage", "v_n = sqrt(4*k*T*R*B)", "thermal johnson noise resistor bandwidth", ["thermal noise", "johnson noise voltage"]),
+]
+
+# (name, synonyms)
+COMPONENTS = [
+    ("resistor", ["resistive element", "resistance"]), ("capacitor", ["cap", "capacitive element"]),
+    ("inductor", ["coil", "choke"]), ("op-amp", ["operational amplifier", "opamp"]),
+    ("transformer", ["xfmr", "coupled inductor"]), ("coaxial line", ["coax", "coaxial cable"]),
+    ("microstrip", ["pcb trace", "microstrip line"]), ("MOSFET", ["FET", "field-effect transistor"]),
+    ("BJT", ["bipolar transistor", "bipolar junction transistor"]), ("diode", ["rectifier diode", "pn junction"]),
+    ("crystal", ["quartz resonator", "xtal"]), ("ferrite bead", ["ferrite", "emi bead"]),
+    ("electrolytic capacitor", ["electrolytic", "bulk capacitor"]), ("ceramic capacitor", ["mlcc", "ceramic cap"]),
+    ("thermistor", ["ntc", "temperature-dependent resistor"]), ("photodiode", ["light sensor diode", "pin photodiode"]),
+    ("varactor", ["varicap", "tuning diode"]), ("shunt resistor", ["current sense resistor", "sense resistor"]),
+    ("potentiometer", ["pot", "trimmer"]), ("zener diode", ["zener", "voltage reference diode"]),
+]
+
+# (name, synonyms, domain)
+APPLICATIONS = [
+    ("audio amplifier", ["audio amp", "hi-fi amplifier"], "Analog Electronics"),
+    ("buck converter", ["step-down converter", "buck regulator"], "Power Electronics"),
+    ("boost converter", ["step-up converter", "boost regulator"], "Power Electronics"),
+    ("RF front end", ["radio front-end", "rf receiver input"], "RF Engineering"),
+    ("sensor interface", ["sensor front end", "transducer interface"], "Instrumentation"),
+    ("motor drive", ["motor controller", "inverter drive"], "Power Electronics"),
+    ("battery charger", ["charging circuit", "li-ion charger"], "Power Electronics"),
+    ("active filter", ["filter stage", "sallen-key filter"], "Signal Processing"),
+    ("oscillator", ["clock generator", "signal source"], "RF Engineering"),
+    ("ADC driver", ["adc input stage", "converter driver"], "Mixed Signal"),
+    ("LED driver", ["led current source", "lighting driver"], "Power Electronics"),
+    ("power supply", ["psu", "mains supply"], "Power Electronics"),
+    ("antenna matching network", ["antenna match", "matching network"], "RF Engineering"),
+    ("data link", ["serial link", "high-speed interface"], "Signal Integrity"),
+    ("strain gauge bridge", ["wheatstone bridge", "load cell bridge"], "Instrumentation"),
+    ("ECG front end", ["biopotential amplifier", "ecg amplifier"], "Biomedical"),
+    ("class-D amplifier", ["switching amplifier", "class d amp"], "Analog Electronics"),
+    ("solar inverter", ["pv inverter", "grid-tie inverter"], "Power Electronics"),
+    ("USB power path", ["usb supply", "usb vbus path"], "Power Electronics"),
+    ("PLL loop filter", ["pll filter", "phase-locked loop filter"], "RF Engineering"),
+    ("guitar pedal", ["effects pedal", "stompbox"], "Analog Electronics"),
+    ("thermocouple amplifier", ["thermocouple interface", "tc amplifier"], "Instrumentation"),
+    ("CAN bus transceiver", ["can interface", "automotive bus"], "Signal Integrity"),
+    ("wireless charger", ["inductive charger", "qi charger"], "Power Electronics"),
+    ("microphone preamp", ["mic preamp", "microphone amplifier"], "Analog Electronics"),
+    ("gate driver", ["mosfet gate drive", "gate drive circuit"], "Power Electronics"),
+    ("EMI filter", ["line filter", "emc filter"], "Power Electronics"),
+    ("photodetector amplifier", ["transimpedance amplifier", "tia"], "Instrumentation"),
+    ("clock distribution", ["clock tree", "clock fanout"], "Signal Integrity"),
+    ("audio crossover", ["speaker crossover", "crossover network"], "Analog Electronics"),
+]
+
+# (name, synonyms)
+REGIMES = [
+    ("at DC", ["in steady state dc", "with dc only"]), ("at low frequency", ["for slow signals", "below 1 kHz"]),
+    ("at high frequency", ["at rf", "above 100 MHz"]), ("under large signal", ["with big swings", "at full swing"]),
+    ("under small signal", ["for small perturbations", "linearized"]), ("over temperature", ["with temperature drift", "hot and cold"]),
+    ("during startup", ["at power-up", "at turn-on"]), ("under pulsed load", ["with load steps", "with transient load"]),
+]
+
+QUERY_TEMPLATES = [
+    "how do I calculate the {what} for the {component} in a {application} {regime}",
+    "{what} of a {component} used in an {application}, {regime}",
+    "what determines the {what} when the {component} sits in the {application} {regime}?",
+    "{application}: {component} {what} {regime}",
+]
+
+MAX_SIZE = len(FAMILIES) * len(COMPONENTS) * len(APPLICATIONS) * len(REGIMES)
+
+
+def _combination(index: int) -> tuple:
+    index, r = divmod(index, len(REGIMES))
+    index, a = divmod(index, len(APPLICATIONS))
+    f, c = divmod(index, len(COMPONENTS))
+    return f, c, a, r
+
+
+def _rule(f: int, c: int, a: int, r: int) -> Rule:
+    code, name, category, quantity, equation, keywords, _ = FAMILIES[f]
+    component, application, regime = COMPONENTS[c][0], APPLICATIONS[a][0], REGIMES[r][0]
+    return Rule(
+        rule_id=f"SYN_{code}_{c:02d}{a:02d}{r}",
+        rule_name=f"{name}: {component} in {application} ({regime})",
+        category=category,
+        domain=APPLICATIONS[a][2],
+        formal_definition=f"The {quantity} of the {component} in a {application} {regime}, from the {name.lower()} relation.",
+        applicability_conditions=[f"{component} operated {regime}", f"Part of a {application}"],
+        governing_equations=[equation],
+        constraints=[f"Outside the {regime} regime use the general form"],
+        source=RuleSource(title="Synthetic benchmark corpus", section=code),
+        embedding_text=" ".join([keywords, quantity, component, application, regime]).lower(),
+    )
+
+
+def generate_rules(size: int, seed: int = 0) -> list[Rule]:
+    if size > MAX_SIZE:
+        raise ValueError(f"At most {MAX_SIZE} distinct synthetic rules")
+    picks = random.Random(seed).sample(range(MAX_SIZE), size)
+    return [_rule(*_combination(i)) for i in picks]
+
+
+def generate_queries(rules: list[Rule], count: int, seed: int = 0) -> list[dict]:
+    """[{"query", "gold", "domain", "category"}] paraphrasing `count` rules sampled from the corpus."""
+    rng = random.Random(seed + 1)
+    families = {fam[0]: fam for fam in FAMILIES}
+    queries = []
+    for rule in rng.sample(rules, min(count, len(rules))):
+        family = families[rule.source.section]
+        c, a, r = _split_suffix(rule.rule_id)
+        queries.append({
+            # Each slot is the canonical wording or a synonym: queries only partly overlap the rule text
+            "query": rng.choice(QUERY_TEMPLATES).format(
+                what=rng.choice([family[3], *family[6]]),
+                component=rng.choice([COMPONENTS[c][0], *COMPONENTS[c][1]]),
+                application=rng.choice([APPLICATIONS[a][0], *APPLICATIONS[a][1]]),
+                regime=rng.choice([REGIMES[r][0], *REGIMES[r][1]]),
+            ),
+            "gold": rule.rule_id,
+            "domain": rule.domain,
+            "category": rule.category,
+        })
+    return queries
+
+
+def _split_suffix(rule_id: str) -> tuple[int, int, int]:
+    suffix = rule_id.rsplit("_", 1)[1]
+    return int(suffix[:2]), int(suffix[2:4]), int(suffix[4:])
+
+
+def corpus_digest(rules: list[Rule], queries: list[dict]) -> str:
+    """Identifies the exact corpus + query set, so reports from different versions can be matched."""
+    payload = json.dumps([[r.rule_id, r.embedding_text] for r in rules] + [[q["query"], q["gold"]] for q in queries])
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
@@ -0,0 +1,177 @@
+"""
+Train and evaluate the local Phase 0 intent classifier.
+
+Labeled data comes from JSONL files ({"query": ..., "intents": [...]}) and/or the
+chat logs (--from-db): each user message is labeled with the intents the LLM
+classifier assigned in the following assistant turn. Turns labeled by the local
+classifier itself or by the follow-up shortcut are skipped to avoid feedback loops.
+
+Usage (from backend/):
+    python scripts/train_intent_classifier.py --data scripts/data/intent_seed.jsonl
+    python scripts/train_intent_classifier.py --data scripts/data/intent_seed.jsonl --from-db --out /tmp/model.json
+
+Reports exact-match accuracy, per-label precision/recall, prediction latency and,
+for a range of confidence thresholds, the LLM fallback rate and the accuracy of the
+predictions that would be served locally. The final model is refit on all data.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.reasoning.intent import LABELS, N_FEATURES, DEFAULT_MODEL_PATH, IntentClassifier, featurize
+
+
+def load_jsonl(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_from_db() -> list[dict]:
+    from app.api.deps import SessionLocal
+    from app.models.chat import ChatMessage
+
+    db = SessionLocal()
+    rows = []
+    try:
+        pending = {}
+        for msg in db.query(ChatMessage).order_by(ChatMessage.session_id, ChatMessage.id).yield_per(500):
+            if msg.role == "user":
+                pending[msg.session_id] = msg.content
+                continue
+            query = pending.pop(msg.session_id, None)
+            audit = msg.meta_audit or {}
+            if not query or audit.get("intent_source", "llm") != "llm":
+                continue
+            if audit.get("action") == "GREETING":
+                rows.append({"query": query, "intents": ["GREETING"]})
+            elif audit.get("intents"):
+                rows.append({"query": query, "intents": audit["intents"]})
+    finally:
+        db.close()
+    return rows
+
+
+def vectorize(rows: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    X = np.zeros((len(rows), N_FEATURES), dtype=np.float32)
+    Y = np.zeros((len(rows), len(LABELS)), dtype=np.float32)
+    for i, row in enumerate(rows):
+        X[i, featurize(row["query"])] = 1.0
+        for label in row["intents"]:
+            Y[i, LABELS.index(label)] = 1.0
+    return X, Y
+
+
+def fit(X: np.ndarray, Y: np.ndarray, epochs: int, lr: float, l2: float) -> tuple[np.ndarray, np.ndarray]:
+    """Full-batch gradient descent on independent per-label logistic losses."""
+    W = np.zeros((X.shape[1], Y.shape[1]), dtype=np.float32)
+    b = np.zeros(Y.shape[1], dtype=np.float32)
+    n = len(X)
+    for _ in range(epochs):
+        P = 1.0 / (1.0 + np.exp(-(X @ W + b)))
+        G = P - Y
+        W -= lr * (X.T @ G / n + l2 * W)
+        b -= lr * G.mean(axis=0)
+    return W, b
+
+
+def to_classifier(W: np.ndarray, b: np.ndarray, version: str) -> IntentClassifier:
+    weights = {
+        label: {int(i): float(W[i, j]) for i in np.nonzero(np.abs(W[:, j]) > 1e-4)[0]}
+        for j, label in enumerate(LABELS)
+    }
+    return IntentClassifier(weights, {label: float(b[j]) for j, label in enumerate(LABELS)}, version)
+
+
+def evaluate(model: IntentClassifier, rows: list[dict], thresholds: list[float]) -> dict:
+    predictions, latencies = [], []
+    for row in rows:
+        start = time.perf_counter()
+        predictions.append(model.predict(row["query"]))
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    def correct(pred, row):
+        return set(pred["intents"]) == set(row["intents"])
+
+    per_label = {}
+    for label in LABELS:
+        tp = sum(1 for p, r in zip(predictions, rows) if label in p["intents"] and label in r["intents"])
+        fp = sum(1 for p, r in zip(predictions, rows) if label in p["intents"] and label not in r["intents"])
+        fn = sum(1 for p, r in zip(predictions, rows) if label not in p["intents"] and label in r["intents"])
+        per_label[label] = {
+            "precision": tp / (tp + fp) if tp + fp else None,
+            "recall": tp / (tp + fn) if tp + fn else None,
+        }
+
+    sweep = []
+    for t in thresholds:
+        served = [(p, r) for p, r in zip(predictions, rows) if p["confidence"] >= t]
+        sweep.append({
+            "threshold": t,
+            "fallback_rate": 1 - len(served) / len(rows),
+            "local_accuracy": sum(correct(p, r) for p, r in served) / len(served) if served else None,
+        })
+
+    return {
+        "n": len(rows),
+        "exact_match_accuracy": sum(correct(p, r) for p, r in zip(predictions, rows)) / len(rows),
+        "per_label": per_label,
+        "latency_us_p50": float(np.percentile(latencies, 50)),
+        "latency_us_p99": float(np.percentile(latencies, 99)),
+        "thresholds": sweep,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", action="append", default=[], help="JSONL file(s) of labeled queries")
+    parser.add_argument("--from-db", action="store_true", help="Also mine labels from logged chat turns")
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--holdout", type=float, default=0.25)
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--lr", type=float, default=2.0)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--thresholds", default="0.6,0.7,0.8,0.85,0.9,0.95")
+    args = parser.parse_args()
+
+    rows = [r for path in args.data for r in load_jsonl(path)]
+    if args.from_db:
+        rows += load_from_db()
+    if not rows:
+        parser.error("No training data: pass --data and/or --from-db")
+
+    random.Random(args.seed).shuffle(rows)
+    split = int(len(rows) * (1 - args.holdout))
+    train, test = rows[:split], rows[split:]
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+
+    W, b = fit(*vectorize(train), args.epochs, args.lr, args.l2)
+    report = evaluate(to_classifier(W, b, "eval"), test or train, thresholds)
+    print(json.dumps(report, indent=2))
+
+    # Refit on everything for the shipped model
+    version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    W, b = fit(*vectorize(rows), args.epochs, args.lr, args.l2)
+    model = to_classifier(W, b, version)
+    with open(args.out, "w") as f:
+        json.dump({
+            "version": version,
+            "n_features": N_FEATURES,
+            "n_examples": len(rows),
+            "holdout_report": report,
+            "weights": {label: {str(i): round(w, 5) for i, w in ws.items()} for label, ws in model.weights.items()},
+            "bias": model.bias,
+        }, f)
+    print(f"Saved model {version} ({len(rows)} examples) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
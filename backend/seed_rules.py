@@ -1,10 +1,11 @@
-from app.services.rag.retriever import RAGRetriever
+from app.core.config import settings
+from app.db.init_db import init_db
+from app.services.rag import corpus
 from app.schemas.rule import Rule, RuleSource
+from app.services.reasoning.rule_library import build_library, write_library, library_path
 import json
 
 def seed():
-    retriever = RAGRetriever()
-    
     rules = [
         Rule(
             rule_id="Ohms_001",
@@ -121,8 +122,20 @@ def seed():
         )
     ]
     
-    print(f"Seeding {len(rules)} rules...")
-    retriever.add_rules(rules)
+    # Built as a new corpus version next to the live one; running servers swap to it once it is activated
+    init_db()
+    print(f"Building corpus version from {len(rules)} rules...")
+    version = corpus.build_version(rules)
+    previous = corpus.activate(version)
+    print(f"Corpus version {version} is active (previously {previous or 'none'}); servers switch within {settings.CORPUS_POLL_S:.0f}s")
+
+    # Solve every governing equation once, so requests never call sympy.solve on rule text.
+    # The corpus version stores its own copy; this file is used while no version is active.
+    library = build_library(rules)
+    write_library(library)
+    solved = sum(len(e["equations"]) for e in library["rules"].values())
+    skipped = sum(len(e["skipped"]) for e in library["rules"].values())
+    print(f"Compiled {solved} equations ({skipped} text-only) into rule library {library['version']} at {library_path()}")
     print("Seeding Complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+from app.services.reasoning.followup import detect_followup, known_symbols
+
+PREVIOUS = {"equation": "Z1 + Z2*Z3/(Z2+Z3)"}
+SYMBOLS = known_symbols(PREVIOUS["equation"], {})
+
+
+def test_cued_parameter_change():
+    result = detect_followup("Now with Z3 = 50 ohms", PREVIOUS, SYMBOLS)
+    assert result == {"kind": "PARAMETER_CHANGE", "overrides": {"Z3": 50.0}}
+
+
+def test_assignment_only_parameter_change():
+    result = detect_followup("Z1 = 5, Z2 = 2.2k and Z3 = 9", PREVIOUS, SYMBOLS)
+    assert result == {"kind": "PARAMETER_CHANGE", "overrides": {"Z1": 5.0, "Z2": 2200.0, "Z3": 9.0}}
+
+
+def test_cued_new_symbols_reformulate():
+    result = detect_followup("What if R_load = 10?", PREVIOUS, SYMBOLS)
+    assert result == {"kind": "REFORMULATE", "overrides": {"R_load": 10.0}}
+
+
+def test_new_question_with_known_symbols_is_not_a_followup():
+    assert detect_followup("Find the input impedance of a Pi network with Z1=5, Z2=7, Z3=9", PREVIOUS, SYMBOLS) is None
+    assert detect_followup("What is the voltage gain of an amplifier with Z1=100?", PREVIOUS, SYMBOLS) is None
+
+
+def test_no_previous_equation():
+    assert detect_followup("Z1 = 5", {"equation": "N/A"}, SYMBOLS) is None
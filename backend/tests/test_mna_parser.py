@@ -0,0 +1,32 @@
+import pytest
+
+from app.services.simulation.mna import MNASystem, looks_like_netlist, parse_netlist
+
+PASTED = "Find the node voltages of this circuit:\nV1 1 0 10\nR1 1 2 1k\nR2 2 0 1k\nHow much current flows?"
+
+
+def test_netlist_with_surrounding_prose():
+    elements, frequency = parse_netlist(PASTED)
+    assert [el.name for el in elements] == ["V1", "R1", "R2"]
+    assert frequency == 0.0
+    assert looks_like_netlist(PASTED)
+    solution = MNASystem(elements).solve()
+    assert solution.node_voltages["2"] == pytest.approx(5.0)
+
+
+def test_prose_alone_is_not_a_netlist():
+    text = "Find the node voltages of this circuit\nRemember the resistor is large\nHow do I start?"
+    assert not looks_like_netlist(text)
+    with pytest.raises(ValueError):
+        parse_netlist(text)
+
+
+def test_strict_rejects_malformed_line():
+    with pytest.raises(ValueError, match="Invalid value 'abc'"):
+        parse_netlist("V1 1 0 10\nR1 1 0 abc", strict=True)
+
+
+def test_ac_frequency_and_suffixes():
+    elements, frequency = parse_netlist("V1 1 0 AC 1\nC1 1 0 10u\n.ac 1meg")
+    assert frequency == 1e6
+    assert elements[1].value == pytest.approx(1e-5)